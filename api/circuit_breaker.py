@@ -0,0 +1,109 @@
+"""
+Circuit breaker for the OpenAI API.
+
+After several consecutive failures (API down, key out of quota, network
+lost) calls fail at once instead of each waiting for its own timeout; a
+background probe closes the circuit again when the API answers.
+"""
+import logging
+import threading
+
+from config import CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RETRY_DELAY, CIRCUIT_MAX_RETRY_DELAY
+
+logger = logging.getLogger(__name__)
+
+# Circuit states
+CLOSED = "closed"  # Calls go to the API
+OPEN = "open"  # Calls fail at once until a probe succeeds
+HALF_OPEN = "half_open"  # A probe is running
+
+
+class ApiUnavailableError(Exception):
+    """Raised instead of calling the API while the circuit is open."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with an increasing retry delay.
+    
+    Thread-safe; on_change(state) is called outside the lock whenever the
+    circuit opens or closes.
+    """
+    
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, retry_delay=CIRCUIT_RETRY_DELAY,
+                 max_retry_delay=CIRCUIT_MAX_RETRY_DELAY, on_change=None):
+        """
+        Initialize a closed circuit.
+        
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            retry_delay: Seconds before the first probe once the circuit is open
+            max_retry_delay: Upper bound of the delay, which doubles after every failed probe
+            on_change: Called with the new state when the circuit opens or closes
+        """
+        self.failure_threshold = failure_threshold
+        self.initial_retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.on_change = on_change
+        
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.retry_delay = retry_delay
+        self.last_error = None
+    
+    def allow(self):
+        """Check whether a call may go to the API."""
+        return self.state == CLOSED
+    
+    def record_success(self):
+        """Record a successful call or probe; closes the circuit."""
+        with self._lock:
+            self.failures = 0
+            self.last_error = None
+            changed = self.state != CLOSED
+            self.state = CLOSED
+            self.retry_delay = self.initial_retry_delay
+        if changed:
+            logger.info("OpenAI API is available again, circuit closed")
+            self._notify(CLOSED)
+    
+    def record_failure(self, error):
+        """
+        Record a failed call or probe.
+        
+        Args:
+            error: Exception raised by the call
+        """
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error)
+            if self.state == HALF_OPEN:
+                # The probe failed: wait longer before the next one
+                self.retry_delay = min(self.retry_delay * 2, self.max_retry_delay)
+            elif self.state == OPEN or self.failures < self.failure_threshold:
+                return
+            self.state = OPEN
+            delay = self.retry_delay
+        logger.warning(f"OpenAI API unavailable ({error}), circuit open, next probe in {delay:.0f}s")
+        self._notify(OPEN)
+    
+    def begin_probe(self):
+        """
+        Start a probe of an open circuit.
+        
+        Returns:
+            bool: True if the caller should probe the API now
+        """
+        with self._lock:
+            if self.state != OPEN:
+                return False
+            self.state = HALF_OPEN
+            return True
+    
+    def _notify(self, state):
+        """Report a state change."""
+        if self.on_change is not None:
+            try:
+                self.on_change(state)
+            except Exception as e:
+                logger.error(f"Error handling circuit change: {str(e)}")
@@ -0,0 +1,126 @@
+"""
+Hedged requests for the OpenAI API.
+
+A few completions take several times longer than usual. When a call has
+not answered by the usual latency (a high quantile of the recent calls of
+the same operation), a duplicate is sent and the first valid answer wins.
+A budget caps the share of duplicated calls, so a slow API is not made
+slower by doubling its load.
+"""
+import logging
+import threading
+from collections import deque
+
+import numpy as np
+
+from config import HEDGE_QUANTILE, HEDGE_MAX_RATE, HEDGE_MIN_SAMPLES, HEDGE_DEFAULT_DELAY, HEDGE_WINDOW
+
+logger = logging.getLogger(__name__)
+
+
+class HedgingPolicy:
+    """Adaptive hedging delay per operation, hedge budget and hedging metrics.
+    
+    Thread-safe: calls are made from several job threads at once.
+    """
+    
+    def __init__(self, quantile=HEDGE_QUANTILE, max_rate=HEDGE_MAX_RATE, min_samples=HEDGE_MIN_SAMPLES,
+                 default_delay=HEDGE_DEFAULT_DELAY, window=HEDGE_WINDOW):
+        """
+        Initialize the policy.
+        
+        Args:
+            quantile: Latency quantile after which a duplicate is sent
+            max_rate: Maximum share of recent calls that may be duplicated
+            min_samples: Latencies of an operation observed before the quantile is used
+            default_delay: Delay (seconds) used until then
+            window: Number of recent calls the latencies and the rate are computed over
+        """
+        self.quantile = quantile
+        self.max_rate = max_rate
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self.window = window
+        
+        self._lock = threading.Lock()
+        self._latencies = {}  # operation -> recent latencies (seconds)
+        self._hedged = deque(maxlen=window)  # whether each recent call was duplicated
+        self._in_flight = 0  # duplicates sent whose call has not finished
+        
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0  # the duplicate answered first
+        self.failures = 0
+    
+    def delay(self, operation):
+        """
+        Get how long to wait for a call before sending a duplicate.
+        
+        Args:
+            operation: Kind of call, e.g. "recipe"; each has its own latencies
+        
+        Returns:
+            float: Seconds
+        """
+        with self._lock:
+            latencies = self._latencies.get(operation)
+            if latencies is None or len(latencies) < self.min_samples:
+                return self.default_delay
+            return float(np.quantile(latencies, self.quantile))
+    
+    def allow_hedge(self):
+        """
+        Take a duplicate from the budget, if the recent hedge rate allows it.
+        
+        Returns:
+            bool: True if a duplicate may be sent
+        """
+        with self._lock:
+            hedged = sum(self._hedged) + self._in_flight
+            if hedged + 1 > self.max_rate * max(len(self._hedged), self.min_samples):
+                return False
+            self._in_flight += 1
+            return True
+    
+    def record(self, operation, seconds, hedged=False, hedge_won=False, failed=False):
+        """
+        Record a finished call.
+        
+        Args:
+            operation: Kind of call
+            seconds: Time until the answer was available
+            hedged: Whether a duplicate was sent
+            hedge_won: Whether the duplicate answered first
+            failed: Whether no valid answer came back
+        """
+        with self._lock:
+            self.requests += 1
+            self._hedged.append(hedged)
+            if hedged:
+                self._in_flight -= 1
+                self.hedges += 1
+                self.hedge_wins += hedge_won
+            if failed:
+                self.failures += 1
+            else:
+                self._latencies.setdefault(operation, deque(maxlen=self.window)).append(seconds)
+    
+    def stats(self):
+        """
+        Get the hedging metrics.
+        
+        Returns:
+            dict: requests, hedges, hedge_wins, failures, hedge_rate, win_rate
+            (share of duplicates that answered first) and the current delay per operation
+        """
+        delays = {operation: self.delay(operation) for operation in list(self._latencies)}
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "failures": self.failures,
+                "hedge_rate": self.hedges / self.requests if self.requests else 0.0,
+                "win_rate": self.hedge_wins / self.hedges if self.hedges else 0.0,
+                "delays": delays
+            }
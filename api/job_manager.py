@@ -0,0 +1,271 @@
+"""
+Persistent priority queue for the LLM work of the application.
+"""
+import heapq
+import itertools
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from config import JOB_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Priorities, lower runs first
+PRIORITY_INTERACTIVE = 0  # The user is waiting for the result, e.g. a recipe being opened
+PRIORITY_PREFETCH = 1  # Results the user is likely to ask for next
+PRIORITY_SPECULATIVE = 2  # Results that may never be used
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+
+
+class Job:
+    """A queued or running LLM job."""
+    
+    def __init__(self, kind, key, priority, payload, job_id=None):
+        """
+        Initialize the job.
+        
+        Args:
+            kind: Job kind, selects the registered handler
+            key: Deduplication key
+            priority: Priority, lower runs first
+            payload: JSON-serializable arguments of the handler
+            job_id: ID of the stored job, None until it is stored
+        """
+        self.id = job_id
+        self.kind = kind
+        self.key = key
+        self.priority = priority
+        self.payload = payload
+        self.status = QUEUED
+        self.callbacks = []  # (on_result, on_error) of every submitter
+
+
+class JobManager(QObject):
+    """Runs LLM jobs on a bounded number of threads, highest priority first.
+    
+    Jobs are stored in the jobs table before they are scheduled and deleted
+    when they end, so the jobs that were queued or running when the
+    application closed run again on the next start. A job submitted while
+    one with the same key is queued or running joins that job instead of
+    running twice, raising its priority if needed.
+    """
+    
+    job_started = pyqtSignal(object)  # job
+    job_progress = pyqtSignal(object, str)  # job, message
+    job_finished = pyqtSignal(object, object)  # job, result
+    job_failed = pyqtSignal(object, str)  # job, error message
+    
+    # Carries (callback, value) from a job thread to the GUI thread
+    _deliver = pyqtSignal(object, object)
+    
+    def __init__(self, db_manager, workers=JOB_WORKERS, parent=None):
+        """
+        Initialize the manager; call start() once the handlers are registered.
+        
+        Args:
+            db_manager: DatabaseManager storing the jobs
+            workers: Number of jobs running at the same time
+            parent: Parent QObject
+        """
+        super().__init__(parent)
+        
+        self.db_manager = db_manager
+        self.workers = workers
+        self._handlers = {}  # kind -> handler(payload, progress)
+        self._active = {}  # key -> queued or running Job
+        self._queue = []  # heap of (priority, sequence, Job); stale entries are skipped
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._threads = []
+        self._shutdown = False
+        
+        # Stores jobs in submission order, off the GUI thread
+        self._store = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jobs-store")
+        
+        # Queued automatically, since the signal is emitted from job threads
+        self._deliver.connect(self._on_deliver)
+    
+    def register(self, kind, handler):
+        """
+        Register the handler of a job kind.
+        
+        Args:
+            kind: Job kind
+            handler: Called on a job thread as handler(payload, progress), where
+                progress(message) reports progress; returns the result or raises
+        """
+        self._handlers[kind] = handler
+    
+    def start(self):
+        """Requeue the jobs left by the last session and start the job threads."""
+        self._store.submit(self._restore)
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+    
+    def _restore(self):
+        """Schedule the stored jobs (runs on the store thread)."""
+        try:
+            rows = self.db_manager.restore_jobs()
+        except Exception as e:
+            logger.error(f"Error restoring jobs: {str(e)}")
+            return
+        
+        restored = 0
+        for row in rows:
+            if row['kind'] not in self._handlers:
+                logger.warning(f"Dropped job of unknown kind {row['kind']}")
+                self._forget(Job(row['kind'], row['key'], row['priority'], row['payload'], row['id']))
+                continue
+            with self._condition:
+                if row['key'] in self._active:
+                    continue
+                job = Job(row['kind'], row['key'], row['priority'], row['payload'], row['id'])
+                self._active[job.key] = job
+                self._push(job)
+            restored += 1
+        if restored:
+            logger.info(f"Restored {restored} unfinished jobs")
+    
+    def submit(self, kind, payload, priority=PRIORITY_INTERACTIVE, key=None, on_result=None, on_error=None):
+        """
+        Queue a job, or join the queued or running job with the same key.
+        
+        Args:
+            kind: Job kind
+            payload: JSON-serializable arguments of the handler
+            priority: PRIORITY_INTERACTIVE, PRIORITY_PREFETCH or PRIORITY_SPECULATIVE
+            key: Deduplication key, None for a job that is never joined
+            on_result: Called on the GUI thread with the result
+            on_error: Called on the GUI thread with the error message
+        
+        Returns:
+            Job: The queued job, or the job that was joined
+        """
+        if self._shutdown:
+            raise RuntimeError("Job manager has been shut down")
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        
+        key = key or uuid.uuid4().hex
+        with self._condition:
+            job = self._active.get(key)
+            if job is None:
+                job = Job(kind, key, priority, payload)
+                self._active[key] = job
+                store = True
+            else:
+                # Only a job that has not started can still move up the queue
+                store = job.status == QUEUED and priority < job.priority
+                if store:
+                    job.priority = priority
+            job.callbacks.append((on_result, on_error))
+        
+        if store:
+            self._store.submit(self._save, job)
+        return job
+    
+    def _save(self, job):
+        """Store a job, or its raised priority, and schedule it (runs on the store thread)."""
+        try:
+            if job.id is None:
+                job.id = self.db_manager.save_job(job.kind, job.key, job.priority, job.payload)
+            else:
+                # The job may end before this runs; updating its row never recreates it
+                self.db_manager.set_job_priority(job.id, job.priority)
+        except Exception as e:
+            # The job still runs, it just does not survive a restart
+            logger.error(f"Error storing job {job.kind}: {str(e)}")
+        with self._condition:
+            if job.status == QUEUED:
+                self._push(job)
+    
+    def _push(self, job):
+        """Add a job to the heap at its current priority (with the condition held)."""
+        heapq.heappush(self._queue, (job.priority, next(self._sequence), job))
+        self._condition.notify()
+    
+    def _work(self):
+        """Run jobs, highest priority first, until shutdown (job thread)."""
+        while True:
+            with self._condition:
+                while not self._shutdown and not self._queue:
+                    self._condition.wait()
+                if self._shutdown:
+                    return
+                priority, _, job = heapq.heappop(self._queue)
+                # A job whose priority was raised has a newer entry
+                if job.status != QUEUED or priority != job.priority:
+                    continue
+                job.status = RUNNING
+            self._run(job)
+    
+    def _run(self, job):
+        """Run one job and report its result (job thread)."""
+        if job.id is not None:
+            try:
+                self.db_manager.set_job_status(job.id, RUNNING)
+            except Exception as e:
+                logger.error(f"Error updating job {job.id}: {str(e)}")
+        self.job_started.emit(job)
+        
+        error = None
+        try:
+            result = self._handlers[job.kind](job.payload, lambda message: self.job_progress.emit(job, message))
+        except Exception as e:
+            logger.error(f"Job {job.kind} failed: {str(e)}")
+            error = str(e)
+        
+        with self._condition:
+            self._active.pop(job.key, None)
+            callbacks = list(job.callbacks)
+        self._forget(job)
+        
+        if error is None:
+            self.job_finished.emit(job, result)
+            for on_result, _ in callbacks:
+                if on_result:
+                    self._deliver.emit(on_result, result)
+        else:
+            self.job_failed.emit(job, error)
+            for _, on_error in callbacks:
+                if on_error:
+                    self._deliver.emit(on_error, error)
+    
+    def _forget(self, job):
+        """Delete a job that ended from the jobs table."""
+        if job.id is None:
+            return
+        try:
+            self.db_manager.delete_job(job.id)
+        except Exception as e:
+            logger.error(f"Error deleting job {job.id}: {str(e)}")
+    
+    def _on_deliver(self, callback, value):
+        """Run a callback on the GUI thread."""
+        try:
+            callback(value)
+        except RuntimeError as e:
+            # The widget waiting for the result was closed in the meantime
+            logger.warning(f"Dropped job result: {str(e)}")
+    
+    def pending(self):
+        """Number of jobs queued or running."""
+        with self._condition:
+            return len(self._active)
+    
+    def shutdown(self):
+        """Stop taking jobs; running jobs stay stored and run again on the next start."""
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+        # Let the queued writes finish, so no submitted job is lost
+        self._store.shutdown(wait=True)
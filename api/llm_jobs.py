@@ -0,0 +1,139 @@
+"""
+LLM jobs of the application, run by the JobManager.
+
+Jobs only carry JSON payloads, so they can be stored and run again after a
+restart: a weekly menu job refers to its generation draft, which holds the
+settings and the days already generated, and a recipe job saves the recipe
+it generates.
+"""
+import json
+import logging
+
+from config import MENU_ALTERNATIVES
+from api.openai_api import OFFLINE_MESSAGE
+from utils.dish_history import dish_key
+
+logger = logging.getLogger(__name__)
+
+# Job kinds
+MENU_JOB = "weekly_menu"
+RECIPE_JOB = "recipe"
+
+
+def menu_job_key(draft_id):
+    """Get the deduplication key of the job generating a draft."""
+    return f"menu:{draft_id}"
+
+
+def recipe_job_key(dish_name, cuisine_type, servings):
+    """Get the deduplication key of the job generating a recipe."""
+    return f"recipe:{dish_key(dish_name)}:{cuisine_type}:{servings}"
+
+
+def register_llm_jobs(job_manager, api, db_manager):
+    """
+    Register the handlers of the LLM jobs.
+    
+    Args:
+        job_manager: JobManager
+        api: OpenAIWrapper
+        db_manager: DatabaseManager
+    """
+    job_manager.register(MENU_JOB, lambda payload, progress: run_menu_job(api, db_manager, payload, progress))
+    job_manager.register(RECIPE_JOB, lambda payload, progress: run_recipe_job(api, db_manager, payload, progress))
+
+
+def run_menu_job(api, db_manager, payload, progress):
+    """
+    Generate the missing days of a draft; every day is checkpointed to the draft.
+    
+    Args:
+        api: OpenAIWrapper
+        db_manager: DatabaseManager
+        payload: {"draft_id": ID of the generation draft}
+        progress: Function reporting a progress message
+    
+    Returns:
+        Result of generate_weekly_menu with its "draft_id"; the draft is kept
+        until the menu is shown, so a job restored after a restart that
+        finishes before anyone waits for it does not lose its menu
+    """
+    draft_id = payload["draft_id"]
+    draft = db_manager.get_generation_draft(draft_id)
+    if draft is None:
+        raise RuntimeError("Không tìm thấy thực đơn đang tạo dở")
+    
+    user = db_manager.get_user(draft["user_id"])
+    settings = draft["settings"]
+    days = settings["days"]
+    # Dishes eaten recently, so the new week does not repeat them
+    try:
+        recent_dishes = db_manager.get_dish_history(draft["user_id"]).recent()
+    except Exception as e:
+        logger.error(f"Error loading dish history: {str(e)}")
+        recent_dishes = []
+    
+    done = set(draft["days"])
+    progress(f"Đang tạo thực đơn tuần ({len(done)}/{len(days)} ngày)...")
+    
+    def checkpoint(day, meals, error=None):
+        """Store a generated or failed day in the draft."""
+        try:
+            db_manager.save_draft_day(draft_id, day, meals, error)
+        except Exception as e:
+            # Generation goes on; only the ability to resume this day is lost
+            logger.error(f"Error checkpointing {day}: {str(e)}")
+        if meals is not None:
+            done.add(day)
+            progress(f"Đã tạo thực đơn cho {day} ({len(done)}/{len(days)} ngày)")
+        else:
+            progress(f"Chưa tạo được thực đơn cho {day}")
+    
+    result = api.generate_weekly_menu(
+        user,
+        draft["cuisine_type"],
+        settings["budget_per_meal"],
+        settings["max_prep_time"],
+        days,
+        settings["meals_per_day"],
+        settings.get("servings", 4),
+        recent_dishes=recent_dishes,
+        completed_days=draft["days"],
+        checkpoint=checkpoint,
+        alternatives=settings.get("alternatives", MENU_ALTERNATIVES)
+    )
+    if isinstance(result, dict) and "error" in result:
+        raise RuntimeError(result["error"])
+    
+    result["draft_id"] = draft_id
+    return result
+
+
+def run_recipe_job(api, db_manager, payload, progress):
+    """
+    Generate a recipe and save it, so it is kept even if nobody waits for it.
+    
+    Args:
+        api: OpenAIWrapper
+        db_manager: DatabaseManager
+        payload: {"dish_name", "cuisine_type", "servings"}
+        progress: Function reporting a progress message
+    
+    Returns:
+        Recipe data
+    """
+    dish_name = payload["dish_name"]
+    progress(f"Đang tạo công thức cho món {dish_name}...")
+    result = api.generate_recipe(dish_name, payload.get("cuisine_type"), payload.get("servings", 4))
+    if not result:
+        raise RuntimeError(
+            OFFLINE_MESSAGE if not api.is_available() else f"Không tạo được công thức cho món {dish_name}"
+        )
+    if isinstance(result, dict) and "error" in result:
+        raise RuntimeError(result["error"])
+    
+    try:
+        db_manager.save_recipe(dish_name, json.dumps(result, ensure_ascii=False), payload.get("cuisine_type"))
+    except Exception as e:
+        logger.error(f"Error saving recipe to database: {str(e)}")
+    return result
@@ -3,12 +3,23 @@ OpenAI API wrapper for generating menu suggestions.
 """
 import os
 import json
+import time
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from typing import Dict, Any, Optional
 import openai
 from PyQt5.QtCore import QObject, pyqtSignal
-from config import OPENAI_MODEL
+from config import (
+    OPENAI_MODEL, OPENAI_REQUEST_TIMEOUT, HEDGE_REQUESTS, JOB_WORKERS, MENU_ALTERNATIVES, ALTERNATIVE_MAX_TOKENS,
+    REPAIR_BASE_MAX_TOKENS, REPAIR_MEAL_MAX_TOKENS
+)
+from api.hedging import HedgingPolicy
+from api.circuit_breaker import CircuitBreaker, ApiUnavailableError, OPEN
 from utils.api_key_manager import get_api_key
+from utils.dislike_matcher import DislikeMatcher
+from utils.menu_validator import MenuValidator
+from utils.meal_alternatives import clean_alternatives
 
 # Configure logging
 log_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'logs', 'app.log')
@@ -24,20 +35,168 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Error of the calls made while the API is unavailable
+OFFLINE_MESSAGE = "Không kết nối được OpenAI, đang dùng dữ liệu đã lưu"
+
 class OpenAIWrapper(QObject):
     """Wrapper for OpenAI API."""
     
     # Signal to notify progress
     progress_signal = pyqtSignal(str)
+    # Emitted with False when the circuit opens and True when the API answers again
+    availability_changed = pyqtSignal(bool)
     
-    def __init__(self, model=OPENAI_MODEL):
-        """Initialize OpenAI client with API key."""
+    def __init__(self, model=OPENAI_MODEL, hedging=None):
+        """Initialize OpenAI client with API key.
+        
+        hedging is the HedgingPolicy of the menu and recipe calls; by default
+        one is created if HEDGE_REQUESTS is enabled.
+        """
         super().__init__()
         self.model = model
         self.api_key = get_api_key()
         if not self.api_key:
             raise ValueError("OpenAI API key not found")
         openai.api_key = self.api_key
+        
+        self.hedging = hedging if hedging is not None else (HedgingPolicy() if HEDGE_REQUESTS else None)
+        # Room for a primary call and a duplicate per job, plus duplicates that lost and still run
+        self._hedge_pool = ThreadPoolExecutor(max_workers=4 * JOB_WORKERS, thread_name_prefix="openai-hedge")
+        
+        # Fails calls fast while the API is down; probed in the background
+        self.breaker = CircuitBreaker(on_change=self._on_circuit_change)
+    
+    def is_available(self):
+        """Check whether calls go to the API (False in offline mode)."""
+        return self.breaker.allow()
+    
+    def _on_circuit_change(self, state):
+        """Report the change and schedule a probe when the circuit opens."""
+        self.availability_changed.emit(state != OPEN)
+        if state == OPEN:
+            timer = threading.Timer(self.breaker.retry_delay, self._probe)
+            timer.daemon = True
+            timer.start()
+    
+    def _probe(self):
+        """Check whether the API answers again, with a call that uses no tokens."""
+        if not self.breaker.begin_probe():
+            return
+        try:
+            openai.Model.retrieve(self.model, request_timeout=OPENAI_REQUEST_TIMEOUT)
+        except openai.error.AuthenticationError as e:
+            # The key may have been replaced in the meantime
+            self._refresh_api_key()
+            self.breaker.record_failure(e)
+        except Exception as e:
+            self.breaker.record_failure(e)
+        else:
+            self.breaker.record_success()
+    
+    def _send_completion(self, request):
+        """Send one chat completion and return the content of its first choice."""
+        response = openai.ChatCompletion.create(model=self.model, **request)
+        logger.info("Raw API Response Object:")
+        logger.info(str(response))
+        return response.choices[0].message.content
+    
+    @staticmethod
+    def _is_json(content):
+        """Check that a response contains a JSON object."""
+        if not content:
+            return False
+        # Same leniency as _parse_json_response: text around the object is allowed
+        start, end = content.find('{'), content.rfind('}')
+        if start == -1 or end < start:
+            return False
+        try:
+            return isinstance(json.loads(content[start:end + 1]), dict)
+        except json.JSONDecodeError:
+            return False
+    
+    def _chat_completion(self, messages, temperature=None, max_tokens=None, json_mode=True, operation=None):
+        """Send a chat completion; every API call goes through here.
+        
+        While the circuit is open the call fails at once with
+        ApiUnavailableError. With a hedging policy and an operation name
+        ("menu", "recipe") the call is hedged, see _hedged_completion.
+        
+        Returns:
+            str: Content of the first choice
+        """
+        if not self.breaker.allow():
+            raise ApiUnavailableError(OFFLINE_MESSAGE)
+        
+        request = {"messages": messages, "request_timeout": OPENAI_REQUEST_TIMEOUT}
+        if temperature is not None:
+            request["temperature"] = temperature
+        if max_tokens is not None:
+            request["max_tokens"] = max_tokens
+        if json_mode:
+            request["response_format"] = {"type": "json_object"}  # Force JSON response format
+        
+        try:
+            if self.hedging is None or operation is None:
+                content = self._send_completion(request)
+            else:
+                content = self._hedged_completion(request, operation)
+        except Exception as e:
+            # A malformed request says nothing about the API being available
+            if not isinstance(e, openai.error.InvalidRequestError):
+                self.breaker.record_failure(e)
+            raise
+        self.breaker.record_success()
+        return content
+    
+    def _hedged_completion(self, request, operation):
+        """Send a completion, and a duplicate if it is slower than usual.
+        
+        The duplicate is sent if the call has not answered within the
+        policy's delay for the operation; the first answer containing JSON
+        wins. The legacy client cannot abort a request in flight: the
+        losing call is cancelled if it has not started and otherwise ignored.
+        """
+        policy = self.hedging
+        started = time.monotonic()
+        primary = self._hedge_pool.submit(self._send_completion, request)
+        pending = {primary}
+        hedge = None
+        done, _ = wait(pending, timeout=policy.delay(operation))
+        if not done and policy.allow_hedge():
+            logger.info(f"No answer to {operation} call after {time.monotonic() - started:.1f}s, sending a duplicate")
+            hedge = self._hedge_pool.submit(self._send_completion, request)
+            pending.add(hedge)
+        
+        error = None
+        invalid = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in sorted(done, key=lambda future: future is hedge):
+                try:
+                    content = future.result()
+                except Exception as e:
+                    error = error or e
+                    continue
+                if not self._is_json(content):
+                    invalid = content
+                    continue
+                for other in pending:
+                    other.cancel()
+                policy.record(operation, time.monotonic() - started, hedge is not None, future is hedge)
+                if hedge is not None:
+                    logger.info(f"Hedged {operation} call answered by the {'duplicate' if future is hedge else 'primary'}: "
+                                f"{policy.stats()}")
+                return content
+        
+        policy.record(operation, time.monotonic() - started, hedge is not None, failed=True)
+        if invalid is not None:
+            # Let the caller's parsing report the malformed answer
+            return invalid
+        raise error
+    
+    def hedging_stats(self):
+        """Get the hedging metrics, None if hedging is disabled."""
+        return self.hedging.stats() if self.hedging is not None else None
     
     def _parse_json_response(self, content: str) -> Dict[str, Any]:
         """Parse and validate JSON response."""
@@ -156,8 +315,15 @@ Format JSON:
     def _generate_daily_menu(self, user_preferences, cuisine_type,
                            budget_per_meal, max_prep_time, day,
                            meals_per_day, servings, previous_meals=None, 
-                           generated_dishes=None) -> Dict[str, Any]:
-        """Generate menu for a single day."""
+                           generated_dishes=None, recent_dishes=None,
+                           alternatives=MENU_ALTERNATIVES) -> Dict[str, Any]:
+        """Generate menu for a single day.
+        
+        generated_dishes holds the dishes already chosen this week and
+        recent_dishes a bounded list of dishes from recent saved menus.
+        Every meal also lists up to `alternatives` ranked alternative
+        dishes, in the same response.
+        """
         if generated_dishes is None:
             generated_dishes = []
         
@@ -181,11 +347,29 @@ Ngân sách/bữa: {budget_per_meal}đ
 Thời gian tối đa: {max_prep_time}p
 
 Không sử dụng các món đã có trước đây: {', '.join(generated_dishes) if generated_dishes else 'Không'}
-
+Hạn chế các món đã ăn gần đây: {', '.join(recent_dishes) if recent_dishes else 'Không'}
+"""
+        if alternatives:
+            prompt += f"""
+Với mỗi bữa, thêm {alternatives} món thay thế trong "alternatives", món phù hợp nhất trước, cùng các yêu cầu trên và không trùng với các món khác trong thực đơn
+"""
+        prompt += f"""
 Format JSON:
 {{
   "{day}": {{
 """
+        # Alternatives only carry what a local swap needs, to keep the answer short
+        alternatives_format = """,
+      "alternatives": [
+        {
+          "name": "tên món thay thế",
+          "ingredients": ["nguyên liệu"],
+          "preparation_time": phút,
+          "estimated_cost": đồng,
+          "nutrition_info": {"protein": "g", "carbs": "g", "fat": "g", "calories": "kcal"}
+        }
+      ]""" if alternatives else ""
+        
         # Add format for each meal
         for meal in meals_per_day:
             prompt += f"""    "{meal}": {{
@@ -202,7 +386,7 @@ Format JSON:
         "calories": "kcal"
       }},
       "cooking_method": "phương pháp nấu phù hợp với văn hóa ẩm thực",
-      "food_groups": ["nhóm thực phẩm"]
+      "food_groups": ["nhóm thực phẩm"]{alternatives_format}
     }},
 """
         
@@ -211,7 +395,9 @@ Format JSON:
         
         try:
             # Call API to generate the daily menu
-            response = self.generate_menu(prompt)
+            response = self.generate_menu(
+                prompt, 2000 + ALTERNATIVE_MAX_TOKENS * alternatives * len(meals_per_day)
+            )
             
             # Parse and extract new dish names for tracking
             if response and day in response:
@@ -268,23 +454,17 @@ Format JSON:
         
         try:
             logger.info(f"Sending recipe request to OpenAI API with model: {self.model}")
-            response = openai.ChatCompletion.create(
-                model=self.model,
-                messages=[
+            content = self._chat_completion(
+                [
                     {"role": "system", "content": f"Bạn là một đầu bếp chuyên nghiệp về ẩm thực {cuisine_type}, cung cấp công thức nấu ăn chi tiết và chính xác. Phản hồi của bạn phải ở định dạng JSON theo mẫu được cung cấp."},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.5,
                 max_tokens=1000,
-                response_format={"type": "json_object"}  # Force JSON response format
+                operation="recipe"
             )
             
-            # Log the raw response
-            logger.info("Raw API Response Object:")
-            logger.info(str(response))
-            
-            # Extract content and parse JSON
-            content = response.choices[0].message['content']
+            # Parse JSON
             result = self._parse_json_response(content)
             
             return result
@@ -299,26 +479,19 @@ Format JSON:
         if self.api_key:
             openai.api_key = self.api_key
     
-    def generate_menu(self, prompt: str) -> Optional[Dict[str, Any]]:
+    def generate_menu(self, prompt: str, max_tokens: int = 2000) -> Optional[Dict[str, Any]]:
         """Generate menu using OpenAI API."""
         try:
             logger.info("Sending request to OpenAI API")
-            response = openai.ChatCompletion.create(
-                model=self.model,
-                messages=[
+            menu_text = self._chat_completion(
+                [
                     {"role": "system", "content": "Bạn là một đầu bếp chuyên nghiệp với kiến thức sâu rộng về ẩm thực. Hãy đảm bảo chỉ đề xuất những món ăn thực tế, phổ biến và phù hợp với văn hóa ẩm thực được chọn."},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.7,
-                max_tokens=2000,
-                response_format={"type": "json_object"}  # Force JSON response format
+                max_tokens=max_tokens,
+                operation="menu"
             )
-            
-            logger.info("Raw API Response:")
-            logger.info(response)
-            
-            # Extract the generated menu from the response
-            menu_text = response.choices[0].message.content
             try:
                 menu_data = json.loads(menu_text)
                 return menu_data
@@ -333,7 +506,7 @@ Format JSON:
                 logger.error("Authentication failed and could not refresh API key")
                 return None
             # Retry with new API key
-            return self.generate_menu(prompt)
+            return self.generate_menu(prompt, max_tokens)
             
         except Exception as e:
             logger.error(f"Error generating menu: {str(e)}")
@@ -356,18 +529,13 @@ Format JSON:
             """
             
             logger.info("Sending recipe request to OpenAI API with model: %s", self.model)
-            response = openai.ChatCompletion.create(
-                model=self.model,
-                messages=[
+            recipe_text = self._chat_completion(
+                [
                     {"role": "system", "content": "You are a professional chef providing detailed recipes."},
                     {"role": "user", "content": prompt}
-                ]
+                ],
+                json_mode=False
             )
-            
-            logger.info("Raw API Response Object:")
-            logger.info(response)
-            
-            recipe_text = response.choices[0].message.content
             logger.info("Raw API Response:")
             logger.info(recipe_text)
             
@@ -392,28 +560,190 @@ Format JSON:
             logger.error(f"Error getting recipe: {str(e)}")
             return None
     
+    def _repair_menu(self, menu, validator, user_preferences, cuisine_type, days,
+                     meals_per_day, servings, recent_dishes=None) -> Dict[str, Any]:
+        """Validate a generated menu and fix its failing meals with one request.
+        
+        Meals returned by the repair request replace the failing ones only
+        if they pass validation themselves. The report counts the checked,
+        failing and repaired meals and the requests saved compared with
+        generating every fixed day again (one request per day).
+        """
+        failures = validator.validate(menu, days, meals_per_day)
+        report = {
+            "checked": len(days) * len(meals_per_day),
+            "failed": len(failures),
+            "repaired": 0,
+            "calls_saved": 0,
+            "notes": []
+        }
+        if not failures:
+            report["notes"].append(f"Đã kiểm tra {report['checked']} bữa: tất cả đạt yêu cầu")
+            return report
+        
+        failing_days = {day for day, _ in failures}
+        self.progress_signal.emit(f"Đang sửa {len(failures)} bữa chưa đạt yêu cầu...")
+        fixes = self.generate_menu(
+            self._create_repair_prompt(
+                menu, failures, user_preferences, cuisine_type, validator, servings, recent_dishes
+            ),
+            REPAIR_BASE_MAX_TOKENS + REPAIR_MEAL_MAX_TOKENS * len(failures)
+        ) or {}
+        
+        for (day, meal_time), problems in list(failures.items()):
+            fix = fixes.get(day, {}).get(meal_time) if isinstance(fixes.get(day), dict) else None
+            if fix is not None and not validator.validate_meal(fix):
+                menu.setdefault(day, {})[meal_time] = fix
+                del failures[(day, meal_time)]
+                report["repaired"] += 1
+        
+        if report["repaired"]:
+            # Without the repair, each day it fixed would have been generated again
+            fixed_days = failing_days - {day for day, _ in failures}
+            report["calls_saved"] = max(len(fixed_days) - 1, 0)
+            report["notes"].append(
+                f"Đã kiểm tra {report['checked']} bữa: {report['failed']} bữa chưa đạt yêu cầu, "
+                f"đã sửa {report['repaired']} bữa bằng 1 yêu cầu "
+                f"(tiết kiệm {report['calls_saved']} yêu cầu so với tạo lại {len(fixed_days)} ngày)"
+            )
+        else:
+            report["notes"].append(
+                f"Đã kiểm tra {report['checked']} bữa: {report['failed']} bữa chưa đạt yêu cầu, "
+                f"chưa sửa được bữa nào"
+            )
+        for (day, meal_time), problems in failures.items():
+            report["notes"].append(f"⚠ {day} - {meal_time}: {'; '.join(problems)}")
+        logger.info(f"Validation: {report['failed']} failed, {report['repaired']} repaired")
+        return report
+    
+    def _create_repair_prompt(self, menu, failures, user_preferences, cuisine_type,
+                              validator, servings, recent_dishes=None) -> str:
+        """Create a prompt asking for replacements of the failing meals only."""
+        kept_dishes = [
+            meal_info["name"] for day, day_meals in menu.items() if isinstance(day_meals, dict)
+            for meal_time, meal_info in day_meals.items()
+            if (day, meal_time) not in failures and isinstance(meal_info, dict) and meal_info.get("name")
+        ]
+        failing = "\n".join(
+            f"- {day} - {meal_time}: {', '.join(problems)}" for (day, meal_time), problems in failures.items()
+        )
+        
+        prompt = f"""Với vai trò là một đầu bếp chuyên về {cuisine_type}, hãy đề xuất món thay thế cho các bữa sau, vì chúng chưa đạt yêu cầu:
+{failing}
+
+Yêu cầu:
+1. Món ăn thực tế, phổ biến trong nền ẩm thực {cuisine_type}
+2. Ngân sách/bữa: {int(validator.budget_per_meal) if validator.budget_per_meal else 'Không giới hạn'}đ
+3. Thời gian tối đa: {int(validator.max_prep_time) if validator.max_prep_time else 'Không giới hạn'}p
+4. Không thích: {', '.join(user_preferences.disliked_ingredients) if user_preferences.disliked_ingredients else 'Không'}
+5. Món không thích: {', '.join(user_preferences.disliked_dishes) if user_preferences.disliked_dishes else 'Không'}
+6. Không trùng các món đã có: {', '.join(kept_dishes) if kept_dishes else 'Không'}
+7. Hạn chế các món đã ăn gần đây: {', '.join(recent_dishes) if recent_dishes else 'Không'}
+
+Chỉ trả về các bữa trên, theo format JSON:
+{{
+"""
+        days = {}
+        for day, meal_time in failures:
+            days.setdefault(day, []).append(meal_time)
+        for day, meal_times in days.items():
+            prompt += f'  "{day}": {{\n'
+            for meal_time in meal_times:
+                prompt += f"""    "{meal_time}": {{
+      "name": "tên món",
+      "ingredients": ["nguyên liệu"],
+      "preparation_time": phút,
+      "estimated_cost": đồng,
+      "servings": {servings},
+      "reused_ingredients": ["tái sử dụng"],
+      "nutrition_info": {{"protein": "g", "carbs": "g", "fat": "g", "calories": "kcal"}},
+      "cooking_method": "phương pháp nấu",
+      "food_groups": ["nhóm thực phẩm"]
+    }},
+"""
+            prompt = prompt.rstrip(",\n") + "\n  },\n"
+        prompt = prompt.rstrip(",\n") + "\n}"
+        return prompt
+    
     def generate_weekly_menu(self, user_preferences, cuisine_type, 
                               budget_per_meal, max_prep_time, days, meals_per_day,
-                              servings=4, previous_meals=None) -> Dict[str, Any]:
-        """Generate a weekly menu based on user preferences."""
+                              servings=4, previous_meals=None, recent_dishes=None,
+                              completed_days=None, checkpoint=None,
+                              alternatives=MENU_ALTERNATIVES) -> Dict[str, Any]:
+        """Generate a weekly menu based on user preferences.
+        
+        recent_dishes are dishes the user ate in recent weeks (see
+        DishHistory.recent); they are listed in every daily prompt.
+        completed_days ({day: meals}) are reused instead of generated again,
+        to resume a draft. checkpoint(day, meals, error=None) is called after
+        every day, with meals None for a day that failed.
+        
+        Every meal keeps up to `alternatives` validated alternatives in
+        meal_info["alternatives"], so it can be swapped without a new request.
+        
+        A failed day does not stop the week: the result lists it in
+        "failed_days" and only an entirely failed week returns an error.
+        """
         try:
             self.progress_signal.emit("Bắt đầu tạo thực đơn tuần...")
-            menu = {"menu": {}}
-            generated_dishes = []
+            menu = {"menu": {}, "failed_days": {}}
+            completed_days = completed_days or {}
+            generated_dishes = [
+                meal_info["name"] for meals in completed_days.values()
+                for meal_info in meals.values() if isinstance(meal_info, dict) and "name" in meal_info
+            ]
             for day in days:
-                self.progress_signal.emit(f"Đang tạo thực đơn cho {day}...")
-                day_menu = self._generate_daily_menu(
-                    user_preferences, cuisine_type, budget_per_meal,
-                    max_prep_time, day, meals_per_day, servings, previous_meals,
-                    generated_dishes
-                )
-                if "error" in day_menu:
-                    return day_menu
-                menu["menu"][day] = day_menu.get(day, {})
+                if day in completed_days:
+                    menu["menu"][day] = completed_days[day]
+                    continue
+                
+                if not self.is_available():
+                    # Offline: the remaining days are left for a resume
+                    day_menu = {"error": OFFLINE_MESSAGE}
+                else:
+                    self.progress_signal.emit(f"Đang tạo thực đơn cho {day}...")
+                    day_menu = self._generate_daily_menu(
+                        user_preferences, cuisine_type, budget_per_meal,
+                        max_prep_time, day, meals_per_day, servings, previous_meals,
+                        generated_dishes, recent_dishes, alternatives
+                    )
+                if not day_menu or "error" in day_menu or not isinstance(day_menu.get(day), dict):
+                    error = (day_menu or {}).get("error") or f"Không nhận được thực đơn cho {day}"
+                    menu["failed_days"][day] = error
+                    if checkpoint:
+                        checkpoint(day, None, error)
+                    continue
+                
+                menu["menu"][day] = day_menu[day]
+                if checkpoint:
+                    checkpoint(day, menu["menu"][day])
                 for meal_time, meal_info in menu["menu"][day].items():
                     if isinstance(meal_info, dict) and "name" in meal_info:
                         generated_dishes.append(meal_info["name"])
-            self.progress_signal.emit("Đã hoàn thành tạo thực đơn tuần!")
+            
+            if not menu["menu"]:
+                return {"error": next(iter(menu["failed_days"].values()), "Không tạo được thực đơn")}
+            
+            # Check every meal locally and ask again only for the failing ones
+            generated_days = [day for day in days if day in menu["menu"]]
+            validator = MenuValidator(budget_per_meal, max_prep_time, DislikeMatcher.for_user(user_preferences))
+            menu["validation"] = self._repair_menu(
+                menu["menu"], validator, user_preferences, cuisine_type, generated_days, meals_per_day,
+                servings, recent_dishes
+            )
+            # Alternatives get the same checks, so a swap never breaks the constraints
+            kept = clean_alternatives(menu["menu"], validator, alternatives)
+            if checkpoint and (menu["validation"]["repaired"] or kept):
+                for day in generated_days:
+                    checkpoint(day, menu["menu"][day])
+            
+            menu["optimization_notes"] = menu["validation"]["notes"] + [
+                f"⚠ Chưa tạo được thực đơn cho {day}: {error}" for day, error in menu["failed_days"].items()
+            ]
+            if menu["failed_days"]:
+                self.progress_signal.emit(f"Chưa tạo được {len(menu['failed_days'])} ngày, có thể tạo tiếp sau")
+            else:
+                self.progress_signal.emit("Đã hoàn thành tạo thực đơn tuần!")
             return menu
         except Exception as e:
             logger.error(f"Error in generate_weekly_menu: {str(e)}")
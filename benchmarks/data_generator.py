@@ -0,0 +1,181 @@
+"""
+Synthetic users, dishes, recipes and menus for benchmarks.
+"""
+import json
+import random
+from datetime import datetime, timedelta
+
+from config import CUISINE_TYPES, DAYS_OF_WEEK, MEALS_PER_DAY, BUDGET_OPTIONS, PREP_TIME_OPTIONS
+from database.models import User, Dish, Menu
+
+# Building blocks for realistic Vietnamese dish names and ingredient lists
+DISH_BASES = ["Cơm", "Bún", "Phở", "Miến", "Mì", "Cháo", "Bánh mì", "Canh", "Lẩu", "Gỏi"]
+PROTEINS = [
+    "thịt bò", "thịt heo", "thịt gà", "tôm", "cá lóc", "cá thu", "mực",
+    "đậu phụ", "trứng", "sườn heo", "vịt", "nghêu"
+]
+STYLES = ["kho tộ", "xào sả ớt", "nướng", "hấp gừng", "chiên giòn", "luộc", "sốt cà chua", "rim mặn"]
+VEGETABLES = [
+    "rau muống", "cải thìa", "bí đỏ", "bí đao", "cà rốt", "su hào", "giá đỗ", "nấm rơm",
+    "cà chua", "dưa leo", "bắp cải", "đậu que", "khổ qua", "mồng tơi", "rau ngót"
+]
+SEASONINGS = ["hành lá", "tỏi", "gừng", "sả", "ớt", "nước mắm", "đường", "tiêu", "rau thơm", "chanh"]
+UNITS = ["g", "kg", "ml", "muỗng canh", "muỗng cà phê", "quả", "bó"]
+FIRST_NAMES = ["An", "Bình", "Chi", "Dũng", "Giang", "Hà", "Hùng", "Lan", "Minh", "Ngọc", "Phúc", "Thảo"]
+
+
+class SyntheticDataGenerator:
+    """Generates reproducible application data from the app's own constants."""
+    
+    def __init__(self, seed=42):
+        """Initialize the generator with a random seed."""
+        self.random = random.Random(seed)
+        self._dish_counts = {}
+    
+    def dish_name(self):
+        """
+        Generate a dish name, e.g. "Bún thịt bò xào sả ớt".
+        
+        Returns:
+            Dish name
+        """
+        return f"{self.random.choice(DISH_BASES)} {self.random.choice(PROTEINS)} {self.random.choice(STYLES)}"
+    
+    def unique_dish_name(self):
+        """
+        Generate a dish name that has not been returned before.
+        
+        Returns:
+            Dish name, with a variant number once the plain names run out
+        """
+        name = self.dish_name()
+        count = self._dish_counts.get(name, 0) + 1
+        self._dish_counts[name] = count
+        return name if count == 1 else f"{name} kiểu {count}"
+    
+    def ingredients(self):
+        """
+        Generate an ingredient list for one dish.
+        
+        Returns:
+            List of ingredient names
+        """
+        items = [self.random.choice(PROTEINS)]
+        items += self.random.sample(VEGETABLES, self.random.randint(1, 4))
+        items += self.random.sample(SEASONINGS, self.random.randint(2, 5))
+        return items
+    
+    def user(self):
+        """
+        Generate a user with preferences.
+        
+        Returns:
+            Unsaved User
+        """
+        return User(
+            name=f"{self.random.choice(FIRST_NAMES)} {self.random.randint(1, 9999)}",
+            favorite_ingredients=self.random.sample(PROTEINS + VEGETABLES, 4),
+            disliked_ingredients=self.random.sample(VEGETABLES, 2),
+            favorite_dishes=[self.dish_name() for _ in range(3)],
+            disliked_dishes=[self.dish_name()]
+        )
+    
+    def dish(self):
+        """
+        Generate a dish.
+        
+        Returns:
+            Unsaved Dish
+        """
+        return Dish(
+            name=self.dish_name(),
+            cuisine_type=self.random.choice(CUISINE_TYPES),
+            ingredients=self.ingredients(),
+            preparation_time=int(self.random.choice(PREP_TIME_OPTIONS)),
+            estimated_cost=self.random.randrange(20000, 200000, 5000)
+        )
+    
+    def meal_info(self):
+        """
+        Generate one meal in the format returned by the menu generator.
+        
+        Returns:
+            Dictionary with name, ingredients, preparation time and cost
+        """
+        ingredients = self.ingredients()
+        return {
+            "name": self.dish_name(),
+            "ingredients": ingredients,
+            "preparation_time": int(self.random.choice(PREP_TIME_OPTIONS)),
+            "estimated_cost": self.random.randrange(20000, 200000, 5000),
+            "reused_ingredients": self.random.sample(ingredients, min(2, len(ingredients))),
+            "nutrition_info": {
+                "protein": f"{self.random.randint(10, 60)}g",
+                "carbs": f"{self.random.randint(20, 120)}g",
+                "fat": f"{self.random.randint(5, 40)}g",
+                "calories": f"{self.random.randint(250, 900)} kcal"
+            }
+        }
+    
+    def menu(self, user_id, index=0):
+        """
+        Generate a weekly menu for every day and meal of the week.
+        
+        Args:
+            user_id: Owner of the menu
+            index: Position of the menu, used to spread creation dates
+        
+        Returns:
+            Unsaved Menu
+        """
+        meals = {
+            day: {meal_time: self.meal_info() for meal_time in MEALS_PER_DAY}
+            for day in DAYS_OF_WEEK
+        }
+        creation_date = datetime(2024, 1, 1) + timedelta(hours=index * 7 + self.random.randint(0, 6))
+        return Menu(
+            user_id=user_id,
+            name=f"Thực đơn tuần {index + 1}",
+            creation_date=creation_date.strftime("%Y-%m-%d %H:%M:%S"),
+            cuisine_type=self.random.choice(CUISINE_TYPES),
+            budget_per_meal=int(self.random.choice(BUDGET_OPTIONS)),
+            max_prep_time=int(self.random.choice(PREP_TIME_OPTIONS)),
+            # Saved the same way as the menu panel does, i.e. already JSON-encoded
+            meals=json.dumps(meals, ensure_ascii=False)
+        )
+    
+    def recipe(self, name=None):
+        """
+        Generate recipe content in the format returned by the recipe generator.
+        
+        Args:
+            name: Dish name (a new unique one if None)
+        
+        Returns:
+            (name, cuisine type, JSON content) tuple
+        """
+        name = name or self.unique_dish_name()
+        cuisine_type = self.random.choice(CUISINE_TYPES)
+        ingredients = [
+            {"name": item, "amount": str(self.random.randint(1, 500)), "unit": self.random.choice(UNITS)}
+            for item in self.ingredients()
+        ]
+        steps = [
+            f"Bước {number}: Sơ chế {self.random.choice(VEGETABLES)} và ướp "
+            f"{self.random.choice(PROTEINS)} với {self.random.choice(SEASONINGS)} trong "
+            f"{self.random.randint(5, 30)} phút."
+            for number in range(1, self.random.randint(4, 8) + 1)
+        ]
+        content = {
+            "recipe": {
+                "name": name,
+                "cuisine_type": cuisine_type,
+                "preparation_time": int(self.random.choice(PREP_TIME_OPTIONS)),
+                "cooking_time": self.random.randint(10, 120),
+                "servings": self.random.randint(1, 6),
+                "ingredients": ingredients,
+                "steps": steps,
+                "tips": [f"Mẹo 1: Dùng {self.random.choice(SEASONINGS)} tươi để món ăn thơm hơn."]
+            }
+        }
+        return name, cuisine_type, json.dumps(content, ensure_ascii=False)
@@ -0,0 +1,243 @@
+"""
+Benchmark for DatabaseManager read, write and search paths.
+
+Usage:
+    python -m benchmarks.db_benchmark --scales 1000 10000 --output bench.json
+    python -m benchmarks.db_benchmark --scales 1000 --compare bench.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+
+from config import STORAGE_CODEC
+from database.db_manager import DatabaseManager
+from .data_generator import SyntheticDataGenerator
+
+DEFAULT_SCALES = [1000, 10000, 100000]
+
+# Lookups and queries timed per scale
+LOOKUP_SAMPLE_SIZE = 1000
+USER_SAMPLE_SIZE = 50
+SEARCH_QUERIES = ["pho bo", "thịt gà", "ca loc nuong", "bún", "đậu phụ", "xao sa ot"]
+
+
+class DatabaseBenchmark:
+    """Fills a temporary database with synthetic data and times DatabaseManager calls."""
+    
+    def __init__(self, scale, seed=42):
+        """
+        Initialize the benchmark.
+        
+        Args:
+            scale: Number of menus, recipes and dishes to create
+            seed: Random seed, so runs on different commits use the same data
+        """
+        self.scale = scale
+        self.generator = SyntheticDataGenerator(seed)
+        self.results = {}
+    
+    def run(self):
+        """
+        Run every benchmark on a fresh temporary database.
+        
+        Returns:
+            dict: Timings per benchmark and storage statistics
+        """
+        work_dir = tempfile.mkdtemp(prefix="lenthucdontuan-bench-")
+        try:
+            db = DatabaseManager(
+                db_path=os.path.join(work_dir, "data.db"),
+                archive_path=os.path.join(work_dir, "archive.db")
+            )
+            users, recipe_names = self._bench_writes(db)
+            self._bench_lists(db)
+            self._bench_lookups(db, users, recipe_names)
+            self._bench_search(db)
+            return {'results': self.results, 'storage': db.storage_stats()}
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    def _measure(self, name, func, ops=1):
+        """Time a call and record its total and per-operation duration."""
+        start = time.perf_counter()
+        value = func()
+        seconds = time.perf_counter() - start
+        self.results[name] = {
+            'ops': ops,
+            'seconds': round(seconds, 4),
+            'ms_per_op': round(seconds * 1000 / ops, 4) if ops else 0.0
+        }
+        return value
+    
+    def _bench_writes(self, db):
+        """Time the save_* methods while filling the database."""
+        user_count = max(10, self.scale // 50)
+        generator = self.generator
+        
+        users = [generator.user() for _ in range(user_count)]
+        self._measure('save_user', lambda: [db.save_user(user) for user in users], user_count)
+        
+        dishes = [generator.dish() for _ in range(self.scale)]
+        self._measure('save_dish', lambda: [db.save_dish(dish) for dish in dishes], self.scale)
+        
+        recipes = [generator.recipe() for _ in range(self.scale)]
+        self._measure(
+            'save_recipe',
+            lambda: [db.save_recipe(name, content, cuisine_type) for name, cuisine_type, content in recipes],
+            self.scale
+        )
+        
+        menus = [generator.menu(users[index % user_count].id, index) for index in range(self.scale)]
+        self._measure('save_menu', lambda: [db.save_menu(menu) for menu in menus], self.scale)
+        
+        return users, [name for name, _, _ in recipes]
+    
+    def _bench_lists(self, db):
+        """Time the get_all_* listings, cold and from the cache."""
+        for name, loader in (('get_all_users', db.get_all_users),
+                             ('get_all_dishes', db.get_all_dishes),
+                             ('get_all_recipes', db.get_all_recipes),
+                             ('get_all_menus', db.get_all_menus)):
+            db.clear_cache()
+            self._measure(f'{name}.cold', loader)
+            self._measure(f'{name}.warm', loader)
+        
+        # Listing menus no longer decodes them, so time the decoding separately
+        menus = db.get_all_menus()
+        self._measure('menu.get_meals_dict', lambda: [menu.get_meals_dict() for menu in menus], len(menus))
+    
+    def _bench_lookups(self, db, users, recipe_names):
+        """Time single-object lookups on a sample of keys."""
+        random = self.generator.random
+        names = random.sample(recipe_names, min(LOOKUP_SAMPLE_SIZE, len(recipe_names)))
+        user_ids = [user.id for user in random.sample(users, min(USER_SAMPLE_SIZE, len(users)))]
+        
+        db.clear_cache()
+        self._measure('get_recipe_by_name.cold', lambda: [db.get_recipe_by_name(name) for name in names], len(names))
+        self._measure('get_recipe_by_name.warm', lambda: [db.get_recipe_by_name(name) for name in names], len(names))
+        
+        db.clear_cache()
+        self._measure('get_user_menus.cold', lambda: [db.get_user_menus(user_id) for user_id in user_ids], len(user_ids))
+        self._measure('get_user_menus.warm', lambda: [db.get_user_menus(user_id) for user_id in user_ids], len(user_ids))
+        
+        self._measure('get_top_ingredients', lambda: [db.get_top_ingredients(user_id) for user_id in user_ids], len(user_ids))
+        self._measure('get_top_dishes.3_months',
+                      lambda: [db.get_top_dishes(user_id, months=3) for user_id in user_ids], len(user_ids))
+        
+        self._measure('get_nutrition_trend',
+                      lambda: [db.get_nutrition_trend(user_id) for user_id in user_ids], len(user_ids))
+        menu_ids = random.sample(range(1, self.scale + 1), min(LOOKUP_SAMPLE_SIZE, self.scale))
+        self._measure('get_menu_nutrition', lambda: [db.get_menu_nutrition(menu_id) for menu_id in menu_ids],
+                      len(menu_ids))
+    
+    def _bench_search(self, db):
+        """Time the full-text search methods."""
+        self._measure('search_recipes', lambda: [db.search_recipes(query) for query in SEARCH_QUERIES],
+                      len(SEARCH_QUERIES))
+        self._measure('search_menus', lambda: [db.search_menus(query) for query in SEARCH_QUERIES],
+                      len(SEARCH_QUERIES))
+
+
+def _git_revision():
+    """Get the current git commit, or None outside a checkout."""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(scales, seed=42):
+    """
+    Run the benchmark at each scale.
+    
+    Args:
+        scales: Numbers of menus/recipes/dishes to benchmark with
+        seed: Random seed for the synthetic data
+    
+    Returns:
+        dict: JSON-serializable report
+    """
+    report = {
+        'meta': {
+            'date': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'revision': _git_revision(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'storage_codec': STORAGE_CODEC,
+            'seed': seed
+        },
+        'scales': {}
+    }
+    
+    for scale in scales:
+        print(f"Benchmarking {scale} rows...", file=sys.stderr)
+        report['scales'][str(scale)] = DatabaseBenchmark(scale, seed).run()
+    
+    return report
+
+
+def compare_reports(previous, current):
+    """
+    Compare per-operation timings of two reports.
+    
+    Args:
+        previous: Older report
+        current: Newer report
+    
+    Returns:
+        List of (scale, benchmark, previous ms, current ms, ratio) tuples
+    """
+    rows = []
+    for scale, data in current['scales'].items():
+        old_results = previous.get('scales', {}).get(scale, {}).get('results', {})
+        for name, result in data['results'].items():
+            if name not in old_results:
+                continue
+            old_ms = old_results[name]['ms_per_op']
+            new_ms = result['ms_per_op']
+            ratio = round(new_ms / old_ms, 3) if old_ms else None
+            rows.append((scale, name, old_ms, new_ms, ratio))
+    return rows
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Benchmark the database layer")
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES,
+                        help="numbers of menus/recipes/dishes to create")
+    parser.add_argument('--seed', type=int, default=42, help="random seed for the synthetic data")
+    parser.add_argument('--output', help="write the JSON report to this file")
+    parser.add_argument('--compare', help="print timings relative to an earlier JSON report")
+    args = parser.parse_args(argv)
+    
+    report = run_benchmarks(args.scales, args.seed)
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        print(f"{'scale':>8}  {'benchmark':<28} {'before ms':>10} {'after ms':>10} {'ratio':>7}")
+        for scale, name, old_ms, new_ms, ratio in compare_reports(previous, report):
+            print(f"{scale:>8}  {name:<28} {old_ms:>10.4f} {new_ms:>10.4f} {ratio if ratio is not None else '-':>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -18,6 +18,56 @@ OPENAI_MODEL = "gpt-4.1-mini-2025-04-14"  # Sử dụng model mới nhất và t
 
 # Database configuration
 DATABASE_PATH = os.path.join(APP_DATA, 'data.db')
+DATABASE_CACHE_SIZE = 256  # Max cached objects per cache in DatabaseManager
+STORAGE_CODEC = "zlib"  # Compression for recipe content and menu meals: zlib, zstd or none
+
+# Backup configuration
+BACKUP_DIR = os.path.join(APP_DATA, 'backups')
+BACKUP_KEEP = 7  # Number of snapshots kept before the oldest is deleted
+BACKUP_COMPRESS = True  # Gzip snapshots
+BACKUP_PAGES_PER_STEP = 256  # Pages copied per backup step
+BACKUP_STEP_SLEEP = 0.01  # Seconds between steps, so writers can get in
+BACKUP_INTERVAL_HOURS = 24  # Automatic backup interval
+
+# Retention configuration
+ARCHIVE_DATABASE_PATH = os.path.join(APP_DATA, 'archive.db')
+ARCHIVE_CODEC = "zlib"  # Compression for archived menu meals: zlib, zstd or none
+RETENTION_MENUS_PER_USER = 200  # Newer menus stay in data.db, older ones are archived
+VACUUM_STEP_PAGES = 256  # Free pages returned to the OS per idle vacuum step
+VACUUM_IDLE_INTERVAL_MS = 120000  # How often the app is checked for idleness to run a vacuum step
+VACUUM_IDLE_AFTER_MS = 60000  # No user input for this long (and no queued work) counts as idle
+
+# Ranked alternative dishes asked for per meal in the same response, for local swaps.
+# Off by default since they add output tokens; users opt in from the budget panel
+MENU_ALTERNATIVES = 0
+MAX_MENU_ALTERNATIVES = 3  # Most alternatives a user can ask for per meal
+ALTERNATIVE_MAX_TOKENS = 120  # Extra output tokens allowed per alternative
+
+# Menu repair: output tokens allowed for the request regenerating failing meals
+REPAIR_BASE_MAX_TOKENS = 300
+REPAIR_MEAL_MAX_TOKENS = 400  # Added per failing meal
+
+# Dish history configuration
+HISTORY_MENUS_PER_USER = 4  # Recent saved menus whose dishes generation avoids
+HISTORY_PROMPT_DISHES = 30  # Recently eaten dishes listed in the menu prompt
+
+# Job queue configuration
+JOB_WORKERS = 2  # LLM jobs (menus, recipes) running at the same time
+RECIPE_PREFETCH_DAYS = 2  # Days of a new menu whose missing recipes are generated in the background (0 to disable)
+
+# Circuit breaker: after consecutive API failures, calls fail fast and local data is used
+OPENAI_REQUEST_TIMEOUT = 60  # Seconds before an API call is abandoned
+CIRCUIT_FAILURE_THRESHOLD = 3  # Consecutive failed calls that switch to offline mode
+CIRCUIT_RETRY_DELAY = 30  # Seconds before the API is probed again
+CIRCUIT_MAX_RETRY_DELAY = 600  # The delay doubles after every failed probe, up to this
+
+# Hedged requests: a duplicate API call is sent when a call is slower than usual (opt-in)
+HEDGE_REQUESTS = False
+HEDGE_QUANTILE = 0.9  # Latency quantile after which the duplicate is sent
+HEDGE_MAX_RATE = 0.1  # Maximum share of recent calls that are duplicated
+HEDGE_MIN_SAMPLES = 20  # Calls observed before the quantile is used
+HEDGE_DEFAULT_DELAY = 30.0  # Seconds before a duplicate is sent until then
+HEDGE_WINDOW = 200  # Recent calls the latency quantile and hedge rate are computed over
 
 # UI configuration
 APP_NAME = "Lên Thực Đơn Tuần"
@@ -0,0 +1,153 @@
+"""
+Online backups of the application database.
+"""
+import os
+import gzip
+import glob
+import shutil
+import sqlite3
+import logging
+import threading
+import time
+from datetime import datetime
+
+from config import (
+    DATABASE_PATH, BACKUP_DIR, BACKUP_KEEP, BACKUP_COMPRESS,
+    BACKUP_PAGES_PER_STEP, BACKUP_STEP_SLEEP, BACKUP_INTERVAL_HOURS
+)
+
+logger = logging.getLogger(__name__)
+
+BACKUP_PREFIX = "data-"
+BACKUP_TIME_FORMAT = "%Y%m%d-%H%M%S"
+
+
+class BackupManager:
+    """Creates rotated snapshots of the database while the app keeps running.
+    
+    Snapshots are taken with the SQLite backup API a few pages at a time, so
+    the source database is only locked for one short step at a time and
+    writers are never blocked for the whole copy.
+    """
+    
+    def __init__(self, db_path=DATABASE_PATH, backup_dir=BACKUP_DIR, keep=BACKUP_KEEP,
+                 compress=BACKUP_COMPRESS, pages_per_step=BACKUP_PAGES_PER_STEP,
+                 step_sleep=BACKUP_STEP_SLEEP):
+        """Initialize the backup manager."""
+        self.db_path = db_path
+        self.backup_dir = backup_dir
+        self.keep = keep
+        self.compress = compress
+        self.pages_per_step = pages_per_step
+        self.step_sleep = step_sleep
+        self.last_metrics = None
+        
+        # Only one snapshot may be written at a time
+        self._lock = threading.Lock()
+        
+        os.makedirs(self.backup_dir, exist_ok=True)
+    
+    def backup(self):
+        """
+        Write a new snapshot and remove the oldest ones beyond the limit.
+        
+        Returns:
+            dict: Metrics of the snapshot (path, sizes, pages, steps, duration)
+        """
+        with self._lock:
+            start = time.perf_counter()
+            timestamp = datetime.now().strftime(BACKUP_TIME_FORMAT)
+            snapshot_path = os.path.join(self.backup_dir, f"{BACKUP_PREFIX}{timestamp}.db")
+            partial_path = snapshot_path + ".part"
+            progress = {'steps': 0, 'pages': 0}
+            
+            def on_progress(status, remaining, total):
+                progress['steps'] += 1
+                progress['pages'] = total
+            
+            source = sqlite3.connect(self.db_path)
+            target = sqlite3.connect(partial_path)
+            try:
+                # The copy restarts by itself if another connection writes mid-way
+                source.backup(target, pages=self.pages_per_step, progress=on_progress,
+                              sleep=self.step_sleep)
+            except Exception:
+                target.close()
+                self._remove_quietly(partial_path)
+                raise
+            finally:
+                source.close()
+            target.close()
+            
+            raw_bytes = os.path.getsize(partial_path)
+            if self.compress:
+                snapshot_path += ".gz"
+                with open(partial_path, 'rb') as src, gzip.open(snapshot_path, 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+                os.remove(partial_path)
+            else:
+                os.replace(partial_path, snapshot_path)
+            
+            removed = self._rotate()
+            
+            self.last_metrics = {
+                'path': snapshot_path,
+                'database_bytes': os.path.getsize(self.db_path),
+                'snapshot_bytes': raw_bytes,
+                'stored_bytes': os.path.getsize(snapshot_path),
+                'pages': progress['pages'],
+                'steps': progress['steps'],
+                'seconds': round(time.perf_counter() - start, 3),
+                'removed': removed
+            }
+            logger.info(f"Database backup written: {self.last_metrics}")
+            return self.last_metrics
+    
+    def list_backups(self):
+        """
+        List existing snapshots.
+        
+        Returns:
+            list: Snapshot paths, newest first
+        """
+        pattern = os.path.join(self.backup_dir, f"{BACKUP_PREFIX}*.db*")
+        paths = [path for path in glob.glob(pattern) if not path.endswith(".part")]
+        # Timestamps in the names sort chronologically
+        return sorted(paths, key=os.path.basename, reverse=True)
+    
+    def last_backup_time(self):
+        """Get the time of the newest snapshot, or None if there is none."""
+        backups = self.list_backups()
+        if not backups:
+            return None
+        
+        name = os.path.basename(backups[0])[len(BACKUP_PREFIX):].split('.')[0]
+        try:
+            return datetime.strptime(name, BACKUP_TIME_FORMAT)
+        except ValueError:
+            return datetime.fromtimestamp(os.path.getmtime(backups[0]))
+    
+    def is_due(self, interval_hours=BACKUP_INTERVAL_HOURS):
+        """Check whether the newest snapshot is older than the backup interval."""
+        last = self.last_backup_time()
+        if last is None:
+            return True
+        return (datetime.now() - last).total_seconds() >= interval_hours * 3600
+    
+    def _rotate(self):
+        """Delete the oldest snapshots beyond the configured number to keep."""
+        removed = []
+        for path in self.list_backups()[self.keep:]:
+            if self._remove_quietly(path):
+                removed.append(path)
+        return removed
+    
+    @staticmethod
+    def _remove_quietly(path):
+        """Remove a file, logging instead of raising on failure."""
+        try:
+            os.remove(path)
+            return True
+        except OSError as e:
+            logger.warning(f"Could not remove {path}: {str(e)}")
+            return False
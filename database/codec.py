@@ -0,0 +1,153 @@
+"""
+Storage codec for large JSON text columns.
+
+Values are stored as BLOBs whose first byte tags the format, so rows written
+with different codecs (or before compression existed) can live side by side.
+"""
+import logging
+import threading
+import time
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # Optional, zlib is always available
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Format tag bytes
+TAG_RAW = 0x00
+TAG_ZLIB = 0x01
+TAG_ZSTD = 0x02
+
+# Values shorter than this are not worth compressing
+MIN_COMPRESS_SIZE = 128
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+
+
+class CodecStats:
+    """Counters comparing bytes saved with the time spent encoding and decoding."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Reset all counters."""
+        self.encoded_values = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self.encode_seconds = 0.0
+        self.decoded_values = 0
+        self.decoded_bytes = 0
+        self.decode_seconds = 0.0
+
+    def record_encode(self, raw_size, stored_size, seconds):
+        """Record one encoded value."""
+        with self._lock:
+            self.encoded_values += 1
+            self.raw_bytes += raw_size
+            self.stored_bytes += stored_size
+            self.encode_seconds += seconds
+
+    def record_decode(self, stored_size, seconds):
+        """Record one decoded value."""
+        with self._lock:
+            self.decoded_values += 1
+            self.decoded_bytes += stored_size
+            self.decode_seconds += seconds
+
+    def to_dict(self):
+        """Get the counters as a dictionary."""
+        with self._lock:
+            return {
+                'encoded_values': self.encoded_values,
+                'raw_bytes': self.raw_bytes,
+                'stored_bytes': self.stored_bytes,
+                'compression_ratio': round(self.stored_bytes / self.raw_bytes, 3) if self.raw_bytes else 1.0,
+                'encode_ms': round(self.encode_seconds * 1000, 3),
+                'decoded_values': self.decoded_values,
+                'decoded_bytes': self.decoded_bytes,
+                'decode_ms': round(self.decode_seconds * 1000, 3)
+            }
+
+
+stats = CodecStats()
+
+
+def _compress(data, codec):
+    """Compress bytes with the named codec, returning (tag, payload)."""
+    if codec == 'zstd':
+        if zstandard is not None:
+            return TAG_ZSTD, zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+        logger.warning("zstandard is not installed, falling back to zlib")
+    return TAG_ZLIB, zlib.compress(data, ZLIB_LEVEL)
+
+
+def encode_text(text, codec='zlib'):
+    """
+    Encode text for storage.
+
+    Args:
+        text: Text to store (None is passed through)
+        codec: 'zlib', 'zstd' or 'none'
+
+    Returns:
+        Tagged bytes, or None
+    """
+    if text is None:
+        return None
+
+    start = time.perf_counter()
+    data = text.encode('utf-8')
+    tag, payload = TAG_RAW, data
+
+    if codec != 'none' and len(data) >= MIN_COMPRESS_SIZE:
+        compressed_tag, compressed = _compress(data, codec)
+        if len(compressed) < len(data):
+            tag, payload = compressed_tag, compressed
+
+    encoded = bytes([tag]) + payload
+    stats.record_encode(len(data), len(encoded), time.perf_counter() - start)
+    return encoded
+
+
+def decode_text(value):
+    """
+    Decode a stored value back to text.
+
+    Args:
+        value: Tagged bytes, legacy plain text, or None
+
+    Returns:
+        Decoded text, or None
+
+    Raises:
+        ValueError: If the value has an unknown format tag
+    """
+    if value is None or isinstance(value, str):
+        # Plain text rows written before compression was introduced
+        return value
+
+    start = time.perf_counter()
+    value = bytes(value)
+    if not value:
+        return ""
+
+    tag, payload = value[0], value[1:]
+    if tag == TAG_RAW:
+        text = payload.decode('utf-8')
+    elif tag == TAG_ZLIB:
+        text = zlib.decompress(payload).decode('utf-8')
+    elif tag == TAG_ZSTD:
+        if zstandard is None:
+            raise ValueError("Value is zstd-compressed but zstandard is not installed")
+        text = zstandard.ZstdDecompressor().decompress(payload).decode('utf-8')
+    else:
+        raise ValueError(f"Unknown storage format tag: {tag}")
+
+    stats.record_decode(len(value), time.perf_counter() - start)
+    return text
@@ -0,0 +1,103 @@
+"""
+Executor for running database calls off the Qt GUI thread.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseExecutor(QObject):
+    """Runs database calls on worker threads and reports results on the GUI thread.
+
+    Each table gets its own single-threaded lane, so reads and writes on the
+    same table run in submission order while different tables do not wait
+    for each other.
+    """
+
+    # Carries (callback, value) from a worker thread to the GUI thread
+    _deliver = pyqtSignal(object, object)
+
+    def __init__(self, db_manager, parent=None):
+        """Initialize the executor for a database manager."""
+        super().__init__(parent)
+
+        self.db_manager = db_manager
+        self._lanes = {}
+        self._lock = threading.Lock()
+        self._shutdown = False
+        self._pending = 0  # Calls submitted and not finished
+
+        # Queued automatically, since the signal is emitted from worker threads
+        self._deliver.connect(self._on_deliver)
+
+    def _get_lane(self, table):
+        """Get (or create) the worker lane for a table."""
+        with self._lock:
+            if table not in self._lanes:
+                self._lanes[table] = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix=f"db-{table}"
+                )
+            return self._lanes[table]
+
+    def submit(self, table, func, *args, on_result=None, on_error=None, **kwargs):
+        """Run a database call on the lane of the given table.
+
+        Args:
+            table: Name of the table the call reads or writes, used for ordering
+            func: Callable to run, usually a DatabaseManager method
+            on_result: Called on the GUI thread with the return value
+            on_error: Called on the GUI thread with the raised exception
+
+        Returns:
+            concurrent.futures.Future: Future for the call
+        """
+        if self._shutdown:
+            raise RuntimeError("Database executor has been shut down")
+
+        with self._lock:
+            self._pending += 1
+        future = self._get_lane(table).submit(func, *args, **kwargs)
+        future.add_done_callback(lambda done: self._dispatch(done, on_result, on_error))
+        return future
+
+    def pending(self):
+        """Number of calls submitted that have not finished."""
+        with self._lock:
+            return self._pending
+
+    def _dispatch(self, future, on_result, on_error):
+        """Forward a finished call to its callbacks (runs on the worker thread)."""
+        with self._lock:
+            self._pending -= 1
+        if future.cancelled():
+            return
+
+        error = future.exception()
+        if error is not None:
+            logger.error(f"Database call failed: {str(error)}")
+            if on_error:
+                self._deliver.emit(on_error, error)
+        elif on_result:
+            self._deliver.emit(on_result, future.result())
+
+    def _on_deliver(self, callback, value):
+        """Run a callback on the GUI thread."""
+        try:
+            callback(value)
+        except RuntimeError as e:
+            # The widget waiting for the result was closed in the meantime
+            logger.warning(f"Dropped database result: {str(e)}")
+
+    def shutdown(self, wait=True):
+        """Stop all lanes, optionally waiting for queued calls to finish."""
+        with self._lock:
+            self._shutdown = True
+            lanes = list(self._lanes.values())
+            self._lanes.clear()
+
+        for lane in lanes:
+            lane.shutdown(wait=wait)
@@ -4,22 +4,203 @@ Database manager for handling database operations.
 import sqlite3
 import json
 import os
+import logging
+from collections import Counter
+from datetime import datetime
 from .models import User, Dish, Menu, Recipe
-from config import DATABASE_PATH
+from .cache import LRUCache
+from . import codec
+from .codec import encode_text, decode_text
+from config import (
+    DATABASE_PATH, DATABASE_CACHE_SIZE, STORAGE_CODEC, ARCHIVE_DATABASE_PATH,
+    ARCHIVE_CODEC, RETENTION_MENUS_PER_USER, VACUUM_STEP_PAGES, HISTORY_MENUS_PER_USER
+)
+from utils.text_normalizer import fold_vietnamese, tokenize_folded
+from utils.ingredient_canonicalizer import canonical, canonical_key
+from utils.nutrition import NUTRIENTS, menu_nutrition
+from utils.dish_history import DishHistory
+
+logger = logging.getLogger(__name__)
+
+# Default number of rows returned by the full-text search methods
+DEFAULT_SEARCH_LIMIT = 50
+
+# Marker for "not in cache", since None is a valid cached lookup result
+_MISSING = object()
+
+# Bumped whenever _migrate_schema gains a new step (stored in PRAGMA user_version)
+SCHEMA_VERSION = 7
+
+# Rows rewritten per batch by data migrations
+MIGRATION_BATCH_SIZE = 200
+
+# Default number of rows returned by the usage statistics queries
+DEFAULT_STATS_LIMIT = 10
+
+
+def _fts_fold(text):
+    """SQL function: fold text for the full-text index."""
+    return fold_vietnamese(text)
+
+
+def _fts_recipe_text(content, field):
+    """SQL function: extract folded ingredient or step text from recipe content."""
+    try:
+        content = decode_text(content)
+        data = json.loads(content) if content else {}
+    except (TypeError, ValueError):
+        return ""
+    if not isinstance(data, dict):
+        return ""
+    
+    recipe = data.get("recipe", data)
+    if not isinstance(recipe, dict):
+        return ""
+    
+    parts = []
+    for entry in recipe.get(field) or []:
+        if isinstance(entry, dict):
+            # Ingredients use "item" (or "name"), steps use "description"
+            parts.append(str(entry.get("item") or entry.get("name") or entry.get("description") or ""))
+        else:
+            parts.append(str(entry))
+    if field == "ingredients":
+        return _ingredient_text(parts)
+    return fold_vietnamese(" ".join(parts))
+
+
+def _fts_menu_text(meals, field):
+    """SQL function: extract folded dish names or ingredients from menu meals."""
+    try:
+        meals = decode_text(meals)
+    except ValueError:
+        return ""
+    
+    parts = []
+    for day_meals in Menu.parse_meals(meals).values():
+        if not isinstance(day_meals, dict):
+            continue
+        for meal_info in day_meals.values():
+            if not isinstance(meal_info, dict):
+                continue
+            if field == "dishes":
+                parts.append(str(meal_info.get("name", "")))
+            else:
+                parts.extend(str(item) for item in meal_info.get("ingredients") or [])
+    if field == "ingredients":
+        return _ingredient_text(parts)
+    return fold_vietnamese(" ".join(parts))
+
+
+def _ingredient_text(ingredients):
+    """Folded ingredient text plus canonical names, so "thit lon" also finds "thịt heo"."""
+    keys = {fold_vietnamese(canonical_key(item)) for item in ingredients}
+    return " ".join([fold_vietnamese(" ".join(ingredients))] + sorted(key for key in keys if key))
+
+
+def _menu_usage(meals):
+    """Count how many meals of a menu use each ingredient and each dish.
+    
+    Returns:
+        tuple: (ingredient key counts, dish counts, {ingredient key: display name})
+    """
+    ingredients = Counter()
+    dishes = Counter()
+    names = {}
+    
+    for day_meals in Menu.parse_meals(meals).values():
+        if not isinstance(day_meals, dict):
+            continue
+        for meal_info in day_meals.values():
+            if not isinstance(meal_info, dict):
+                continue
+            name = str(meal_info.get("name") or "").strip()
+            if name:
+                dishes[name] += 1
+            # A meal listing an ingredient twice still uses it once
+            keys = set()
+            for item in meal_info.get("ingredients") or []:
+                key = canonical_key(item)
+                if key:
+                    keys.add(key)
+                    # A spelling with diacritics is the better name to show
+                    name = canonical(item)
+                    if key not in names or fold_vietnamese(names[key]) == names[key]:
+                        names[key] = name if fold_vietnamese(name) != name else key
+            ingredients.update(keys)
+    return ingredients, dishes, names
+
+
+def _as_int(value):
+    """Convert a meal's cost or time to an int, None if it is not numeric."""
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _menu_dishes(meals):
+    """Get the distinct dishes of a menu as (name, ingredients, time, cost) tuples."""
+    dishes = {}
+    for day_meals in Menu.parse_meals(meals).values():
+        if not isinstance(day_meals, dict):
+            continue
+        for meal_info in day_meals.values():
+            if not isinstance(meal_info, dict):
+                continue
+            name = str(meal_info.get("name") or "").strip()
+            if name:
+                dishes[name] = (
+                    name,
+                    list(meal_info.get("ingredients") or []),
+                    _as_int(meal_info.get("preparation_time")),
+                    _as_int(meal_info.get("estimated_cost"))
+                )
+    return list(dishes.values())
+
+
+def _usage_period(creation_date):
+    """Get the monthly stats bucket ("YYYY-MM") of a menu creation date."""
+    return (creation_date or datetime.now().strftime("%Y-%m-%d"))[:7]
+
+
+def _period_months_ago(months):
+    """Get the first monthly bucket of a window covering the last N months."""
+    now = datetime.now()
+    index = now.year * 12 + now.month - 1 - (months - 1)
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
 
 
 class DatabaseManager:
     """Manager for database operations."""
     
-    def __init__(self, db_path=DATABASE_PATH):
+    def __init__(self, db_path=DATABASE_PATH, archive_path=ARCHIVE_DATABASE_PATH):
         """Initialize the database manager with the database path."""
         self.db_path = db_path
+        self.archive_path = archive_path
+        self.fts_enabled = True
+        
+        # Read-through caches, invalidated by every write and delete
+        self._user_cache = LRUCache(DATABASE_CACHE_SIZE)
+        self._recipe_cache = LRUCache(DATABASE_CACHE_SIZE)
+        self._recipe_name_cache = LRUCache(DATABASE_CACHE_SIZE)
+        self._list_cache = LRUCache(DATABASE_CACHE_SIZE)
+        # Recent dishes per user, updated in place when a new menu is saved
+        self._history_cache = LRUCache(DATABASE_CACHE_SIZE)
+        
         self._create_tables_if_not_exist()
+        # Converting an older database rebuilds the whole file, so it is left
+        # for idle time (see enable_incremental_vacuum)
+        self.needs_vacuum_conversion = self._auto_vacuum_mode() != 2
     
     def _get_connection(self):
         """Get a connection to the database."""
         conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        
+        # Functions used by the full-text search triggers
+        conn.create_function("fts_fold", 1, _fts_fold, deterministic=True)
+        conn.create_function("fts_recipe_text", 2, _fts_recipe_text, deterministic=True)
+        conn.create_function("fts_menu_text", 2, _fts_menu_text, deterministic=True)
         return conn
     
     def _create_tables_if_not_exist(self):
@@ -27,6 +208,9 @@ class DatabaseManager:
         conn = self._get_connection()
         cursor = conn.cursor()
         
+        # Only takes effect on a new database, existing ones are converted later
+        cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        
         # Create Users table
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -77,8 +261,527 @@ class DatabaseManager:
         )
         ''')
         
+        # Usage statistics, maintained by save_menu and delete_menu
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_ingredient_stats (
+            user_id INTEGER NOT NULL,
+            ingredient TEXT NOT NULL,
+            period TEXT NOT NULL,
+            uses INTEGER NOT NULL,
+            name TEXT,
+            PRIMARY KEY (user_id, ingredient, period)
+        ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_dish_stats (
+            user_id INTEGER NOT NULL,
+            dish TEXT NOT NULL,
+            period TEXT NOT NULL,
+            uses INTEGER NOT NULL,
+            PRIMARY KEY (user_id, dish, period)
+        ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_user_ingredient_stats_period
+        ON user_ingredient_stats (user_id, period)
+        ''')
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_user_dish_stats_period
+        ON user_dish_stats (user_id, period)
+        ''')
+        
+        # Parsed nutrition of every saved meal, maintained by save_menu and delete_menu;
+        # the rows of archived menus are kept, so nutrition trends cover the same history
+        # as the usage statistics
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS menu_nutrition (
+            menu_id INTEGER NOT NULL,
+            slot INTEGER NOT NULL,
+            user_id INTEGER,
+            menu_date TEXT NOT NULL,
+            day TEXT NOT NULL,
+            meal_time TEXT NOT NULL,
+            protein REAL,
+            carbs REAL,
+            fat REAL,
+            calories REAL,
+            PRIMARY KEY (menu_id, slot)
+        ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_menu_nutrition_user
+        ON menu_nutrition (user_id, menu_date, day, protein, carbs, fat, calories)
+        ''')
+        
+        # Ingredient prices per base unit (g, ml, quả...), keyed by canonical name
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ingredient_prices (
+            ingredient TEXT NOT NULL,
+            unit TEXT NOT NULL,
+            name TEXT,
+            price REAL NOT NULL,
+            updated_date TEXT,
+            PRIMARY KEY (ingredient, unit)
+        ) WITHOUT ROWID
+        ''')
+        
+        # Locally computed menu costs, refreshed when the price table changes
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS menu_costs (
+            menu_id INTEGER PRIMARY KEY,
+            total_cost REAL,
+            meal_costs TEXT,
+            over_budget_meals INTEGER NOT NULL DEFAULT 0,
+            priced_date TEXT,
+            FOREIGN KEY (menu_id) REFERENCES menus (id)
+        )
+        ''')
+        
+        # Weekly menus being generated, checkpointed one day at a time so a
+        # failed or interrupted generation can resume with the missing days
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS generation_drafts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            cuisine_type TEXT,
+            settings TEXT NOT NULL,
+            created_date TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS generation_draft_days (
+            draft_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            meals TEXT,
+            error TEXT,
+            updated_date TEXT,
+            PRIMARY KEY (draft_id, day)
+        ) WITHOUT ROWID
+        ''')
+        
+        # LLM jobs that are queued or running, see api.job_manager; a job's
+        # row is deleted when it ends, so the rows left at startup are
+        # the jobs the last session did not finish
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            job_key TEXT NOT NULL UNIQUE,
+            priority INTEGER NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL,
+            created_date TEXT,
+            updated_date TEXT
+        )
+        ''')
+        
+        # Dish catalog lookups by name, used when saving menus
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_dishes_name
+        ON dishes (name, cuisine_type)
+        ''')
+        
+        # Most recent menus of a user, read by the dish history
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_menus_user_date
+        ON menus (user_id, creation_date)
+        ''')
+        
+        search_index_built = self._create_search_index(cursor)
+        self._migrate_schema(cursor, search_index_built)
+        
+        conn.commit()
+        conn.close()
+    
+    def _migrate_schema(self, cursor, search_index_built=False):
+        """Bring data written by older versions up to SCHEMA_VERSION."""
+        cursor.execute('PRAGMA user_version')
+        version = cursor.fetchone()[0]
+        
+        if version < 6:
+            # Version 6 stores the display name of ingredient statistics; the
+            # column is added first, since the rebuilds below write it
+            cursor.execute('PRAGMA table_info(user_ingredient_stats)')
+            if 'name' not in {row[1] for row in cursor.fetchall()}:
+                cursor.execute('ALTER TABLE user_ingredient_stats ADD COLUMN name TEXT')
+        
+        if version < 1:
+            # Version 1: compress recipe content and menu meals in place
+            self._compress_column(cursor, 'recipes', 'content')
+            self._compress_column(cursor, 'menus', 'meals')
+        
+        if version < 2:
+            # Version 2: build usage statistics from the existing menus
+            self._rebuild_usage_stats(cursor)
+        
+        if version < 3:
+            # Version 3: key statistics and search by canonical ingredient names
+            if version >= 2:
+                self._rebuild_usage_stats(cursor)
+            if self.fts_enabled and not search_index_built:
+                self._rebuild_search_index(cursor)
+        
+        if version < 4:
+            # Version 4: fill the dish catalog from the dishes of existing menus
+            cursor.execute('SELECT cuisine_type, meals FROM menus ORDER BY id')
+            for cuisine_type, meals in cursor.fetchall():
+                self._catalog_menu_dishes(cursor, cuisine_type, decode_text(meals))
+        
+        if version < 5:
+            # Version 5: parse the nutrition of existing menus into menu_nutrition
+            cursor.execute('SELECT id, user_id, creation_date, meals FROM menus ORDER BY id')
+            for menu_id, user_id, creation_date, meals in cursor.fetchall():
+                self._store_menu_nutrition(cursor, menu_id, user_id, creation_date, decode_text(meals))
+        
+        if version < 6:
+            # Version 6: ingredient keys keep their diacritics, so "bò" and "bơ" differ
+            if version >= 3:
+                self._rebuild_usage_stats(cursor)
+                if self.fts_enabled and not search_index_built:
+                    self._rebuild_search_index(cursor)
+            self._rekey_ingredient_prices(cursor)
+        
+        if version < 7:
+            # Version 7: restore the nutrition rows that archiving used to delete
+            for menu in self.get_archived_menus():
+                cursor.execute('SELECT 1 FROM menu_nutrition WHERE menu_id = ? LIMIT 1', (menu.id,))
+                if cursor.fetchone() is None:
+                    self._store_menu_nutrition(cursor, menu.id, menu.user_id, menu.creation_date, menu.meals)
+        
+        if version != SCHEMA_VERSION:
+            cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    
+    def _compress_column(self, cursor, table, column):
+        """Re-encode plain-text values of a column with the storage codec."""
+        cursor.execute(f"SELECT id, {column} FROM {table} WHERE typeof({column}) = 'text'")
+        rows = cursor.fetchall()
+        
+        for start in range(0, len(rows), MIGRATION_BATCH_SIZE):
+            batch = rows[start:start + MIGRATION_BATCH_SIZE]
+            cursor.executemany(
+                f'UPDATE {table} SET {column} = ? WHERE id = ?',
+                [(encode_text(row[1], STORAGE_CODEC), row[0]) for row in batch]
+            )
+        
+        if rows:
+            logger.info(f"Compressed {len(rows)} rows of {table}.{column}")
+    
+    def _auto_vacuum_mode(self):
+        """Get the auto-vacuum mode of the database (2 is incremental)."""
+        conn = self._get_connection()
+        mode = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+        conn.close()
+        return mode
+    
+    def enable_incremental_vacuum(self):
+        """Switch the database to incremental auto-vacuum with a one-time VACUUM.
+        
+        Rebuilds the whole file, so it is meant to run once in idle time off
+        the GUI thread; does nothing if the database is already converted.
+        
+        Returns:
+            bool: True if the database was converted
+        """
+        conn = self._get_connection()
+        conn.isolation_level = None  # VACUUM cannot run inside a transaction
+        
+        converted = False
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            logger.info("Enabling incremental auto-vacuum (one-time VACUUM)")
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.execute('VACUUM')
+            converted = True
+        
+        conn.close()
+        self.needs_vacuum_conversion = False
+        
+        return converted
+    
+    def incremental_vacuum(self, pages=VACUUM_STEP_PAGES):
+        """Return up to the given number of free pages to the file system.
+        
+        Meant to run in idle time, so freeing space left by deletes never
+        stalls the UI for long.
+        
+        Returns:
+            int: Number of pages freed
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        free_before = cursor.execute('PRAGMA freelist_count').fetchone()[0]
+        if free_before:
+            # The pragma frees one page per step, so it must be fully consumed
+            cursor.execute(f'PRAGMA incremental_vacuum({int(pages)})').fetchall()
+        free_after = cursor.execute('PRAGMA freelist_count').fetchone()[0]
+        
         conn.commit()
         conn.close()
+        
+        return free_before - free_after
+    
+    def _rebuild_usage_stats(self, cursor):
+        """Recompute the usage statistics tables from all saved menus."""
+        cursor.execute('DELETE FROM user_ingredient_stats')
+        cursor.execute('DELETE FROM user_dish_stats')
+        
+        cursor.execute('SELECT user_id, creation_date, meals FROM menus WHERE user_id IS NOT NULL')
+        for user_id, creation_date, meals in cursor.fetchall():
+            self._apply_usage_stats(cursor, user_id, creation_date, decode_text(meals), 1)
+    
+    def _apply_usage_stats(self, cursor, user_id, creation_date, meals, sign):
+        """Add (sign=1) or remove (sign=-1) the usage counts of one menu."""
+        if user_id is None:
+            return
+        
+        ingredients, dishes, names = _menu_usage(meals)
+        period = _usage_period(creation_date)
+        
+        if ingredients:
+            # The first display name seen for a key is kept
+            cursor.executemany('''
+            INSERT INTO user_ingredient_stats (user_id, ingredient, period, uses, name)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (user_id, ingredient, period) DO UPDATE SET
+                uses = uses + excluded.uses, name = COALESCE(name, excluded.name)
+            ''', [(user_id, key, period, sign * count, names[key]) for key, count in ingredients.items()])
+        if dishes:
+            cursor.executemany('''
+            INSERT INTO user_dish_stats (user_id, dish, period, uses)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (user_id, dish, period) DO UPDATE SET uses = uses + excluded.uses
+            ''', [(user_id, key, period, sign * count) for key, count in dishes.items()])
+        
+        for table, counts in (('user_ingredient_stats', ingredients), ('user_dish_stats', dishes)):
+            if counts and sign < 0:
+                cursor.execute(f'DELETE FROM {table} WHERE user_id = ? AND period = ? AND uses <= 0',
+                               (user_id, period))
+    
+    def _rekey_ingredient_prices(self, cursor):
+        """Key stored prices by the current canonical key of their name."""
+        cursor.execute('''
+        SELECT ingredient, unit, name, price, updated_date FROM ingredient_prices
+        ORDER BY updated_date, ingredient
+        ''')
+        rows = cursor.fetchall()
+        
+        cursor.execute('DELETE FROM ingredient_prices')
+        # Prices whose keys now coincide keep the most recent one
+        cursor.executemany('''
+        INSERT OR REPLACE INTO ingredient_prices (ingredient, unit, name, price, updated_date)
+        VALUES (?, ?, ?, ?, ?)
+        ''', [(canonical_key(name or ingredient) or ingredient, unit, name, price, updated_date)
+              for ingredient, unit, name, price, updated_date in rows])
+    
+    def _catalog_menu_dishes(self, cursor, cuisine_type, meals):
+        """Add the dishes of a menu to the dish catalog, updating dishes already in it."""
+        for name, ingredients, preparation_time, estimated_cost in _menu_dishes(meals):
+            cursor.execute('SELECT id FROM dishes WHERE name = ? AND cuisine_type IS ?',
+                           (name, cuisine_type))
+            row = cursor.fetchone()
+            values = (json.dumps(ingredients), preparation_time, estimated_cost)
+            if row:
+                cursor.execute('''
+                UPDATE dishes SET ingredients = ?, preparation_time = ?, estimated_cost = ?
+                WHERE id = ?
+                ''', values + (row[0],))
+            else:
+                cursor.execute('''
+                INSERT INTO dishes (name, cuisine_type, ingredients, preparation_time, estimated_cost)
+                VALUES (?, ?, ?, ?, ?)
+                ''', (name, cuisine_type) + values)
+    
+    def _store_menu_nutrition(self, cursor, menu_id, user_id, creation_date, meals):
+        """Replace the parsed nutrition rows of a menu."""
+        cursor.execute('DELETE FROM menu_nutrition WHERE menu_id = ?', (menu_id,))
+        
+        slots, values = menu_nutrition(Menu.parse_meals(meals))
+        if not slots:
+            return
+        
+        menu_date = (creation_date or datetime.now().strftime("%Y-%m-%d"))[:10]
+        cursor.executemany(f'''
+        INSERT INTO menu_nutrition (menu_id, slot, user_id, menu_date, day, meal_time, {", ".join(NUTRIENTS)})
+        VALUES (?, ?, ?, ?, ?, ?{", ?" * len(NUTRIENTS)})
+        ''', [
+            (menu_id, slot, user_id, menu_date, day, meal_time) +
+            tuple(None if value != value else float(value) for value in row)  # NaN is stored as NULL
+            for slot, ((day, meal_time), row) in enumerate(zip(slots, values))
+        ])
+    
+    def _remove_menu_usage(self, cursor, menu_id):
+        """Remove the usage counts of a stored menu before it is changed or deleted."""
+        cursor.execute('SELECT user_id, creation_date, meals FROM menus WHERE id = ?', (menu_id,))
+        row = cursor.fetchone()
+        if row:
+            self._apply_usage_stats(cursor, row[0], row[1], decode_text(row[2]), -1)
+    
+    def storage_stats(self):
+        """Compare the bytes saved by the storage codec with its encode/decode cost.
+        
+        Returns:
+            dict: Stored sizes per column, the database file size and codec counters
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        columns = {}
+        for table, column in (('recipes', 'content'), ('menus', 'meals')):
+            cursor.execute(f'SELECT COUNT(*), COALESCE(SUM(length({column})), 0) FROM {table}')
+            count, stored_bytes = cursor.fetchone()
+            columns[f'{table}.{column}'] = {'rows': count, 'stored_bytes': stored_bytes}
+        
+        conn.close()
+        
+        return {
+            'codec': STORAGE_CODEC,
+            'columns': columns,
+            'file_bytes': os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0,
+            'codec_stats': codec.stats.to_dict()
+        }
+    
+    def _create_search_index(self, cursor):
+        """Create the FTS5 search tables and the triggers keeping them in sync.
+        
+        Returns:
+            bool: True if the tables were new and have just been filled
+        """
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'recipes_fts'")
+        needs_rebuild = cursor.fetchone() is None
+        
+        try:
+            # Folded text is indexed, so "pho bo" matches "Phở bò"
+            cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS recipes_fts USING fts5(
+                name, ingredients, steps,
+                tokenize = 'unicode61 remove_diacritics 2'
+            )
+            ''')
+            cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS menus_fts USING fts5(
+                name, dishes, ingredients,
+                tokenize = 'unicode61 remove_diacritics 2'
+            )
+            ''')
+        except sqlite3.OperationalError as e:
+            # SQLite was built without FTS5, fall back to LIKE queries
+            logger.warning(f"Full-text search unavailable: {str(e)}")
+            self.fts_enabled = False
+            return False
+        
+        cursor.executescript('''
+        CREATE TRIGGER IF NOT EXISTS recipes_fts_insert AFTER INSERT ON recipes BEGIN
+            INSERT INTO recipes_fts (rowid, name, ingredients, steps)
+            VALUES (new.id, fts_fold(new.name),
+                    fts_recipe_text(new.content, 'ingredients'),
+                    fts_recipe_text(new.content, 'steps'));
+        END;
+        
+        CREATE TRIGGER IF NOT EXISTS recipes_fts_delete AFTER DELETE ON recipes BEGIN
+            DELETE FROM recipes_fts WHERE rowid = old.id;
+        END;
+        
+        CREATE TRIGGER IF NOT EXISTS recipes_fts_update AFTER UPDATE ON recipes BEGIN
+            DELETE FROM recipes_fts WHERE rowid = old.id;
+            INSERT INTO recipes_fts (rowid, name, ingredients, steps)
+            VALUES (new.id, fts_fold(new.name),
+                    fts_recipe_text(new.content, 'ingredients'),
+                    fts_recipe_text(new.content, 'steps'));
+        END;
+        
+        CREATE TRIGGER IF NOT EXISTS menus_fts_insert AFTER INSERT ON menus BEGIN
+            INSERT INTO menus_fts (rowid, name, dishes, ingredients)
+            VALUES (new.id, fts_fold(new.name),
+                    fts_menu_text(new.meals, 'dishes'),
+                    fts_menu_text(new.meals, 'ingredients'));
+        END;
+        
+        CREATE TRIGGER IF NOT EXISTS menus_fts_delete AFTER DELETE ON menus BEGIN
+            DELETE FROM menus_fts WHERE rowid = old.id;
+        END;
+        
+        CREATE TRIGGER IF NOT EXISTS menus_fts_update AFTER UPDATE ON menus BEGIN
+            DELETE FROM menus_fts WHERE rowid = old.id;
+            INSERT INTO menus_fts (rowid, name, dishes, ingredients)
+            VALUES (new.id, fts_fold(new.name),
+                    fts_menu_text(new.meals, 'dishes'),
+                    fts_menu_text(new.meals, 'ingredients'));
+        END;
+        ''')
+        
+        if needs_rebuild:
+            # Index rows saved before the search tables existed
+            self._rebuild_search_index(cursor)
+        return needs_rebuild
+    
+    def _rebuild_search_index(self, cursor):
+        """Re-index all recipes and menus."""
+        cursor.execute('DELETE FROM recipes_fts')
+        cursor.execute('DELETE FROM menus_fts')
+        cursor.execute('''
+        INSERT INTO recipes_fts (rowid, name, ingredients, steps)
+        SELECT id, fts_fold(name), fts_recipe_text(content, 'ingredients'),
+               fts_recipe_text(content, 'steps')
+        FROM recipes
+        ''')
+        cursor.execute('''
+        INSERT INTO menus_fts (rowid, name, dishes, ingredients)
+        SELECT id, fts_fold(name), fts_menu_text(meals, 'dishes'),
+               fts_menu_text(meals, 'ingredients')
+        FROM menus
+        ''')
+    
+    def _invalidate_lists(self, *tables):
+        """Drop cached list results for the given tables."""
+        self._list_cache.invalidate_where(lambda key: key[0] in tables)
+    
+    def _cached_list(self, key, loader):
+        """Get a list result from the cache, loading it on a miss."""
+        items = self._list_cache.get(key, _MISSING)
+        if items is _MISSING:
+            items = loader()
+            self._list_cache.put(key, items)
+        # Callers get their own list so they cannot reorder the cached one
+        return list(items)
+    
+    def cache_stats(self):
+        """Get hit/miss statistics for each cache.
+        
+        Returns:
+            dict: Cache name to its size, hits, misses and hit rate
+        """
+        return {
+            'users': self._user_cache.stats(),
+            'recipes': self._recipe_cache.stats(),
+            'recipe_names': self._recipe_name_cache.stats(),
+            'lists': self._list_cache.stats(),
+            'dish_history': self._history_cache.stats()
+        }
+    
+    def clear_cache(self):
+        """Drop all cached objects, e.g. after the database file changed on disk."""
+        self._user_cache.clear()
+        self._recipe_cache.clear()
+        self._recipe_name_cache.clear()
+        self._list_cache.clear()
+        self._history_cache.clear()
+    
+    @staticmethod
+    def _build_match_query(query):
+        """Turn free text into an FTS5 prefix query over folded tokens.
+        
+        If the query names an ingredient by a variant ("thịt lợn"), its
+        canonical name is searched as an alternative.
+        """
+        tokens = tokenize_folded(query)
+        match_query = " ".join(f'"{token}"*' for token in tokens)
+        
+        canonical_tokens = tokenize_folded(canonical_key(query))
+        if canonical_tokens and canonical_tokens != tokens:
+            alternative = " ".join(f'"{token}"*' for token in canonical_tokens)
+            return f"({match_query}) OR ({alternative})"
+        return match_query
     
     # User operations
     def save_user(self, user):
@@ -118,10 +821,17 @@ class DatabaseManager:
         
         conn.commit()
         conn.close()
+        
+        self._user_cache.put(user.id, user)
+        self._invalidate_lists('users')
         return user
     
     def get_user(self, user_id):
         """Get a user by ID."""
+        user = self._user_cache.get(user_id, _MISSING)
+        if user is not _MISSING:
+            return user
+        
         conn = self._get_connection()
         cursor = conn.cursor()
         
@@ -130,12 +840,17 @@ class DatabaseManager:
         
         conn.close()
         
-        if row:
-            return User.from_db_row(tuple(row))
-        return None
+        user = User.from_db_row(row) if row else None
+        if user:
+            self._user_cache.put(user_id, user)
+        return user
     
     def get_all_users(self):
         """Get all users."""
+        return self._cached_list(('users',), self._load_all_users)
+    
+    def _load_all_users(self):
+        """Load all users from the database."""
         conn = self._get_connection()
         cursor = conn.cursor()
         
@@ -144,7 +859,13 @@ class DatabaseManager:
         
         conn.close()
         
-        return [User.from_db_row(tuple(row)) for row in rows]
+        users = []
+        for row in rows:
+            # Reuse already cached instances so each user has one identity
+            user = self._user_cache.get(row[0]) or User.from_db_row(row)
+            self._user_cache.put(user.id, user)
+            users.append(user)
+        return users
     
     def delete_user(self, user_id):
         """Delete a user by ID."""
@@ -156,6 +877,9 @@ class DatabaseManager:
         conn.commit()
         conn.close()
         
+        self._user_cache.invalidate(user_id)
+        self._invalidate_lists('users')
+        
         return cursor.rowcount > 0
     
     # Dish operations
@@ -208,7 +932,7 @@ class DatabaseManager:
         conn.close()
         
         if row:
-            return Dish.from_db_row(tuple(row))
+            return Dish.from_db_row(row)
         return None
     
     def get_all_dishes(self, cuisine_type=None):
@@ -225,7 +949,7 @@ class DatabaseManager:
         
         conn.close()
         
-        return [Dish.from_db_row(tuple(row)) for row in rows]
+        return [Dish.from_db_row(row) for row in rows]
     
     def delete_dish(self, dish_id):
         """Delete a dish by ID."""
@@ -245,7 +969,8 @@ class DatabaseManager:
         conn = self._get_connection()
         cursor = conn.cursor()
         
-        if menu.id is None:
+        new_menu = menu.id is None
+        if new_menu:
             # Insert new menu
             cursor.execute('''
             INSERT INTO menus (user_id, name, creation_date, cuisine_type, 
@@ -258,11 +983,14 @@ class DatabaseManager:
                 menu.cuisine_type,
                 menu.budget_per_meal,
                 menu.max_prep_time,
-                json.dumps(menu.meals)
+                encode_text(json.dumps(menu.meals, ensure_ascii=False), STORAGE_CODEC)
             ))
             menu.id = cursor.lastrowid
         else:
             # Update existing menu
+            self._remove_menu_usage(cursor, menu.id)
+            # Its stored cost no longer matches the meals
+            cursor.execute('DELETE FROM menu_costs WHERE menu_id = ?', (menu.id,))
             cursor.execute('''
             UPDATE menus
             SET user_id = ?, name = ?, creation_date = ?, cuisine_type = ?,
@@ -275,12 +1003,28 @@ class DatabaseManager:
                 menu.cuisine_type,
                 menu.budget_per_meal,
                 menu.max_prep_time,
-                json.dumps(menu.meals),
+                encode_text(json.dumps(menu.meals, ensure_ascii=False), STORAGE_CODEC),
                 menu.id
             ))
         
+        self._apply_usage_stats(cursor, menu.user_id, menu.creation_date, menu.meals, 1)
+        self._catalog_menu_dishes(cursor, menu.cuisine_type, menu.meals)
+        self._store_menu_nutrition(cursor, menu.id, menu.user_id, menu.creation_date, menu.meals)
+        
         conn.commit()
         conn.close()
+        
+        self._invalidate_lists('menus', 'user_menus')
+        history = self._history_cache.get(menu.user_id)
+        if history is not None:
+            if new_menu:
+                # A new menu is the user's most recent one; readers on other
+                # lanes may be copying the cached history, so replace it
+                history = history.copy()
+                history.add_menu(menu.id, [dish[0] for dish in _menu_dishes(menu.meals)])
+                self._history_cache.put(menu.user_id, history)
+            else:
+                self._history_cache.invalidate(menu.user_id)
         return menu
     
     def get_menu(self, menu_id):
@@ -294,11 +1038,15 @@ class DatabaseManager:
         conn.close()
         
         if row:
-            return Menu.from_db_row(tuple(row))
+            return Menu.from_db_row(row)
         return None
     
     def get_user_menus(self, user_id):
         """Get all menus for a specific user."""
+        return self._cached_list(('user_menus', user_id), lambda: self._load_user_menus(user_id))
+    
+    def _load_user_menus(self, user_id):
+        """Load all menus for a specific user from the database."""
         conn = self._get_connection()
         cursor = conn.cursor()
         
@@ -307,10 +1055,14 @@ class DatabaseManager:
         
         conn.close()
         
-        return [Menu.from_db_row(tuple(row)) for row in rows]
+        return [Menu.from_db_row(row) for row in rows]
     
     def get_all_menus(self, cuisine_type=None):
         """Get all menus, optionally filtered by cuisine type."""
+        return self._cached_list(('menus', cuisine_type), lambda: self._load_all_menus(cuisine_type))
+    
+    def _load_all_menus(self, cuisine_type=None):
+        """Load all menus from the database."""
         conn = self._get_connection()
         cursor = conn.cursor()
         
@@ -323,20 +1075,99 @@ class DatabaseManager:
         
         conn.close()
         
-        return [Menu.from_db_row(tuple(row)) for row in rows]
+        return [Menu.from_db_row(row) for row in rows]
+    
+    def get_dish_history(self, user_id):
+        """Get the dishes of a user's most recent menus.
+        
+        Args:
+            user_id: User ID
+            
+        Returns:
+            DishHistory: Copy of the cached history of the last HISTORY_MENUS_PER_USER menus
+        """
+        history = self._history_cache.get(user_id)
+        if history is None:
+            history = self._load_dish_history(user_id)
+            self._history_cache.put(user_id, history)
+        return history.copy()
+    
+    def _load_dish_history(self, user_id):
+        """Build the dish history of a user from their most recent menus."""
+        history = DishHistory(HISTORY_MENUS_PER_USER)
+        if user_id is None:
+            return history
+        
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+        SELECT id, meals FROM menus WHERE user_id = ?
+        ORDER BY creation_date DESC, id DESC LIMIT ?
+        ''', (user_id, HISTORY_MENUS_PER_USER))
+        rows = cursor.fetchall()
+        
+        conn.close()
+        
+        # Oldest first, so the newest menu ends up as the most recent one
+        for menu_id, meals in reversed(rows):
+            history.add_menu(menu_id, [dish[0] for dish in _menu_dishes(decode_text(meals))])
+        return history
     
     def delete_menu(self, menu_id):
         """Delete a menu by ID."""
         conn = self._get_connection()
         cursor = conn.cursor()
         
+        self._remove_menu_usage(cursor, menu_id)
+        cursor.execute('DELETE FROM menu_costs WHERE menu_id = ?', (menu_id,))
+        cursor.execute('DELETE FROM menu_nutrition WHERE menu_id = ?', (menu_id,))
         cursor.execute('DELETE FROM menus WHERE id = ?', (menu_id,))
         
         conn.commit()
         conn.close()
         
+        self._invalidate_lists('menus', 'user_menus')
+        self._history_cache.clear()
+        
         return cursor.rowcount > 0
     
+    def search_menus(self, query, limit=DEFAULT_SEARCH_LIMIT):
+        """Search menus by name, dish names and ingredients.
+        
+        Args:
+            query: Free text, matched without diacritics ("pho bo" finds "Phở bò")
+            limit: Maximum number of menus to return
+            
+        Returns:
+            list: Matching menus, best match first
+        """
+        match_query = self._build_match_query(query)
+        if not match_query:
+            return []
+        
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        if self.fts_enabled:
+            cursor.execute('''
+            SELECT menus.* FROM menus_fts
+            JOIN menus ON menus.id = menus_fts.rowid
+            WHERE menus_fts MATCH ?
+            ORDER BY bm25(menus_fts, 10.0, 5.0, 1.0)
+            LIMIT ?
+            ''', (match_query, limit))
+        else:
+            cursor.execute(
+                'SELECT * FROM menus WHERE name LIKE ? ORDER BY creation_date DESC LIMIT ?',
+                (f"%{query.strip()}%", limit)
+            )
+        rows = cursor.fetchall()
+        
+        conn.close()
+        
+        return [Menu.from_db_row(row) for row in rows]
+    
     # Recipe operations
     def save_recipe(self, name, content, cuisine_type=None):
         """Save a recipe to the database.
@@ -357,6 +1188,7 @@ class DatabaseManager:
         row = cursor.fetchone()
         
         recipe = Recipe(name=name, content=content, cuisine_type=cuisine_type)
+        stored_content = encode_text(content, STORAGE_CODEC)
         
         if row:
             # Update existing recipe
@@ -366,7 +1198,7 @@ class DatabaseManager:
             SET content = ?, cuisine_type = ?, creation_date = ?
             WHERE id = ?
             ''', (
-                content,
+                stored_content,
                 cuisine_type,
                 recipe.creation_date,
                 recipe.id
@@ -379,17 +1211,25 @@ class DatabaseManager:
             ''', (
                 name,
                 cuisine_type,
-                content,
+                stored_content,
                 recipe.creation_date
             ))
             recipe.id = cursor.lastrowid
         
         conn.commit()
         conn.close()
+        
+        self._recipe_cache.put(recipe.id, recipe)
+        self._recipe_name_cache.put(name, recipe)
+        self._invalidate_lists('recipes')
         return recipe
     
     def get_recipe(self, recipe_id):
         """Get a recipe by ID."""
+        recipe = self._recipe_cache.get(recipe_id, _MISSING)
+        if recipe is not _MISSING:
+            return recipe
+        
         conn = self._get_connection()
         cursor = conn.cursor()
         
@@ -399,11 +1239,15 @@ class DatabaseManager:
         conn.close()
         
         if row:
-            return Recipe.from_db_row(tuple(row))
+            return self._remember_recipe(Recipe.from_db_row(row))
         return None
     
     def get_recipe_by_name(self, name):
         """Get a recipe by name."""
+        recipe = self._recipe_name_cache.get(name, _MISSING)
+        if recipe is not _MISSING:
+            return recipe
+        
         conn = self._get_connection()
         cursor = conn.cursor()
         
@@ -413,11 +1257,53 @@ class DatabaseManager:
         conn.close()
         
         if row:
-            return Recipe.from_db_row(tuple(row))
+            return self._remember_recipe(Recipe.from_db_row(row))
         return None
     
+    def get_recipes_by_names(self, names):
+        """Get the recipes of several dishes at once, as a {name: Recipe} dictionary."""
+        recipes = {}
+        missing = []
+        for name in dict.fromkeys(names):
+            recipe = self._recipe_name_cache.get(name, _MISSING)
+            if recipe is _MISSING:
+                missing.append(name)
+            elif recipe is not None:
+                recipes[name] = recipe
+        
+        if missing:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            # Stay below SQLite's limit on the number of query parameters
+            for start in range(0, len(missing), MIGRATION_BATCH_SIZE):
+                batch = missing[start:start + MIGRATION_BATCH_SIZE]
+                placeholders = ", ".join("?" * len(batch))
+                cursor.execute(f'SELECT * FROM recipes WHERE name IN ({placeholders}) ORDER BY id', batch)
+                for row in cursor.fetchall():
+                    recipe = Recipe.from_db_row(row)
+                    if recipe.name not in recipes:
+                        recipes[recipe.name] = self._remember_recipe(recipe)
+            
+            conn.close()
+        
+        return recipes
+    
+    def _remember_recipe(self, recipe):
+        """Cache a loaded recipe under its ID and name, keeping one instance per row."""
+        cached = self._recipe_cache.get(recipe.id)
+        if cached is not None:
+            recipe = cached
+        self._recipe_cache.put(recipe.id, recipe)
+        self._recipe_name_cache.put(recipe.name, recipe)
+        return recipe
+    
     def get_all_recipes(self, cuisine_type=None):
         """Get all recipes, optionally filtered by cuisine type."""
+        return self._cached_list(('recipes', cuisine_type), lambda: self._load_all_recipes(cuisine_type))
+    
+    def _load_all_recipes(self, cuisine_type=None):
+        """Load all recipes from the database."""
         conn = self._get_connection()
         cursor = conn.cursor()
         
@@ -430,16 +1316,605 @@ class DatabaseManager:
         
         conn.close()
         
-        return [Recipe.from_db_row(tuple(row)) for row in rows]
+        return [self._remember_recipe(Recipe.from_db_row(row)) for row in rows]
     
     def delete_recipe(self, recipe_id):
         """Delete a recipe by ID."""
         conn = self._get_connection()
         cursor = conn.cursor()
         
+        cursor.execute('SELECT name FROM recipes WHERE id = ?', (recipe_id,))
+        row = cursor.fetchone()
         cursor.execute('DELETE FROM recipes WHERE id = ?', (recipe_id,))
         
         conn.commit()
         conn.close()
         
-        return cursor.rowcount > 0 
\ No newline at end of file
+        self._recipe_cache.invalidate(recipe_id)
+        if row:
+            self._recipe_name_cache.invalidate(row[0])
+        self._invalidate_lists('recipes')
+        
+        return cursor.rowcount > 0
+    
+    def search_recipes(self, query, limit=DEFAULT_SEARCH_LIMIT):
+        """Search recipes by name, ingredients and steps.
+        
+        Args:
+            query: Free text, matched without diacritics ("pho bo" finds "Phở bò")
+            limit: Maximum number of recipes to return
+            
+        Returns:
+            list: Matching recipes, best match first
+        """
+        match_query = self._build_match_query(query)
+        if not match_query:
+            return []
+        
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        if self.fts_enabled:
+            cursor.execute('''
+            SELECT recipes.* FROM recipes_fts
+            JOIN recipes ON recipes.id = recipes_fts.rowid
+            WHERE recipes_fts MATCH ?
+            ORDER BY bm25(recipes_fts, 10.0, 3.0, 1.0)
+            LIMIT ?
+            ''', (match_query, limit))
+        else:
+            cursor.execute(
+                'SELECT * FROM recipes WHERE name LIKE ? ORDER BY name LIMIT ?',
+                (f"%{query.strip()}%", limit)
+            )
+        rows = cursor.fetchall()
+        
+        conn.close()
+        
+        return [self._remember_recipe(Recipe.from_db_row(row)) for row in rows] 
+    
+    # Price operations
+    def save_ingredient_prices(self, prices):
+        """Insert or update ingredient prices.
+        
+        Args:
+            prices: (ingredient key, base unit, display name, price per base unit) tuples
+        
+        Returns:
+            int: Number of prices written
+        """
+        prices = list(prices)
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        updated_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        cursor.executemany('''
+        INSERT INTO ingredient_prices (ingredient, unit, name, price, updated_date)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (ingredient, unit) DO UPDATE SET
+            name = excluded.name, price = excluded.price, updated_date = excluded.updated_date
+        ''', [tuple(row) + (updated_date,) for row in prices])
+        
+        conn.commit()
+        conn.close()
+        
+        return len(prices)
+    
+    def get_ingredient_prices(self):
+        """Get all ingredient prices as (ingredient key, unit, name, price) tuples."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT ingredient, unit, name, price FROM ingredient_prices ORDER BY ingredient')
+        rows = cursor.fetchall()
+        
+        conn.close()
+        
+        return rows
+    
+    def save_menu_costs(self, costs):
+        """Store locally computed menu costs in one transaction.
+        
+        Args:
+            costs: (menu ID, total cost, meal costs JSON, meals over budget) tuples
+        
+        Returns:
+            int: Number of menus written
+        """
+        costs = list(costs)
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        priced_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        cursor.executemany('''
+        INSERT OR REPLACE INTO menu_costs (menu_id, total_cost, meal_costs, over_budget_meals, priced_date)
+        SELECT ?, ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM menus WHERE id = ?)
+        ''', [tuple(row) + (priced_date, row[0]) for row in costs])
+        
+        conn.commit()
+        conn.close()
+        
+        return len(costs)
+    
+    def get_menu_cost(self, menu_id):
+        """Get the locally computed cost of a menu, or None if it has not been priced."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+        SELECT total_cost, meal_costs, over_budget_meals, priced_date FROM menu_costs WHERE menu_id = ?
+        ''', (menu_id,))
+        row = cursor.fetchone()
+        
+        conn.close()
+        
+        if not row:
+            return None
+        return {
+            'total_cost': row[0],
+            'meal_costs': json.loads(row[1]) if row[1] else {},
+            'over_budget_meals': row[2],
+            'priced_date': row[3]
+        }
+    
+    # Generation draft operations
+    def create_generation_draft(self, user_id, cuisine_type, settings):
+        """Start a draft for a weekly menu being generated.
+        
+        Args:
+            user_id: User ID
+            cuisine_type: Cuisine type
+            settings: Generation settings (budget_per_meal, max_prep_time, days,
+                meals_per_day, servings)
+        
+        Returns:
+            int: Draft ID
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+        INSERT INTO generation_drafts (user_id, cuisine_type, settings, created_date)
+        VALUES (?, ?, ?, ?)
+        ''', (
+            user_id,
+            cuisine_type,
+            json.dumps(settings, ensure_ascii=False),
+            datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        ))
+        draft_id = cursor.lastrowid
+        
+        conn.commit()
+        conn.close()
+        
+        return draft_id
+    
+    def save_draft_day(self, draft_id, day, meals=None, error=None):
+        """Checkpoint one generated day of a draft, or mark it as failed.
+        
+        Args:
+            draft_id: Draft ID
+            day: Day name
+            meals: Meals of the day ({meal_time: meal_info}), None if it failed
+            error: Error message of a failed day
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        # A draft deleted while its job was running gets no more days
+        cursor.execute('''
+        INSERT INTO generation_draft_days (draft_id, day, meals, error, updated_date)
+        SELECT ?, ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM generation_drafts WHERE id = ?)
+        ON CONFLICT (draft_id, day) DO UPDATE SET
+            meals = excluded.meals, error = excluded.error, updated_date = excluded.updated_date
+        ''', (
+            draft_id,
+            day,
+            None if meals is None else json.dumps(meals, ensure_ascii=False),
+            error,
+            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            draft_id
+        ))
+        
+        conn.commit()
+        conn.close()
+    
+    def get_generation_draft(self, draft_id):
+        """Get a draft with its generated and failed days.
+        
+        Args:
+            draft_id: Draft ID
+        
+        Returns:
+            dict: id, user_id, cuisine_type, settings, days ({day: meals}) and
+            failed_days ({day: error}), or None if there is no such draft
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT id, user_id, cuisine_type, settings FROM generation_drafts WHERE id = ?',
+                       (draft_id,))
+        row = cursor.fetchone()
+        days = []
+        if row:
+            cursor.execute('SELECT day, meals, error FROM generation_draft_days WHERE draft_id = ?', (draft_id,))
+            days = cursor.fetchall()
+        
+        conn.close()
+        
+        if not row:
+            return None
+        
+        settings = json.loads(row[3])
+        generated = {day: json.loads(meals) for day, meals, _ in days if meals is not None}
+        return {
+            'id': row[0],
+            'user_id': row[1],
+            'cuisine_type': row[2],
+            'settings': settings,
+            # Days in the order they were asked for
+            'days': {day: generated[day] for day in settings.get('days', []) if day in generated},
+            'failed_days': {day: error for day, meals, error in days if meals is None}
+        }
+    
+    def get_unfinished_draft(self, user_id):
+        """Get the most recent draft of a user that was not finished, if any."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT MAX(id) FROM generation_drafts WHERE user_id = ?', (user_id,))
+        draft_id = cursor.fetchone()[0]
+        
+        conn.close()
+        
+        return self.get_generation_draft(draft_id) if draft_id is not None else None
+    
+    def delete_generation_draft(self, draft_id):
+        """Delete a draft once its menu is complete."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('DELETE FROM generation_draft_days WHERE draft_id = ?', (draft_id,))
+        cursor.execute('DELETE FROM generation_drafts WHERE id = ?', (draft_id,))
+        
+        conn.commit()
+        conn.close()
+    
+    # Job queue operations
+    def save_job(self, kind, job_key, priority, payload):
+        """Store a queued job, or raise the priority of the stored job with the same key.
+        
+        Args:
+            kind: Job kind
+            job_key: Key of the job, unique among the stored jobs
+            priority: Priority, lower runs first
+            payload: JSON-serializable job arguments
+        
+        Returns:
+            int: Job ID
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        
+        cursor.execute('''
+        INSERT INTO jobs (kind, job_key, priority, payload, status, created_date, updated_date)
+        VALUES (?, ?, ?, ?, 'queued', ?, ?)
+        ON CONFLICT (job_key) DO UPDATE SET
+            priority = MIN(priority, excluded.priority), updated_date = excluded.updated_date
+        ''', (kind, job_key, priority, json.dumps(payload, ensure_ascii=False), now, now))
+        cursor.execute('SELECT id FROM jobs WHERE job_key = ?', (job_key,))
+        job_id = cursor.fetchone()[0]
+        
+        conn.commit()
+        conn.close()
+        
+        return job_id
+    
+    def set_job_priority(self, job_id, priority):
+        """Raise the priority of a stored job that has not started.
+        
+        An UPDATE rather than an upsert: a job that ended in the meantime
+        has been deleted and must not be stored again.
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+        UPDATE jobs SET priority = MIN(priority, ?), updated_date = ?
+        WHERE id = ? AND status = 'queued'
+        ''', (priority, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), job_id))
+        
+        conn.commit()
+        conn.close()
+    
+    def set_job_status(self, job_id, status):
+        """Mark a job as queued or running."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('UPDATE jobs SET status = ?, updated_date = ? WHERE id = ?',
+                       (status, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), job_id))
+        
+        conn.commit()
+        conn.close()
+    
+    def delete_job(self, job_id):
+        """Delete a job that ended."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+        
+        conn.commit()
+        conn.close()
+    
+    def restore_jobs(self):
+        """Requeue the jobs a previous session left running and get every stored job.
+        
+        Returns:
+            list: Job dictionaries (id, kind, key, priority, payload), highest priority first
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'")
+        cursor.execute('SELECT id, kind, job_key, priority, payload FROM jobs ORDER BY priority, id')
+        rows = cursor.fetchall()
+        
+        conn.commit()
+        conn.close()
+        
+        return [
+            {'id': row[0], 'kind': row[1], 'key': row[2], 'priority': row[3], 'payload': json.loads(row[4])}
+            for row in rows
+        ]
+    
+    # Usage statistics
+    def get_top_ingredients(self, user_id, limit=DEFAULT_STATS_LIMIT, months=None):
+        """Get the ingredients a user's menus use most.
+        
+        Args:
+            user_id: User whose menus are counted
+            limit: Maximum number of ingredients to return
+            months: Only count menus from the last N months (all menus if None)
+            
+        Returns:
+            list: (ingredient, meal count) tuples, most used first
+        """
+        return self._top_usage('user_ingredient_stats', 'ingredient', user_id, limit, months,
+                               label='COALESCE(MAX(name), ingredient)')
+    
+    def get_top_dishes(self, user_id, limit=DEFAULT_STATS_LIMIT, months=None):
+        """Get the dishes that appear most often in a user's menus.
+        
+        Args:
+            user_id: User whose menus are counted
+            limit: Maximum number of dishes to return
+            months: Only count menus from the last N months (all menus if None)
+            
+        Returns:
+            list: (dish, meal count) tuples, most used first
+        """
+        return self._top_usage('user_dish_stats', 'dish', user_id, limit, months)
+    
+    def _top_usage(self, table, column, user_id, limit, months, label=None):
+        """Sum the monthly usage buckets of a stats table and rank them.
+        
+        label is the SQL expression returned for each key, the key itself by default.
+        """
+        since = _period_months_ago(months) if months else ''
+        
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute(f'''
+        SELECT {label or column}, SUM(uses) AS total FROM {table}
+        WHERE user_id = ? AND period >= ?
+        GROUP BY {column}
+        ORDER BY total DESC, {column}
+        LIMIT ?
+        ''', (user_id, since, limit))
+        rows = cursor.fetchall()
+        
+        conn.close()
+        
+        return rows
+    
+    def get_ingredient_trend(self, user_id, ingredient, months=None):
+        """Get how often an ingredient was used per month.
+        
+        Args:
+            user_id: User whose menus are counted
+            ingredient: Ingredient name, in any spelling ("thịt lợn" and "thit lon" count as "thịt heo")
+            months: Only include the last N months (all months if None)
+            
+        Returns:
+            list: (period "YYYY-MM", meal count) tuples, oldest first
+        """
+        return self._usage_trend('user_ingredient_stats', 'ingredient', user_id,
+                                 canonical_key(ingredient), months)
+    
+    def get_dish_trend(self, user_id, dish, months=None):
+        """Get how often a dish was used per month.
+        
+        Args:
+            user_id: User whose menus are counted
+            dish: Dish name
+            months: Only include the last N months (all months if None)
+            
+        Returns:
+            list: (period "YYYY-MM", meal count) tuples, oldest first
+        """
+        return self._usage_trend('user_dish_stats', 'dish', user_id, str(dish).strip(), months)
+    
+    def _usage_trend(self, table, column, user_id, key, months):
+        """Get the monthly usage buckets of one ingredient or dish."""
+        since = _period_months_ago(months) if months else ''
+        
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute(f'''
+        SELECT period, uses FROM {table}
+        WHERE user_id = ? AND {column} = ? AND period >= ?
+        ORDER BY period
+        ''', (user_id, key, since))
+        rows = cursor.fetchall()
+        
+        conn.close()
+        
+        return rows
+    
+    # Nutrition
+    def get_menu_nutrition(self, menu_id):
+        """Get the daily and weekly nutrition totals of a saved menu.
+        
+        Returns:
+            dict: 'days' maps each day to its totals and 'week' holds the totals
+            of the whole menu; each total maps NUTRIENTS to g (kcal for calories)
+        """
+        sums = ", ".join(f"COALESCE(SUM({nutrient}), 0)" for nutrient in NUTRIENTS)
+        
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute(f'''
+        SELECT day, {sums} FROM menu_nutrition
+        WHERE menu_id = ?
+        GROUP BY day
+        ORDER BY MIN(slot)
+        ''', (menu_id,))
+        rows = cursor.fetchall()
+        
+        conn.close()
+        
+        days = {row[0]: dict(zip(NUTRIENTS, row[1:])) for row in rows}
+        week = {nutrient: sum(day[nutrient] for day in days.values()) for nutrient in NUTRIENTS}
+        return {'days': days, 'week': week}
+    
+    def get_nutrition_trend(self, user_id, months=None):
+        """Get a user's average daily nutrition per month.
+        
+        Args:
+            user_id: User whose menus are counted
+            months: Only include the last N months (all months if None)
+            
+        Returns:
+            list: (period "YYYY-MM", protein, carbs, fat, calories) tuples, oldest first
+        """
+        since = _period_months_ago(months) if months else ''
+        day_sums = ", ".join(f"COALESCE(SUM({nutrient}), 0) AS {nutrient}" for nutrient in NUTRIENTS)
+        averages = ", ".join(f"AVG({nutrient})" for nutrient in NUTRIENTS)
+        
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        # Add up each menu day first, then average the days of every month
+        cursor.execute(f'''
+        SELECT period, {averages}
+        FROM (
+            SELECT substr(MIN(menu_date), 1, 7) AS period, {day_sums}
+            FROM menu_nutrition
+            WHERE user_id = ? AND menu_date >= ?
+            GROUP BY menu_id, day
+        )
+        GROUP BY period
+        ORDER BY period
+        ''', (user_id, since))
+        rows = cursor.fetchall()
+        
+        conn.close()
+        
+        return rows
+    
+    # Retention
+    def apply_retention(self, keep_per_user=RETENTION_MENUS_PER_USER):
+        """Move all but the newest menus of each user to the archive database.
+        
+        Archived menus still count in the usage statistics and keep their
+        nutrition rows, so every user trend covers the archived months too;
+        only their cached costs are dropped.
+        
+        Args:
+            keep_per_user: Number of menus kept per user
+            
+        Returns:
+            int: Number of menus archived
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+        SELECT * FROM (
+            SELECT menus.*, ROW_NUMBER() OVER (
+                PARTITION BY user_id ORDER BY creation_date DESC, id DESC
+            ) AS position
+            FROM menus
+        )
+        WHERE position > ?
+        ''', (keep_per_user,))
+        rows = cursor.fetchall()
+        
+        if not rows:
+            conn.close()
+            return 0
+        
+        cursor.execute('ATTACH DATABASE ? AS archive', (self.archive_path,))
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS archive.menus (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER,
+            name TEXT NOT NULL,
+            creation_date TEXT,
+            cuisine_type TEXT,
+            budget_per_meal INTEGER,
+            max_prep_time INTEGER,
+            meals BLOB,
+            archived_date TEXT
+        )
+        ''')
+        
+        archived_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        for start in range(0, len(rows), MIGRATION_BATCH_SIZE):
+            batch = rows[start:start + MIGRATION_BATCH_SIZE]
+            cursor.executemany('''
+            INSERT OR REPLACE INTO archive.menus (id, user_id, name, creation_date, cuisine_type,
+                                                  budget_per_meal, max_prep_time, meals, archived_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [
+                row[:7] + (encode_text(decode_text(row[7]), ARCHIVE_CODEC), archived_date)
+                for row in batch
+            ])
+            cursor.executemany('DELETE FROM main.menu_costs WHERE menu_id = ?', [(row[0],) for row in batch])
+            cursor.executemany('DELETE FROM main.menus WHERE id = ?', [(row[0],) for row in batch])
+        
+        conn.commit()
+        cursor.execute('DETACH DATABASE archive')
+        conn.close()
+        
+        self._invalidate_lists('menus', 'user_menus')
+        self._history_cache.clear()
+        logger.info(f"Archived {len(rows)} menus to {self.archive_path}")
+        
+        return len(rows)
+    
+    def get_archived_menus(self, user_id=None):
+        """Get archived menus, newest first, optionally only those of one user."""
+        if not os.path.exists(self.archive_path):
+            return []
+        
+        conn = sqlite3.connect(self.archive_path)
+        cursor = conn.cursor()
+        
+        columns = 'id, user_id, name, creation_date, cuisine_type, budget_per_meal, max_prep_time, meals'
+        if user_id is None:
+            cursor.execute(f'SELECT {columns} FROM menus ORDER BY creation_date DESC')
+        else:
+            cursor.execute(f'SELECT {columns} FROM menus WHERE user_id = ? ORDER BY creation_date DESC',
+                           (user_id,))
+        rows = cursor.fetchall()
+        
+        conn.close()
+        
+        return [Menu.from_db_row(row) for row in rows]
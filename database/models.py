@@ -1,16 +1,72 @@
 """
 Database models for the application.
+
+Models use __slots__ and decode their JSON (and compressed) columns lazily:
+rows map straight from cursor tuples, and a column is only decoded the first
+time it is read, after which the decoded value is cached on the instance.
 """
 import sqlite3
 import json
 from datetime import datetime
 
+from .codec import decode_text
+
+
+class _Encoded:
+    """Raw column value that has not been decoded yet."""
+    
+    __slots__ = ('raw',)
+    
+    def __init__(self, raw):
+        self.raw = raw
+
+
+class _LazyColumn:
+    """Descriptor decoding a raw column value on first access and caching it."""
+    
+    def __init__(self, decode):
+        self.decode = decode
+    
+    def __set_name__(self, owner, name):
+        self.slot_name = f'_{name}'
+    
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        value = getattr(instance, self.slot_name)
+        if type(value) is _Encoded:
+            value = self.decode(value.raw)
+            setattr(instance, self.slot_name, value)
+        return value
+    
+    def __set__(self, instance, value):
+        setattr(instance, self.slot_name, value)
+
+
+def _decode_json_list(raw):
+    """Decode a JSON list column."""
+    return json.loads(raw) if raw else []
+
+
+def _decode_json_dict(raw):
+    """Decode a (possibly compressed) JSON object column."""
+    text = decode_text(raw)
+    return json.loads(text) if text else {}
+
 
 class User:
     """User model representing user preferences."""
     
-    def __init__(self, id=None, name=None, favorite_ingredients=None, 
-                 disliked_ingredients=None, favorite_dishes=None, 
+    __slots__ = ('id', 'name', '_favorite_ingredients', '_disliked_ingredients',
+                 '_favorite_dishes', '_disliked_dishes')
+    
+    favorite_ingredients = _LazyColumn(_decode_json_list)
+    disliked_ingredients = _LazyColumn(_decode_json_list)
+    favorite_dishes = _LazyColumn(_decode_json_list)
+    disliked_dishes = _LazyColumn(_decode_json_list)
+    
+    def __init__(self, id=None, name=None, favorite_ingredients=None,
+                 disliked_ingredients=None, favorite_dishes=None,
                  disliked_dishes=None):
         self.id = id
         self.name = name
@@ -25,14 +81,13 @@ class User:
         if not row:
             return None
         
-        return cls(
-            id=row[0],
-            name=row[1],
-            favorite_ingredients=json.loads(row[2]) if row[2] else [],
-            disliked_ingredients=json.loads(row[3]) if row[3] else [],
-            favorite_dishes=json.loads(row[4]) if row[4] else [],
-            disliked_dishes=json.loads(row[5]) if row[5] else []
-        )
+        user = cls.__new__(cls)
+        user.id, user.name = row[0], row[1]
+        user._favorite_ingredients = _Encoded(row[2])
+        user._disliked_ingredients = _Encoded(row[3])
+        user._favorite_dishes = _Encoded(row[4])
+        user._disliked_dishes = _Encoded(row[5])
+        return user
     
     def to_dict(self):
         """Convert User to dictionary."""
@@ -49,7 +104,12 @@ class User:
 class Dish:
     """Dish model representing a meal."""
     
-    def __init__(self, id=None, name=None, cuisine_type=None, 
+    __slots__ = ('id', 'name', 'cuisine_type', '_ingredients',
+                 'preparation_time', 'estimated_cost')
+    
+    ingredients = _LazyColumn(_decode_json_list)
+    
+    def __init__(self, id=None, name=None, cuisine_type=None,
                  ingredients=None, preparation_time=None, estimated_cost=None):
         self.id = id
         self.name = name
@@ -64,14 +124,11 @@ class Dish:
         if not row:
             return None
         
-        return cls(
-            id=row[0],
-            name=row[1],
-            cuisine_type=row[2],
-            ingredients=json.loads(row[3]) if row[3] else [],
-            preparation_time=row[4],
-            estimated_cost=row[5]
-        )
+        dish = cls.__new__(cls)
+        dish.id, dish.name, dish.cuisine_type = row[0], row[1], row[2]
+        dish._ingredients = _Encoded(row[3])
+        dish.preparation_time, dish.estimated_cost = row[4], row[5]
+        return dish
     
     def to_dict(self):
         """Convert Dish to dictionary."""
@@ -88,6 +145,11 @@ class Dish:
 class Menu:
     """Menu model representing a weekly menu plan."""
     
+    __slots__ = ('id', 'user_id', 'name', 'creation_date', 'cuisine_type',
+                 'budget_per_meal', 'max_prep_time', '_meals', '_decoded_meals')
+    
+    meals = _LazyColumn(_decode_json_dict)
+    
     def __init__(self, id=None, user_id=None, name=None, creation_date=None,
                  cuisine_type=None, budget_per_meal=None, max_prep_time=None,
                  meals=None):
@@ -99,6 +161,7 @@ class Menu:
         self.budget_per_meal = budget_per_meal
         self.max_prep_time = max_prep_time
         self.meals = meals or {}  # Format: {day: {meal_time: dish_id}}
+        self._decoded_meals = None
     
     @classmethod
     def from_db_row(cls, row):
@@ -106,16 +169,32 @@ class Menu:
         if not row:
             return None
         
-        return cls(
-            id=row[0],
-            user_id=row[1],
-            name=row[2],
-            creation_date=row[3],
-            cuisine_type=row[4],
-            budget_per_meal=row[5],
-            max_prep_time=row[6],
-            meals=json.loads(row[7]) if row[7] else {}
-        )
+        menu = cls.__new__(cls)
+        (menu.id, menu.user_id, menu.name, menu.creation_date, menu.cuisine_type,
+         menu.budget_per_meal, menu.max_prep_time) = row[:7]
+        menu._meals = _Encoded(row[7])
+        menu._decoded_meals = None
+        return menu
+    
+    @staticmethod
+    def parse_meals(value):
+        """Decode a meals value into a {day: {meal_time: meal_info}} dict.
+        
+        Menus saved from the UI are JSON-encoded twice, so keep decoding
+        until a dictionary comes out.
+        """
+        while isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except json.JSONDecodeError:
+                return {}
+        return value if isinstance(value, dict) else {}
+    
+    def get_meals_dict(self):
+        """Get the meals as a dictionary, decoding them only once."""
+        if self._decoded_meals is None or self._decoded_meals[0] is not self.meals:
+            self._decoded_meals = (self.meals, self.parse_meals(self.meals))
+        return self._decoded_meals[1]
     
     def to_dict(self):
         """Convert Menu to dictionary."""
@@ -134,13 +213,19 @@ class Menu:
 class Recipe:
     """Recipe model for storing recipe data."""
     
-    def __init__(self, id=None, name=None, cuisine_type=None, 
+    __slots__ = ('id', 'name', 'cuisine_type', '_content', 'creation_date',
+                 '_decoded_content')
+    
+    content = _LazyColumn(decode_text)  # JSON string of recipe data
+    
+    def __init__(self, id=None, name=None, cuisine_type=None,
                  content=None, creation_date=None):
         self.id = id
         self.name = name
         self.cuisine_type = cuisine_type
         self.content = content  # JSON string of recipe data
         self.creation_date = creation_date or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self._decoded_content = None
     
     @classmethod
     def from_db_row(cls, row):
@@ -148,13 +233,22 @@ class Recipe:
         if not row:
             return None
         
-        return cls(
-            id=row[0],
-            name=row[1],
-            cuisine_type=row[2],
-            content=row[3],
-            creation_date=row[4]
-        )
+        recipe = cls.__new__(cls)
+        recipe.id, recipe.name, recipe.cuisine_type = row[0], row[1], row[2]
+        recipe._content = _Encoded(row[3])
+        recipe.creation_date = row[4]
+        recipe._decoded_content = None
+        return recipe
+    
+    def get_data(self):
+        """Get the recipe content as a dictionary, decoding it only once.
+        
+        Raises:
+            json.JSONDecodeError: If the content is not valid JSON
+        """
+        if self._decoded_content is None or self._decoded_content[0] is not self.content:
+            self._decoded_content = (self.content, json.loads(self.content))
+        return self._decoded_content[1]
     
     def to_dict(self):
         """Convert Recipe to dictionary."""
@@ -164,4 +258,4 @@ class Recipe:
             'cuisine_type': self.cuisine_type,
             'content': self.content,
             'creation_date': self.creation_date
-        } 
\ No newline at end of file
+        }
@@ -7,7 +7,9 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import Qt, pyqtSignal
 
-from config import BUDGET_OPTIONS, PREP_TIME_OPTIONS, DAYS_OF_WEEK, MEALS_PER_DAY
+from config import (
+    BUDGET_OPTIONS, PREP_TIME_OPTIONS, DAYS_OF_WEEK, MEALS_PER_DAY, MENU_ALTERNATIVES, MAX_MENU_ALTERNATIVES
+)
 from utils.helpers import format_currency, format_time
 
 
@@ -26,7 +28,8 @@ class BudgetPanel(QWidget):
             "max_prep_time": 60,
             "days": DAYS_OF_WEEK.copy(),
             "meals_per_day": MEALS_PER_DAY.copy(),
-            "servings": 4  # Default servings
+            "servings": 4,  # Default servings
+            "alternatives": MENU_ALTERNATIVES  # AI alternatives per meal, for quick swaps
         }
         
         self._create_ui()
@@ -234,8 +237,36 @@ class BudgetPanel(QWidget):
         servings_hint_label = QLabel("* Số người ăn giúp tính toán khẩu phần và nguyên liệu chính xác hơn")
         servings_hint_label.setStyleSheet("font-style: italic; color: #888888; font-size: 10pt;")
         
+        # Alternatives generated with the menu (opt-in, they use more of the API)
+        alternatives_input_layout = QHBoxLayout()
+        alternatives_label = QLabel("Món thay thế mỗi bữa:")
+        alternatives_label.setMinimumWidth(150)
+        
+        self.alternatives_spin = QSpinBox()
+        self.alternatives_spin.setMinimum(0)
+        self.alternatives_spin.setMaximum(MAX_MENU_ALTERNATIVES)
+        self.alternatives_spin.setValue(self.settings["alternatives"])
+        self.alternatives_spin.valueChanged.connect(self._on_alternatives_changed)
+        
+        alternatives_description = QLabel("món")
+        alternatives_description.setMinimumWidth(100)
+        alternatives_description.setAlignment(Qt.AlignLeft | Qt.AlignVCenter)
+        
+        alternatives_input_layout.addWidget(alternatives_label)
+        alternatives_input_layout.addWidget(self.alternatives_spin)
+        alternatives_input_layout.addWidget(alternatives_description)
+        alternatives_input_layout.addStretch()
+        
+        alternatives_hint_label = QLabel(
+            "* Gợi ý sẵn món thay thế để đổi nhanh khi chỉnh sửa, nhưng tốn thêm lượt dùng AI khi tạo thực đơn"
+        )
+        alternatives_hint_label.setWordWrap(True)
+        alternatives_hint_label.setStyleSheet("font-style: italic; color: #888888; font-size: 10pt;")
+        
         servings_layout.addLayout(servings_input_layout)
         servings_layout.addWidget(servings_hint_label)
+        servings_layout.addLayout(alternatives_input_layout)
+        servings_layout.addWidget(alternatives_hint_label)
         
         # Days and Meals layout using two separate horizontal sections
         days_section = QVBoxLayout()
@@ -389,6 +420,10 @@ class BudgetPanel(QWidget):
         """Handle servings value change."""
         self.settings["servings"] = value
     
+    def _on_alternatives_changed(self, value):
+        """Handle alternatives per meal value change."""
+        self.settings["alternatives"] = value
+    
     def _on_days_changed(self):
         """Handle days checkboxes changes."""
         self.settings["days"] = [
@@ -3,18 +3,24 @@ Main window UI for the application.
 """
 import sys
 import os
+import time
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QTabWidget, QWidget, QVBoxLayout,
     QHBoxLayout, QLabel, QStatusBar, QMenuBar, QMenu, QMessageBox,
     QFileDialog, QAction, QProgressBar
 )
-from PyQt5.QtCore import Qt, QSize, QTimer, QPropertyAnimation, QEasingCurve, QPoint, QRect
+from PyQt5.QtCore import Qt, QSize, QTimer, QPropertyAnimation, QEasingCurve, QPoint, QRect, QEvent
 from PyQt5.QtGui import QIcon, QFont, QPalette, QColor, QScreen
 
-from config import APP_NAME, APP_VERSION
+from config import APP_NAME, APP_VERSION, VACUUM_IDLE_INTERVAL_MS, VACUUM_IDLE_AFTER_MS
 from database.db_manager import DatabaseManager
+from database.db_executor import DatabaseExecutor
+from database.backup import BackupManager
 from api.openai_api import OpenAIWrapper
+from api.job_manager import JobManager
+from api.llm_jobs import register_llm_jobs
 from utils.helpers import save_json, load_json, export_menu_to_text, ensure_directory_exists
+from utils.cost_engine import CostEngine, load_price_csv
 
 # Import UI panels
 from .preferences_panel import PreferencesPanel
@@ -32,8 +38,14 @@ class MainWindow(QMainWindow):
         
         # Initialize database and API
         self.db_manager = DatabaseManager()
+        self.db_executor = DatabaseExecutor(self.db_manager, self)
+        self.backup_manager = BackupManager()
         self.api = OpenAIWrapper()
         
+        # All LLM work goes through the job queue; started once the panels listen
+        self.job_manager = JobManager(self.db_manager, parent=self)
+        register_llm_jobs(self.job_manager, self.api, self.db_manager)
+        
         # Apply application style
         self._apply_application_style()
         
@@ -62,6 +74,18 @@ class MainWindow(QMainWindow):
         
         # Show initialization message
         self.status_bar.showMessage("Ứng dụng đã sẵn sàng!", 3000)
+        
+        # Take the periodic backup once the window is up
+        QTimer.singleShot(5000, self._auto_backup)
+        
+        # Archive old menus once, then free deleted pages a little at a time
+        # whenever the application is idle
+        QTimer.singleShot(10000, self._apply_retention)
+        self.last_input_time = time.monotonic()
+        QApplication.instance().installEventFilter(self)
+        self.vacuum_timer = QTimer(self)
+        self.vacuum_timer.timeout.connect(self._idle_vacuum)
+        self.vacuum_timer.start(VACUUM_IDLE_INTERVAL_MS)
     
     def _apply_application_style(self):
         """Apply custom styles to the application."""
@@ -476,6 +500,18 @@ class MainWindow(QMainWindow):
         
         file_menu.addSeparator()
         
+        # Backup action
+        backup_action = QAction("Sao lưu dữ liệu", self)
+        backup_action.triggered.connect(self._backup_database)
+        file_menu.addAction(backup_action)
+        
+        # Price table import
+        prices_action = QAction("Nhập bảng giá nguyên liệu...", self)
+        prices_action.triggered.connect(self._import_prices)
+        file_menu.addAction(prices_action)
+        
+        file_menu.addSeparator()
+        
         # Exit action
         exit_action = QAction("Thoát", self)
         exit_action.setShortcut("Ctrl+Q")
@@ -521,10 +557,11 @@ class MainWindow(QMainWindow):
         welcome_label.setAlignment(Qt.AlignCenter)
         
         # Create panels
-        self.preferences_panel = PreferencesPanel(self.db_manager)
+        self.preferences_panel = PreferencesPanel(self.db_manager, self.db_executor)
         self.cuisine_panel = CuisinePanel()
         self.budget_panel = BudgetPanel()
-        self.menu_panel = MenuPanel(self.api, self.db_manager)
+        self.menu_panel = MenuPanel(self.api, self.db_manager, self.db_executor, self.job_manager)
+        self.job_manager.start()
         
         # Connect panels to each other
         self.preferences_panel.user_selected.connect(self.menu_panel.set_user)
@@ -683,7 +720,7 @@ class MainWindow(QMainWindow):
                 file_name += '.txt'
             
             data = self.menu_panel.get_menu_data()
-            if data and export_menu_to_text(data['menu'], file_name):
+            if data and export_menu_to_text(data['menu'], file_name, self.menu_panel.shopping_list):
                 self.status_bar.showMessage(f"Đã xuất thực đơn vào {file_name}", 3000)
             else:
                 QMessageBox.warning(
@@ -692,6 +729,103 @@ class MainWindow(QMainWindow):
                     "Không thể xuất thực đơn"
                 )
     
+    def _backup_database(self):
+        """Back up the database in the background."""
+        self.status_bar.showMessage("🔄 Đang sao lưu dữ liệu...", 3000)
+        self.db_executor.submit(
+            'backup', self.backup_manager.backup,
+            on_result=self._on_backup_finished,
+            on_error=self._on_backup_error
+        )
+    
+    def _auto_backup(self):
+        """Back up the database if the last backup is older than the interval."""
+        if self.backup_manager.is_due():
+            self._backup_database()
+    
+    def _on_backup_finished(self, metrics):
+        """Report a finished backup."""
+        size_kb = metrics['stored_bytes'] / 1024
+        self.status_bar.showMessage(
+            f"✅ Đã sao lưu dữ liệu ({size_kb:.0f} KB, {metrics['seconds']:.1f} giây)", 5000
+        )
+    
+    def _on_backup_error(self, error):
+        """Report a failed backup."""
+        QMessageBox.warning(
+            self,
+            "Lỗi",
+            f"Không thể sao lưu dữ liệu: {str(error)}"
+        )
+    
+    def _import_prices(self):
+        """Import an ingredient price table from CSV and re-price the saved menus."""
+        file_name, _ = QFileDialog.getOpenFileName(
+            self,
+            "Nhập bảng giá nguyên liệu",
+            "",
+            "CSV Files (*.csv)"
+        )
+        
+        if file_name:
+            self.status_bar.showMessage("🔄 Đang nhập bảng giá và tính lại chi phí thực đơn...", 3000)
+            self.db_executor.submit(
+                'prices', self._load_prices, file_name,
+                servings=self.budget_panel.settings.get("servings", 4),
+                on_result=self._on_prices_imported,
+                on_error=self._on_prices_error
+            )
+    
+    def _load_prices(self, file_name, servings):
+        """Store a CSV price table and re-price every saved menu (runs on the database executor)."""
+        prices = load_price_csv(file_name)
+        count = self.db_manager.save_ingredient_prices(prices.itertuples(index=False, name=None))
+        menus = CostEngine.from_database(self.db_manager).reprice_saved_menus(self.db_manager, servings)
+        return count, menus
+    
+    def _on_prices_imported(self, result):
+        """Report an imported price table."""
+        count, menus = result
+        self.status_bar.showMessage(f"✅ Đã nhập {count} giá nguyên liệu, tính lại chi phí {menus} thực đơn", 5000)
+        self.menu_panel.refresh_prices()
+    
+    def _on_prices_error(self, error):
+        """Report a failed price table import."""
+        QMessageBox.warning(
+            self,
+            "Lỗi",
+            f"Không thể nhập bảng giá: {str(error)}"
+        )
+    
+    def _apply_retention(self):
+        """Archive menus beyond the retention limit in the background."""
+        self.db_executor.submit('menus', self.db_manager.apply_retention)
+    
+    def eventFilter(self, obj, event):
+        """Remember when the user last used the keyboard or the mouse."""
+        if event.type() in (QEvent.KeyPress, QEvent.MouseButtonPress, QEvent.MouseMove, QEvent.Wheel):
+            self.last_input_time = time.monotonic()
+        return super().eventFilter(obj, event)
+    
+    def _is_idle(self):
+        """Check that no database or LLM work is queued and the user has been away for a while."""
+        if self.db_executor.pending() or self.job_manager.pending():
+            return False
+        return (time.monotonic() - self.last_input_time) * 1000 >= VACUUM_IDLE_AFTER_MS
+    
+    def _idle_vacuum(self):
+        """Run one incremental vacuum step in the background if the application is idle.
+        
+        The first idle moment after an upgrade converts the database to
+        incremental auto-vacuum instead.
+        """
+        if not self._is_idle():
+            return
+        if self.db_manager.needs_vacuum_conversion:
+            self.db_executor.submit('maintenance', self.db_manager.enable_incremental_vacuum)
+        else:
+            self.db_executor.submit('maintenance', self.db_manager.incremental_vacuum)
+    
     def _show_about(self):
         """Show about dialog."""
         about_text = f"""
@@ -730,6 +864,12 @@ class MainWindow(QMainWindow):
         )
         
         if confirmation == QMessageBox.StandardButton.Yes:
+            # Let pending database writes finish before exiting
+            self.vacuum_timer.stop()
+            QApplication.instance().removeEventFilter(self)
+            # Unfinished LLM jobs stay stored and run again on the next start
+            self.job_manager.shutdown()
+            self.db_executor.shutdown(wait=True)
             event.accept()
         else:
             event.ignore() 
\ No newline at end of file
@@ -2,6 +2,7 @@
 Menu panel for displaying and managing the weekly menu.
 """
 import os
+import copy
 import json
 import logging
 from datetime import datetime
@@ -11,12 +12,23 @@ from PyQt5.QtWidgets import (
     QTextEdit, QComboBox, QSpinBox, QGroupBox, QSplitter, QFrame, QHeaderView,
     QFileDialog, QLineEdit, QListWidget, QListWidgetItem, QScrollArea
 )
-from PyQt5.QtCore import Qt, QSize, pyqtSlot, QThread, pyqtSignal
+from PyQt5.QtCore import Qt, QSize, pyqtSlot
 from PyQt5.QtGui import QColor
 
 from database.models import User, Menu, Recipe
+from config import RECIPE_PREFETCH_DAYS, MENU_ALTERNATIVES
+from api.job_manager import PRIORITY_INTERACTIVE, PRIORITY_PREFETCH, PRIORITY_SPECULATIVE
+from api.llm_jobs import MENU_JOB, RECIPE_JOB, menu_job_key, recipe_job_key
 from utils.helpers import format_currency, format_time
 from utils.ingredient_optimizer import IngredientOptimizer
+from utils.menu_solver import MenuSolver
+from utils.shopping_list import ShoppingList
+from utils.cost_engine import CostEngine
+from utils.menu_analysis import MenuAnalysis
+from utils.substitution_index import SubstitutionIndex, recipe_meal_info
+from utils.dislike_matcher import DislikeMatcher
+from utils.ingredient_canonicalizer import canonical_key
+from utils.meal_alternatives import ALTERNATIVES_KEY, swap_alternative
 from ui.toast import ToastNotification
 
 # Configure logging
@@ -27,85 +39,20 @@ RECIPES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'recipes'
 if not os.path.exists(RECIPES_DIR):
     os.makedirs(RECIPES_DIR)
 
-class MenuGeneratorWorker(QThread):
-    """Worker thread for generating menu without blocking UI."""
-    
-    finished = pyqtSignal(dict)  # Signal emitted when generation is complete
-    error = pyqtSignal(str)      # Signal emitted on error
-    
-    def __init__(self, api, user, cuisine_type, budget_per_meal, max_prep_time, days, meals_per_day, servings):
-        """Initialize the worker."""
-        super().__init__()
-        self.api = api
-        self.user = user
-        self.cuisine_type = cuisine_type
-        self.budget_per_meal = budget_per_meal
-        self.max_prep_time = max_prep_time
-        self.days = days
-        self.meals_per_day = meals_per_day
-        self.servings = servings
-    
-    def run(self):
-        """Run the generation in a separate thread."""
-        try:
-            result = self.api.generate_weekly_menu(
-                self.user,
-                self.cuisine_type,
-                self.budget_per_meal,
-                self.max_prep_time,
-                self.days,
-                self.meals_per_day,
-                self.servings
-            )
-            
-            # Check for errors in the result
-            if isinstance(result, dict) and "error" in result:
-                self.error.emit(result["error"])
-                return
-                
-            self.finished.emit(result)
-        except Exception as e:
-            self.error.emit(str(e))
-
-
-class RecipeGeneratorWorker(QThread):
-    """Worker thread for generating recipes without blocking UI."""
-    
-    finished = pyqtSignal(dict)  # Signal emitted when generation is complete
-    error = pyqtSignal(str)      # Signal emitted on error
-    
-    def __init__(self, api, dish_name, cuisine_type, servings=4):
-        """Initialize the worker."""
-        super().__init__()
-        self.api = api
-        self.dish_name = dish_name
-        self.cuisine_type = cuisine_type
-        self.servings = servings
-    
-    def run(self):
-        """Run the generation in a separate thread."""
-        try:
-            result = self.api.generate_recipe(self.dish_name, self.cuisine_type, self.servings)
-            
-            # Check for errors in the result
-            if isinstance(result, dict) and "error" in result:
-                self.error.emit(result["error"])
-                return
-                
-            self.finished.emit(result)
-        except Exception as e:
-            self.error.emit(str(e))
-
-
 class MenuPanel(QWidget):
     """Panel for generating and displaying the weekly menu."""
     
-    def __init__(self, api, db_manager):
+    def __init__(self, api, db_manager, db_executor, job_manager):
         """Initialize the panel."""
         super().__init__()
         
         self.api = api
         self.db_manager = db_manager
+        self.db_executor = db_executor
+        self.job_manager = job_manager
+        self.job_manager.job_progress.connect(self._on_job_progress)
+        self.job_manager.job_finished.connect(self._on_job_finished)
+        self.api.availability_changed.connect(self._on_api_availability_changed)
         
         self.user = None
         self.cuisine_type = None
@@ -113,10 +60,22 @@ class MenuPanel(QWidget):
         
         self.current_menu = {}
         self.optimization_notes = []
+        self.shopping_list = None
         
-        # Add worker thread references
-        self.menu_worker = None
-        self.recipe_worker = None
+        # Live analysis of the current menu, updated one meal at a time
+        self.analysis = None
+        self.cost_engine = None
+        self.menu_recipes = {}
+        
+        # Similarity index of known dishes, for instant substitutions
+        self.substitution_index = None
+        
+        # Draft of a generation that is missing days, see _resume_generation
+        self.pending_draft_id = None
+        
+        # Jobs whose progress the status label shows
+        self.menu_job = None
+        self.recipe_job = None
         
         # Create toast notification
         self.toast = ToastNotification(self)
@@ -160,6 +119,17 @@ class MenuPanel(QWidget):
         self.generate_button.clicked.connect(self._generate_menu)
         self.generate_button.setEnabled(False)
         
+        # Plan a menu from saved dishes, without calling the API
+        self.local_generate_button = QPushButton("Tạo nhanh (không dùng AI)")
+        self.local_generate_button.setToolTip("Tạo thực đơn từ các món ăn trong những thực đơn đã lưu")
+        self.local_generate_button.clicked.connect(self._generate_local_menu)
+        self.local_generate_button.setEnabled(False)
+        
+        # Generate only the days a failed or interrupted generation is missing
+        self.resume_button = QPushButton("Tạo tiếp các ngày còn thiếu")
+        self.resume_button.clicked.connect(self._resume_generation)
+        self.resume_button.setVisible(False)
+        
         # Add saved recipes button
         self.saved_recipes_button = QPushButton("Công thức đã lưu")
         self.saved_recipes_button.clicked.connect(self.view_saved_recipes)
@@ -171,10 +141,25 @@ class MenuPanel(QWidget):
         generate_layout.addWidget(self.saved_recipes_button)
         generate_layout.addWidget(self.saved_menus_button)
         generate_layout.addStretch()
+        generate_layout.addWidget(self.resume_button)
+        generate_layout.addWidget(self.local_generate_button)
         generate_layout.addWidget(self.generate_button)
         
         top_section.addLayout(generate_layout)
         
+        # Degraded mode indicator, shown while the API circuit is open
+        self.offline_label = QLabel(
+            "⚠ Chế độ ngoại tuyến: không kết nối được OpenAI. Đang dùng công thức đã lưu và "
+            "danh mục món ăn; \"Tạo thực đơn\" sẽ tạo nhanh từ các món đã lưu. Ứng dụng tự thử kết nối lại."
+        )
+        self.offline_label.setWordWrap(True)
+        self.offline_label.setStyleSheet(
+            "background-color: #FFF3CD; color: #856404; border: 1px solid #FFE08A; "
+            "border-radius: 4px; padding: 6px; font-weight: bold;"
+        )
+        self.offline_label.setVisible(False)
+        top_section.addWidget(self.offline_label)
+        
         # Add top section to main layout
         main_layout.addLayout(top_section)
         
@@ -237,9 +222,14 @@ class MenuPanel(QWidget):
         self.edit_button.clicked.connect(self._edit_menu)
         self.edit_button.setEnabled(False)
         
+        self.shopping_list_button = QPushButton("Danh sách đi chợ")
+        self.shopping_list_button.clicked.connect(self._show_shopping_list)
+        self.shopping_list_button.setEnabled(False)
+        
         buttons_layout.addWidget(self.clear_button)
         buttons_layout.addWidget(self.save_menu_button)
         buttons_layout.addStretch()
+        buttons_layout.addWidget(self.shopping_list_button)
         buttons_layout.addWidget(self.edit_button)
         
         main_layout.addLayout(buttons_layout)
@@ -252,6 +242,11 @@ class MenuPanel(QWidget):
             self.user = user
             self.user_status_label.setText(f"Người dùng: {user.name}")
             self._check_generate_button()
+            self._check_unfinished_draft()
+            if self.analysis is not None:
+                # The menu on screen is checked against the new preferences
+                self.analysis.set_matcher(DislikeMatcher.for_user(user))
+                self._show_optimization_notes()
             self.toast.show_message(f"Đã chọn người dùng: {user.name}")
             logger.info("User set successfully")
         except Exception as e:
@@ -266,6 +261,7 @@ class MenuPanel(QWidget):
             self.cuisine_type = cuisine_type
             self.cuisine_status_label.setText(f"Phong cách ẩm thực: {cuisine_type}")
             self._check_generate_button()
+            self._load_substitution_index()
             self.toast.show_message(f"Đã chọn phong cách ẩm thực: {cuisine_type}")
             logger.info("Cuisine type set successfully")
         except Exception as e:
@@ -282,6 +278,13 @@ class MenuPanel(QWidget):
             prep_time_text = format_time(settings['max_prep_time'])
             self.budget_status_label.setText(f"Ngân sách: {budget_text} - Thời gian: {prep_time_text}")
             self._check_generate_button()
+            # The budget applies first, so notes shown after repricing use it too
+            if self.analysis is not None:
+                self.analysis.set_budget(settings['budget_per_meal'])
+            if self.shopping_list is not None and self.shopping_list.servings != self._servings():
+                self._rebuild_shopping_list()
+            elif self.analysis is not None:
+                self._show_optimization_notes()
             self.toast.show_message("Đã áp dụng thiết lập thành công!")
             logger.info("Budget settings set successfully")
         except Exception as e:
@@ -289,12 +292,14 @@ class MenuPanel(QWidget):
             raise
     
     def _check_generate_button(self):
-        """Check if the generate button should be enabled."""
-        self.generate_button.setEnabled(
+        """Check if the generate buttons should be enabled."""
+        ready = (
             self.user is not None and
             self.cuisine_type is not None and
             self.budget_settings is not None
         )
+        self.generate_button.setEnabled(ready)
+        self.local_generate_button.setEnabled(ready)
     
     def _generate_menu(self):
         """Generate a new menu."""
@@ -306,6 +311,12 @@ class MenuPanel(QWidget):
             )
             return
         
+        if not self.api.is_available():
+            # Offline: assemble the menu from the dish catalog instead
+            self.toast.show_message("Chế độ ngoại tuyến: tạo thực đơn từ các món đã lưu")
+            self._generate_local_menu()
+            return
+        
         # Show progress indicators
         self.progress_container.setVisible(True)
         self._update_status_label("Đang chuẩn bị tạo thực đơn tuần...")
@@ -313,27 +324,182 @@ class MenuPanel(QWidget):
         # Disable generate button
         self.generate_button.setEnabled(False)
         
-        # Connect to API progress signal before creating worker
-        self.api.progress_signal.connect(self._update_status_label)
-        
-        # Create worker thread for menu generation
-        self.menu_worker = MenuGeneratorWorker(
-            self.api,
-            self.user,
-            self.cuisine_type,
-            self.budget_settings["budget_per_meal"],
-            self.budget_settings["max_prep_time"],
-            self.budget_settings["days"],
-            self.budget_settings["meals_per_day"],
-            self.budget_settings.get("servings", 4)  # Sử dụng thông tin khẩu phần, mặc định là 4 nếu không có
+        # A new generation replaces an unfinished one
+        self._discard_pending_draft()
+        
+        # The draft holds the settings and checkpoints every generated day
+        self.db_executor.submit(
+            'menus', self.db_manager.create_generation_draft, self.user.id, self.cuisine_type,
+            {
+                "budget_per_meal": self.budget_settings["budget_per_meal"],
+                "max_prep_time": self.budget_settings["max_prep_time"],
+                "days": list(self.budget_settings["days"]),
+                "meals_per_day": list(self.budget_settings["meals_per_day"]),
+                "servings": self.budget_settings.get("servings", 4),  # Sử dụng thông tin khẩu phần, mặc định là 4 nếu không có
+                "alternatives": self.budget_settings.get("alternatives", MENU_ALTERNATIVES)
+            },
+            on_result=self._start_menu_job,
+            on_error=self._handle_menu_error
         )
+    
+    def _start_menu_job(self, draft_id):
+        """Queue the generation of the missing days of a draft."""
+        self.menu_job = self.job_manager.submit(
+            MENU_JOB, {"draft_id": draft_id}, PRIORITY_INTERACTIVE, menu_job_key(draft_id),
+            on_result=self._handle_menu_result,
+            on_error=lambda error: self._on_menu_job_error(draft_id, error)
+        )
+    
+    def _on_menu_job_error(self, draft_id, error):
+        """Keep a draft whose days all failed, so it can be resumed."""
+        self._set_pending_draft(draft_id)
+        self._handle_menu_error(error)
+    
+    def _on_job_progress(self, job, message):
+        """Show the progress of the jobs the panel waits for."""
+        if job is self.menu_job or job is self.recipe_job:
+            self._update_status_label(message)
+    
+    def _on_job_finished(self, job, result):
+        """Show the menu of a job restored after a restart, if its draft is displayed."""
+        if (job.kind == MENU_JOB and job is not self.menu_job and
+                self.pending_draft_id is not None and job.payload.get("draft_id") == self.pending_draft_id):
+            self._handle_menu_result(result)
+    
+    def _resume_generation(self):
+        """Generate the missing days of the unfinished draft."""
+        if self.pending_draft_id is None or not self.user:
+            return
+        if not self.api.is_available():
+            self.toast.show_message("Chế độ ngoại tuyến: sẽ tạo tiếp khi kết nối lại được OpenAI")
+            return
+        
+        self.progress_container.setVisible(True)
+        self._update_status_label("Đang tạo tiếp các ngày còn thiếu...")
+        self.generate_button.setEnabled(False)
+        self.resume_button.setEnabled(False)
+        
+        # Joins the job of the draft if it is still running after a restart
+        self._start_menu_job(self.pending_draft_id)
+    
+    def _on_api_availability_changed(self, available):
+        """Show or hide the offline mode indicator."""
+        if self.offline_label.isHidden() == available:
+            return
+        self.offline_label.setVisible(not available)
+        self.resume_button.setEnabled(available and self.pending_draft_id is not None)
+        if available:
+            self.toast.show_message("Đã kết nối lại OpenAI")
+        else:
+            self.toast.show_message("Mất kết nối OpenAI: chuyển sang chế độ ngoại tuyến")
+    
+    def _set_pending_draft(self, draft_id):
+        """Remember the draft that can be resumed and show the resume button."""
+        self.pending_draft_id = draft_id
+        self.resume_button.setVisible(draft_id is not None)
+        self.resume_button.setEnabled(draft_id is not None and self.api.is_available())
+    
+    def _delete_draft(self, draft_id):
+        """Delete a draft that is complete or no longer wanted."""
+        self.db_executor.submit(
+            'menus', self.db_manager.delete_generation_draft, draft_id,
+            on_error=self._on_database_error
+        )
+    
+    def _discard_pending_draft(self):
+        """Delete the unfinished draft, e.g. when a new menu is started."""
+        if self.pending_draft_id is not None:
+            self._delete_draft(self.pending_draft_id)
+            self._set_pending_draft(None)
+    
+    def _check_unfinished_draft(self):
+        """Look for a generation of the user that was interrupted or failed."""
+        self.db_executor.submit(
+            'menus', self.db_manager.get_unfinished_draft, self.user.id,
+            on_result=self._on_unfinished_draft_loaded,
+            on_error=lambda error: logger.error(f"Error loading unfinished draft: {str(error)}")
+        )
+    
+    def _on_unfinished_draft_loaded(self, draft):
+        """Show the days of an unfinished generation and offer to resume it."""
+        if draft is None or self.current_menu:
+            return
+        
+        missing = {
+            day: draft["failed_days"].get(day, "chưa tạo")
+            for day in draft["settings"]["days"] if day not in draft["days"]
+        }
+        if not missing:
+            # Finished by a job after the last session closed, but never shown
+            self._handle_menu_result({
+                "menu": draft["days"],
+                "draft_id": draft["id"],
+                "optimization_notes": ["Đã khôi phục thực đơn vừa tạo xong"]
+            })
+            self.toast.show_message("Đã khôi phục thực đơn vừa tạo xong")
+            return
+        
+        self._set_pending_draft(draft["id"])
+        if draft["days"]:
+            self._handle_menu_result({
+                "menu": draft["days"],
+                "draft_id": draft["id"],
+                "failed_days": missing,
+                "optimization_notes": [
+                    f"Đã khôi phục thực đơn đang tạo dở, còn thiếu: {', '.join(missing)}"
+                ] + [f"⚠ Chưa tạo được thực đơn cho {day}: {error}" for day, error in draft["failed_days"].items()]
+            })
+        self.toast.show_message("Có thực đơn đang tạo dở, bấm \"Tạo tiếp các ngày còn thiếu\" để hoàn thành")
+    
+    def _generate_local_menu(self):
+        """Generate a new menu from the dish catalog, without the API."""
+        if not self.user or not self.cuisine_type or not self.budget_settings:
+            QMessageBox.warning(
+                self,
+                "Thiếu thông tin",
+                "Vui lòng cung cấp đầy đủ thông tin về người dùng, phong cách ẩm thực và ngân sách."
+            )
+            return
         
-        # Connect signals
-        self.menu_worker.finished.connect(self._handle_menu_result)
-        self.menu_worker.error.connect(self._handle_menu_error)
+        self.progress_container.setVisible(True)
+        self._update_status_label("Đang tạo thực đơn từ các món ăn đã lưu...")
+        self.generate_button.setEnabled(False)
+        self.local_generate_button.setEnabled(False)
         
-        # Start worker
-        self.menu_worker.start()
+        self.db_executor.submit(
+            'dishes', self._solve_local_menu,
+            self.user, self.cuisine_type, dict(self.budget_settings),
+            on_result=self._handle_local_menu_result,
+            on_error=self._handle_local_menu_error
+        )
+    
+    def _solve_local_menu(self, user, cuisine_type, budget_settings):
+        """Load the dish catalog and plan a menu (runs on the database executor)."""
+        solver = MenuSolver(self.db_manager.get_all_dishes(cuisine_type))
+        return solver.solve(
+            budget_settings["days"],
+            budget_settings["meals_per_day"],
+            budget_settings["budget_per_meal"],
+            budget_settings["max_prep_time"],
+            user,
+            self.db_manager.get_dish_history(user.id)
+        )
+    
+    def _handle_local_menu_result(self, result):
+        """Display a menu planned from the dish catalog."""
+        self.local_generate_button.setEnabled(True)
+        self._handle_menu_result(result)
+    
+    def _handle_local_menu_error(self, error):
+        """Report that no menu could be planned from the dish catalog."""
+        self.progress_container.setVisible(False)
+        self.generate_button.setEnabled(True)
+        self.local_generate_button.setEnabled(True)
+        QMessageBox.warning(
+            self,
+            "Không thể tạo thực đơn",
+            str(error)
+        )
     
     def _update_status_label(self, message):
         """Update the status label with progress information."""
@@ -345,8 +511,20 @@ class MenuPanel(QWidget):
         if "menu" in result:
             self.current_menu = result["menu"]
             self.optimization_notes = result.get("optimization_notes", [])
-            
+            # Days that failed are flagged in the notes and can be generated later
+            draft_id = result.get("draft_id")
+            if draft_id != self.pending_draft_id:
+                # Another menu replaces the unfinished one
+                self._discard_pending_draft()
+            if draft_id is not None and not result.get("failed_days"):
+                # Complete: the draft is no longer needed
+                self._delete_draft(draft_id)
+                draft_id = None
+            self._set_pending_draft(draft_id)
+            
+            self._reset_analysis()
             self._display_menu()
+            self._rebuild_shopping_list(prefetch=True)
             
             # Enable buttons
             self.clear_button.setEnabled(True)
@@ -356,28 +534,18 @@ class MenuPanel(QWidget):
         # Hide progress
         self.progress_container.setVisible(False)
         self.generate_button.setEnabled(True)
-        
-        # Safely disconnect the progress signal
-        try:
-            self.api.progress_signal.disconnect(self._update_status_label)
-        except TypeError:
-            # Signal was not connected
-            logger.info("Progress signal was not connected")
-            pass
     
     def _handle_menu_error(self, error_msg):
         """Handle menu generation error."""
+        error_msg = str(error_msg)
         # Hide progress
         self.progress_container.setVisible(False)
         self.generate_button.setEnabled(True)
         
-        # Safely disconnect the progress signal
-        try:
-            self.api.progress_signal.disconnect(self._update_status_label)
-        except TypeError:
-            # Signal was not connected
-            logger.info("Progress signal was not connected")
-            pass
+        if not self.api.is_available():
+            # The offline indicator explains the failure; no dialog for every click
+            self.toast.show_message("Chế độ ngoại tuyến: chưa tạo được thực đơn, hãy dùng \"Tạo nhanh\" hoặc tạo tiếp sau")
+            return
         
         # Show error message
         if "429" in error_msg:
@@ -533,9 +701,7 @@ class MenuPanel(QWidget):
         self.days_tab_widget.clear()
         
         # Display optimization notes
-        self.optimization_notes_text.clear()
-        for note in self.optimization_notes:
-            self.optimization_notes_text.append(f"• {note}")
+        self._show_optimization_notes()
         
         # Create tabs for each day
         for day, meals in self.current_menu.items():
@@ -665,13 +831,17 @@ class MenuPanel(QWidget):
             return
         
         meal_info = self.current_menu[current_day][selected_meal]
+        substitutes = self._find_substitutes(current_day, selected_meal, meal_info)
         
         # Create and show the edit dialog
-        dialog = MealEditDialog(self, meal_info, self.cuisine_type)
+        dialog = MealEditDialog(self, meal_info, self.cuisine_type, substitutes)
         if dialog.exec() == QDialog.DialogCode.Accepted:
             # Update the meal info
             updated_meal = dialog.get_meal_info()
             self.current_menu[current_day][selected_meal] = updated_meal
+            if self.analysis is not None:
+                self.analysis.set_meal(current_day, selected_meal, updated_meal)
+            self._update_shopping_list(current_day, selected_meal, updated_meal)
             
             # Update the display
             self._display_menu()
@@ -679,6 +849,42 @@ class MenuPanel(QWidget):
             # Set the current tab back to the day we were editing
             self.days_tab_widget.setCurrentIndex(current_tab_index)
     
+    def _load_substitution_index(self):
+        """Index the known dishes of the current cuisine in the background."""
+        self.db_executor.submit(
+            'dishes', SubstitutionIndex.from_database, self.db_manager, self.cuisine_type,
+            on_result=self._on_substitution_index_loaded,
+            on_error=lambda error: logger.error(f"Error indexing dishes: {str(error)}")
+        )
+    
+    def _on_substitution_index_loaded(self, index):
+        """Keep the dish index for the meal edit dialog."""
+        self.substitution_index = index
+    
+    def _find_substitutes(self, day, meal_time, meal_info):
+        """Find known dishes that could replace a meal of the current menu."""
+        if self.substitution_index is None:
+            return []
+        
+        slot = (day, meal_time)
+        if self.analysis is not None:
+            postings = self.analysis.index.postings
+            week_ingredients = {key for key, slots in postings.items() if any(other != slot for other in slots)}
+        else:
+            week_ingredients = {
+                canonical_key(ingredient)
+                for other_day, day_meals in self.current_menu.items() for other_time, other in day_meals.items()
+                if (other_day, other_time) != slot and isinstance(other, dict)
+                for ingredient in other.get("ingredients") or []
+            }
+        menu_dishes = [
+            other.get("name") for day_meals in self.current_menu.values()
+            for other in day_meals.values() if isinstance(other, dict)
+        ]
+        return self.substitution_index.similar(
+            meal_info, week_ingredients, exclude=menu_dishes, matcher=DislikeMatcher.for_user(self.user)
+        )
+    
     def _view_recipe_for_meal(self, meal_info):
         """View recipe for a specific meal."""
         import logging
@@ -686,59 +892,72 @@ class MenuPanel(QWidget):
         try:
             logger.info(f"[VIEW RECIPE] Bắt đầu xem công thức cho món: {meal_info.get('name')}")
             dish_name = meal_info["name"]
-            servings = meal_info.get("servings", 4)
-            if self.budget_settings and "servings" in self.budget_settings:
-                servings = self.budget_settings["servings"]
-            recipe = self.db_manager.get_recipe_by_name(dish_name)
+            servings = self._recipe_servings(meal_info)
+            self.db_executor.submit(
+                'recipes', self.db_manager.get_recipe_by_name, dish_name,
+                on_result=lambda recipe: self._show_or_generate_recipe(dish_name, servings, recipe),
+                on_error=self._on_database_error
+            )
+        except Exception as e:
+            logger.error(f"[VIEW RECIPE] Lỗi tổng quát khi xem công thức: {e}")
+            import traceback
+            logger.error(traceback.format_exc())
+    
+    def _recipe_servings(self, meal_info):
+        """Get the servings a meal's recipe is generated for."""
+        if self.budget_settings and "servings" in self.budget_settings:
+            return self.budget_settings["servings"]
+        return meal_info.get("servings", 4)
+    
+    def _show_or_generate_recipe(self, dish_name, servings, recipe):
+        """Show the saved recipe, or start generating one if none is saved."""
+        try:
             if recipe:
                 self.status_label.setText(f"Hiển thị công thức đã lưu cho món {dish_name}")
                 try:
-                    recipe_data = json.loads(recipe.content)
-                    if "recipe" in recipe_data and "servings" in recipe_data["recipe"]:
-                        recipe_data["recipe"]["servings"] = servings
+                    # Copy before adjusting servings so the cached recipe stays untouched
+                    recipe_data = dict(recipe.get_data())
+                    if isinstance(recipe_data.get("recipe"), dict) and "servings" in recipe_data["recipe"]:
+                        recipe_data["recipe"] = dict(recipe_data["recipe"], servings=servings)
                     dialog = RecipeDialog(self, recipe_data, dish_name)
                     dialog.exec()
                     logger.info(f"[VIEW RECIPE] Đã hiển thị công thức đã lưu cho món: {dish_name}")
                     return
                 except Exception as e:
                     logger.error(f"[VIEW RECIPE] Lỗi khi load công thức đã lưu: {e}")
+            if not self.api.is_available():
+                # Offline: only saved recipes can be shown
+                self.status_label.setText(f"Chế độ ngoại tuyến: chưa có công thức đã lưu cho món {dish_name}")
+                self.toast.show_message(f"Chế độ ngoại tuyến: chưa có công thức đã lưu cho món {dish_name}")
+                return
             self.status_label.setText(f"Đang tạo công thức cho món {dish_name}... Vui lòng đợi")
             self.progress_container.setVisible(True)
-            self.api.progress_signal.connect(self._update_status_label)
-            self.recipe_worker = RecipeGeneratorWorker(
-                self.api,
-                dish_name,
-                self.cuisine_type,
-                servings
+            # The user is waiting: runs before prefetched and speculative work
+            self.recipe_job = self.job_manager.submit(
+                RECIPE_JOB,
+                {"dish_name": dish_name, "cuisine_type": self.cuisine_type, "servings": servings},
+                PRIORITY_INTERACTIVE,
+                recipe_job_key(dish_name, self.cuisine_type, servings),
+                on_result=lambda recipe_data: self._handle_recipe_result(recipe_data, dish_name),
+                on_error=self._handle_recipe_error
             )
-            self.recipe_worker.finished.connect(lambda recipe_data: self._handle_recipe_result(recipe_data, dish_name))
-            self.recipe_worker.error.connect(self._handle_recipe_error)
-            self.recipe_worker.start()
             logger.info(f"[VIEW RECIPE] Đã bắt đầu tạo công thức mới cho món: {dish_name}")
         except Exception as e:
             logger.error(f"[VIEW RECIPE] Lỗi tổng quát khi xem công thức: {e}")
             import traceback
             logger.error(traceback.format_exc())
     
+    def _apply_loaded_menu_user(self, user):
+        """Switch to the user who owns a loaded menu."""
+        if user:
+            self.user = user
+            self.user_status_label.setText(f"Người dùng: {user.name}")
+    
     def _handle_recipe_result(self, recipe_data, dish_name):
-        """Handle the recipe generation result."""
+        """Handle the recipe generation result (the job already saved the recipe)."""
         # Hide progress
         self.progress_container.setVisible(False)
         
-        # Safely disconnect the progress signal
-        try:
-            self.api.progress_signal.disconnect(self._update_status_label)
-        except TypeError:
-            # Signal was not connected
-            pass
-        
-        # Save recipe to database
-        try:
-            recipe_json = json.dumps(recipe_data, ensure_ascii=False)
-            self.db_manager.save_recipe(dish_name, recipe_json, self.cuisine_type)
-        except Exception as e:
-            print(f"Error saving recipe to database: {e}")
-        
         # Display recipe
         dialog = RecipeDialog(self, recipe_data, dish_name)
         dialog.exec()
@@ -748,12 +967,9 @@ class MenuPanel(QWidget):
         # Hide progress
         self.progress_container.setVisible(False)
         
-        # Safely disconnect the progress signal
-        try:
-            self.api.progress_signal.disconnect(self._update_status_label)
-        except TypeError:
-            # Signal was not connected
-            pass
+        if not self.api.is_available():
+            self.toast.show_message(f"Chế độ ngoại tuyến: {error_msg}")
+            return
         
         # Show error message
         QMessageBox.critical(
@@ -764,9 +980,14 @@ class MenuPanel(QWidget):
     
     def clear_menu(self):
         """Clear the current menu."""
+        self._discard_pending_draft()
         self.current_menu = {}
         self.optimization_notes = []
         
+        self.shopping_list = None
+        self.analysis = None
+        self.menu_recipes = {}
+        
         # Clear UI
         self.days_tab_widget.clear()
         self.optimization_notes_text.clear()
@@ -775,6 +996,7 @@ class MenuPanel(QWidget):
         self.clear_button.setEnabled(False)
         self.edit_button.setEnabled(False)
         self.save_menu_button.setEnabled(False)
+        self.shopping_list_button.setEnabled(False)
     
     def get_menu_data(self):
         """Get the current menu data."""
@@ -799,7 +1021,9 @@ class MenuPanel(QWidget):
         self.optimization_notes = data.get("optimization_notes", [])
         
         # Display the menu
+        self._reset_analysis()
         self._display_menu()
+        self._rebuild_shopping_list()
         
         # Enable buttons
         self.clear_button.setEnabled(True)
@@ -808,9 +1032,170 @@ class MenuPanel(QWidget):
         
         return True
 
+    def _servings(self):
+        """Get the number of people the menu is cooked for."""
+        if self.budget_settings:
+            return self.budget_settings.get("servings", 4)
+        return 4
+    
+    def _rebuild_shopping_list(self, prefetch=False):
+        """Build the shopping list of the whole menu from the saved recipes.
+        
+        With prefetch, the recipes that are not saved yet are then generated
+        in the background (see _prefetch_recipes).
+        """
+        names = [
+            meal_info["name"] for day_meals in self.current_menu.values()
+            for meal_info in day_meals.values() if isinstance(meal_info, dict) and meal_info.get("name")
+        ]
+        self.db_executor.submit(
+            'recipes', self.db_manager.get_recipes_by_names, names,
+            on_result=lambda recipes: self._on_shopping_recipes_loaded(recipes, prefetch),
+            on_error=self._on_database_error
+        )
+    
+    def _on_shopping_recipes_loaded(self, recipes, prefetch=False):
+        """Build the shopping list once the recipes of the menu are loaded."""
+        if not self.current_menu:
+            return
+        self.shopping_list = ShoppingList.from_menu(self.current_menu, recipes, self._servings())
+        self.shopping_list_button.setEnabled(True)
+        self.menu_recipes = dict(recipes)
+        self.refresh_prices()
+        if prefetch:
+            self._prefetch_recipes()
+    
+    def _prefetch_recipes(self):
+        """Generate the missing recipes of the first days of a new menu in the background.
+        
+        The first day's recipes are the likeliest to be opened next and are
+        prefetched; those of the following days may never be opened and
+        only run when no other job waits. Opening one of these recipes joins
+        its job and moves it to the front of the queue.
+        """
+        if not self.api.is_available():
+            return
+        
+        submitted = set()
+        for number, day_meals in enumerate(list(self.current_menu.values())[:RECIPE_PREFETCH_DAYS]):
+            if not isinstance(day_meals, dict):
+                continue
+            priority = PRIORITY_PREFETCH if number == 0 else PRIORITY_SPECULATIVE
+            for meal_info in day_meals.values():
+                dish_name = meal_info.get("name") if isinstance(meal_info, dict) else None
+                if not dish_name or dish_name in self.menu_recipes or dish_name in submitted:
+                    continue
+                submitted.add(dish_name)
+                servings = self._recipe_servings(meal_info)
+                self.job_manager.submit(
+                    RECIPE_JOB,
+                    {"dish_name": dish_name, "cuisine_type": self.cuisine_type, "servings": servings},
+                    priority,
+                    recipe_job_key(dish_name, self.cuisine_type, servings),
+                    on_result=lambda recipe_data, dish_name=dish_name: self._on_recipe_prefetched(dish_name),
+                    on_error=lambda error, dish_name=dish_name: logger.warning(
+                        f"Could not prefetch the recipe of {dish_name}: {error}"
+                    )
+                )
+        if submitted:
+            logger.info(f"Prefetching {len(submitted)} recipes")
+    
+    def _on_recipe_prefetched(self, dish_name):
+        """Use a prefetched recipe's quantities in the shopping list and the costs."""
+        for day, day_meals in self.current_menu.items():
+            for meal_time, meal_info in day_meals.items():
+                if isinstance(meal_info, dict) and meal_info.get("name") == dish_name:
+                    self._update_shopping_list(day, meal_time, meal_info)
+    
+    def refresh_prices(self):
+        """Reload the ingredient price table and price the current menu."""
+        if not self.current_menu:
+            return
+        self.db_executor.submit(
+            'prices', CostEngine.from_database, self.db_manager,
+            on_result=self._on_cost_engine_loaded,
+            on_error=self._on_database_error
+        )
+    
+    def _on_cost_engine_loaded(self, engine):
+        """Keep the loaded price table and price the current menu with it."""
+        self.cost_engine = engine
+        if self.analysis is not None:
+            self.analysis.set_price_meal(self._price_function())
+            self._show_optimization_notes()
+    
+    def _price_function(self):
+        """Get the function pricing one meal from the price table, None without prices."""
+        engine = self.cost_engine
+        if engine is None or not len(engine):
+            return None
+        return lambda meal_info: engine.price_meal(
+            meal_info, self.menu_recipes.get(meal_info.get("name")), self._servings()
+        )
+    
+    def _reset_analysis(self):
+        """Analyze a newly generated or loaded menu."""
+        budget = self.budget_settings["budget_per_meal"] if self.budget_settings else None
+        self.analysis = MenuAnalysis(
+            self.current_menu, budget, self._price_function(), DislikeMatcher.for_user(self.user)
+        )
+    
+    def _show_optimization_notes(self):
+        """Show the optimization notes followed by the live analysis of the menu."""
+        self.optimization_notes_text.clear()
+        analysis_notes = self.analysis.notes() if self.analysis is not None else []
+        for note in self.optimization_notes + analysis_notes:
+            self.optimization_notes_text.append(f"• {note}")
+    
+    def _update_shopping_list(self, day, meal_time, meal_info):
+        """Replace one meal in the shopping list after it was edited."""
+        if self.shopping_list is None:
+            return
+        self.db_executor.submit(
+            'recipes', self.db_manager.get_recipe_by_name, meal_info.get("name"),
+            on_result=lambda recipe: self._on_meal_recipe_loaded(day, meal_time, meal_info, recipe),
+            on_error=self._on_database_error
+        )
+    
+    def _on_meal_recipe_loaded(self, day, meal_time, meal_info, recipe):
+        """Apply an edited meal to the shopping list once its recipe is loaded."""
+        # The menu may have been cleared or edited again in the meantime
+        if self.shopping_list is None or self.current_menu.get(day, {}).get(meal_time) is not meal_info:
+            return
+        self.shopping_list.set_meal(day, meal_time, meal_info, recipe)
+        if recipe is not None:
+            # Price the meal again from the recipe's quantities
+            self.menu_recipes[meal_info.get("name")] = recipe
+            if self.analysis is not None:
+                self.analysis.set_meal(day, meal_time, meal_info)
+                self._show_optimization_notes()
+    
+    def _show_shopping_list(self):
+        """Show the aggregated shopping list of the menu."""
+        if self.shopping_list is None:
+            return
+        
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Danh sách đi chợ")
+        dialog.resize(500, 600)
+        layout = QVBoxLayout(dialog)
+        
+        layout.addWidget(QLabel(f"Nguyên liệu cho cả tuần ({self.shopping_list.servings} người ăn):"))
+        
+        text = QTextEdit()
+        text.setReadOnly(True)
+        text.setPlainText(self.shopping_list.to_text() or "Chưa có nguyên liệu nào.")
+        layout.addWidget(text)
+        
+        close_button = QPushButton("Đóng")
+        close_button.clicked.connect(dialog.accept)
+        layout.addWidget(close_button)
+        
+        dialog.exec()
+    
     def view_saved_recipes(self):
         """Open dialog to view saved recipes."""
-        dialog = SavedRecipesDialog(self, self.db_manager)
+        dialog = SavedRecipesDialog(self, self.db_manager, self.db_executor)
         dialog.exec()
 
     def _save_current_menu(self):
@@ -866,13 +1251,12 @@ class MenuPanel(QWidget):
                     meals=json.dumps(self.current_menu)
                 )
                 
-                # Save to database
-                saved_menu = self.db_manager.save_menu(menu)
-                
-                QMessageBox.information(
-                    self,
-                    "Lưu thành công",
-                    f"Thực đơn '{menu_name}' đã được lưu thành công!"
+                # Save to database in the background
+                self.save_menu_button.setEnabled(False)
+                self.db_executor.submit(
+                    'menus', self.db_manager.save_menu, menu,
+                    on_result=self._on_menu_saved,
+                    on_error=self._on_menu_save_error
                 )
             except Exception as e:
                 QMessageBox.critical(
@@ -881,14 +1265,60 @@ class MenuPanel(QWidget):
                     f"Không thể lưu thực đơn: {str(e)}"
                 )
     
+    def _on_menu_saved(self, menu):
+        """Confirm that the menu was saved."""
+        self.save_menu_button.setEnabled(bool(self.current_menu))
+        # Saving added the menu's dishes to the catalog
+        self._load_substitution_index()
+        QMessageBox.information(
+            self,
+            "Lưu thành công",
+            f"Thực đơn '{menu.name}' đã được lưu thành công!"
+        )
+    
+    def _on_menu_save_error(self, error):
+        """Report a failed menu save."""
+        self.save_menu_button.setEnabled(bool(self.current_menu))
+        QMessageBox.critical(
+            self,
+            "Lỗi",
+            f"Không thể lưu thực đơn: {str(error)}"
+        )
+    
+    def _on_database_error(self, error):
+        """Show a database error."""
+        QMessageBox.critical(
+            self,
+            "Lỗi",
+            f"Lỗi cơ sở dữ liệu: {str(error)}"
+        )
+    
     def _view_saved_menus(self):
         """View saved menus."""
+        # Add debug info
+        print("Opening saved menus dialog")
+        
+        # Check if the database has any menus before creating the dialog
+        self.saved_menus_button.setEnabled(False)
+        self.db_executor.submit(
+            'menus', self.db_manager.get_all_menus,
+            on_result=self._show_saved_menus,
+            on_error=self._on_saved_menus_error
+        )
+    
+    def _on_saved_menus_error(self, error):
+        """Report that the saved menus could not be loaded."""
+        self.saved_menus_button.setEnabled(True)
+        QMessageBox.critical(
+            self,
+            "Lỗi",
+            f"Đã xảy ra lỗi khi mở thực đơn đã lưu: {str(error)}"
+        )
+    
+    def _show_saved_menus(self, menus):
+        """Open the saved menus dialog with the loaded menus."""
+        self.saved_menus_button.setEnabled(True)
         try:
-            # Add debug info
-            print("Opening saved menus dialog")
-            
-            # Check if the database has any menus before creating the dialog
-            menus = self.db_manager.get_all_menus()
             if not menus:
                 QMessageBox.information(
                     self,
@@ -897,41 +1327,42 @@ class MenuPanel(QWidget):
                 )
                 return
                 
-            dialog = SavedMenusDialog(self, self.db_manager)
+            # Hand the list over so the dialog does not query it again
+            dialog = SavedMenusDialog(self, self.db_manager, self.db_executor, menus)
             result = dialog.exec()
             
             if result == QDialog.DialogCode.Accepted and dialog.selected_menu:
                 # Load the selected menu
                 try:
-                    # Parse the meals JSON string
-                    meals_json = dialog.selected_menu.meals
+                    # Decode the meals once; copy them since edits must not
+                    # leak into the cached menu
+                    loaded_menu = copy.deepcopy(dialog.selected_menu.get_meals_dict())
                     # Add Debug info
                     print(f"Loading menu: {dialog.selected_menu.name}")
-                    print(f"Meals JSON: {meals_json}")
                     
-                    # Make sure meals is a valid JSON string
-                    if not meals_json or not isinstance(meals_json, str):
-                        raise ValueError(f"Invalid meals data: {meals_json}")
+                    # Make sure meals decoded into a non-empty menu
+                    if not loaded_menu:
+                        raise ValueError(f"Invalid meals data: {dialog.selected_menu.meals}")
                     
                     menu_data = {
-                        "menu": json.loads(meals_json),
+                        "menu": loaded_menu,
                         "optimization_notes": []
                     }
                     self.load_menu(menu_data)
                     
                     # Update status labels
                     if dialog.selected_menu.user_id:
-                        user = self.db_manager.get_user(dialog.selected_menu.user_id)
-                        if user:
-                            self.user = user
-                            self.user_status_label.setText(f"Người dùng: {user.name}")
+                        self.db_executor.submit(
+                            'users', self.db_manager.get_user, dialog.selected_menu.user_id,
+                            on_result=self._apply_loaded_menu_user,
+                            on_error=self._on_database_error
+                        )
                     
                     self.cuisine_type = dialog.selected_menu.cuisine_type
                     self.cuisine_status_label.setText(f"Phong cách ẩm thực: {self.cuisine_type}")
                     
                     if dialog.selected_menu.budget_per_meal and dialog.selected_menu.max_prep_time:
                         # Get the days and meals from the loaded menu
-                        loaded_menu = json.loads(meals_json)
                         days = list(loaded_menu.keys())
                         
                         # Extract meal times from the first day if available
@@ -978,12 +1409,20 @@ class MenuPanel(QWidget):
 class MealEditDialog(QDialog):
     """Dialog for editing a meal."""
     
-    def __init__(self, parent, meal_info, cuisine_type):
-        """Initialize the dialog."""
+    def __init__(self, parent, meal_info, cuisine_type, substitutes=None):
+        """Initialize the dialog.
+        
+        substitutes are (meal_info, similarity, shared ingredient keys)
+        tuples from SubstitutionIndex.similar. The alternatives generated
+        with the menu are offered too and swap the whole meal at once.
+        """
         super().__init__(parent)
         
         self.meal_info = meal_info.copy()
         self.cuisine_type = cuisine_type
+        self.substitutes = substitutes or []
+        self.alternatives = meal_info.get(ALTERNATIVES_KEY) or []
+        self.swapped = None  # Alternative chosen instead of the edited meal
         
         self.setWindowTitle("Chỉnh sửa món ăn")
         self.setMinimumSize(QSize(600, 500))
@@ -1004,6 +1443,44 @@ class MealEditDialog(QDialog):
         
         layout.addLayout(name_layout)
         
+        # Known dishes sharing ingredients with this meal and the rest of the week
+        if self.substitutes:
+            substitute_layout = QHBoxLayout()
+            substitute_label = QLabel("Món thay thế:")
+            self.substitute_combo = QComboBox()
+            for dish, similarity, shared in self.substitutes:
+                text = f"{dish['name']} (giống {similarity:.0%})"
+                if shared:
+                    text += f" - dùng chung {len(shared)} nguyên liệu trong tuần"
+                self.substitute_combo.addItem(text)
+            substitute_button = QPushButton("Thay bằng món này")
+            substitute_button.clicked.connect(self._apply_substitute)
+            
+            substitute_layout.addWidget(substitute_label)
+            substitute_layout.addWidget(self.substitute_combo, 1)
+            substitute_layout.addWidget(substitute_button)
+            
+            layout.addLayout(substitute_layout)
+        
+        # Alternatives generated with the menu, already checked against the constraints
+        if self.alternatives:
+            alternative_layout = QHBoxLayout()
+            alternative_label = QLabel("Gợi ý khác (AI):")
+            self.alternative_combo = QComboBox()
+            for alternative in self.alternatives:
+                self.alternative_combo.addItem(
+                    f"{alternative['name']} - {format_currency(alternative.get('estimated_cost', 0))}, "
+                    f"{format_time(alternative.get('preparation_time', 0))}"
+                )
+            alternative_button = QPushButton("Đổi sang món này")
+            alternative_button.clicked.connect(self._swap_alternative)
+            
+            alternative_layout.addWidget(alternative_label)
+            alternative_layout.addWidget(self.alternative_combo, 1)
+            alternative_layout.addWidget(alternative_button)
+            
+            layout.addLayout(alternative_layout)
+        
         # Create tab widget for different sections
         tab_widget = QTabWidget()
         
@@ -1153,8 +1630,37 @@ class MealEditDialog(QDialog):
         
         layout.addLayout(buttons_layout)
     
+    def _apply_substitute(self):
+        """Fill the form with the selected substitute dish."""
+        dish, _, shared = self.substitutes[self.substitute_combo.currentIndex()]
+        
+        self.name_edit.setText(dish["name"])
+        self.ingredients_edit.setPlainText("\n".join(dish["ingredients"]))
+        if dish.get("preparation_time"):
+            self.time_spin.setValue(int(dish["preparation_time"]))
+        if dish.get("estimated_cost"):
+            self.cost_spin.setValue(int(dish["estimated_cost"]))
+        
+        shared = set(shared)
+        self.reused_edit.setPlainText("\n".join(
+            ingredient for ingredient in dish["ingredients"] if canonical_key(ingredient) in shared
+        ))
+        
+        # The old dish's details do not apply to the new one
+        for edit in (self.protein_edit, self.carbs_edit, self.fat_edit, self.calories_edit, self.cooking_edit):
+            edit.clear()
+        self.groups_edit.clear()
+    
+    def _swap_alternative(self):
+        """Replace the meal with the selected alternative and close the dialog."""
+        self.swapped = swap_alternative(self.meal_info, self.alternative_combo.currentIndex())
+        self.accept()
+    
     def get_meal_info(self):
         """Get the updated meal info."""
+        if self.swapped is not None:
+            return self.swapped
+        
         # Update meal info
         self.meal_info["name"] = self.name_edit.text()
         self.meal_info["ingredients"] = [
@@ -1469,12 +1975,18 @@ class RecipeDialog(QDialog):
 class SavedRecipesDialog(QDialog):
     """Dialog for viewing saved recipes."""
     
-    def __init__(self, parent, db_manager):
+    def __init__(self, parent, db_manager, db_executor):
         """Initialize the dialog."""
         super().__init__(parent)
         
         self.parent = parent
         self.db_manager = db_manager
+        self.db_executor = db_executor
+        
+        self.recipes = []
+        self._search_sequence = 0  # Only the results of the latest filter are shown
+        # Recipes with something the current user does not eat are marked
+        self.matcher = DislikeMatcher.for_user(getattr(parent, 'user', None))
         
         self.setWindowTitle("Công thức đã lưu")
         self.setMinimumSize(QSize(500, 400))
@@ -1496,7 +2008,7 @@ class SavedRecipesDialog(QDialog):
         
         filter_label = QLabel("Tìm kiếm:")
         self.filter_edit = QLineEdit()
-        self.filter_edit.setPlaceholderText("Nhập tên món ăn...")
+        self.filter_edit.setPlaceholderText("Nhập tên món, nguyên liệu hoặc cách làm...")
         self.filter_edit.textChanged.connect(self._filter_recipes)
         
         cuisine_label = QLabel("Phong cách:")
@@ -1581,23 +2093,37 @@ class SavedRecipesDialog(QDialog):
     
     def _load_recipes(self):
         """Load recipes from database."""
-        recipes = self.db_manager.get_all_recipes()
-        
-        # Clear current list
+        self._show_loading_placeholder()
+        self.db_executor.submit(
+            'recipes', self.db_manager.get_all_recipes,
+            on_result=self._on_recipes_loaded,
+            on_error=self._on_database_error
+        )
+    
+    def _show_loading_placeholder(self):
+        """Show a placeholder item while recipes load."""
         self.recipes_list.clear()
+        placeholder = QListWidgetItem("Đang tải công thức...")
+        placeholder.setFlags(Qt.ItemFlag.NoItemFlags)
+        placeholder.setForeground(QColor("gray"))
+        self.recipes_list.addItem(placeholder)
+    
+    def _on_database_error(self, error):
+        """Show a database error."""
+        QMessageBox.critical(
+            self,
+            "Lỗi",
+            f"Lỗi cơ sở dữ liệu: {str(error)}"
+        )
+    
+    def _on_recipes_loaded(self, recipes):
+        """Show the recipes loaded from the database."""
+        self.recipes = recipes
         
-        # Collect unique cuisines
-        cuisines = set()
+        self._populate_recipes_list(self.recipes)
         
-        for recipe in recipes:
-            # Add recipe to list
-            item = QListWidgetItem(f"{recipe.name} ({recipe.cuisine_type})")
-            item.setData(Qt.ItemDataRole.UserRole, recipe)
-            self.recipes_list.addItem(item)
-            
-            # Add cuisine type to set
-            if recipe.cuisine_type:
-                cuisines.add(recipe.cuisine_type)
+        # Collect unique cuisines
+        cuisines = {recipe.cuisine_type for recipe in self.recipes if recipe.cuisine_type}
         
         # Populate cuisine filter
         current_text = self.cuisine_combo.currentText()
@@ -1612,21 +2138,47 @@ class SavedRecipesDialog(QDialog):
         if index >= 0:
             self.cuisine_combo.setCurrentIndex(index)
     
-    def _filter_recipes(self):
-        """Filter recipes by name and cuisine."""
-        filter_text = self.filter_edit.text().lower()
+    def _populate_recipes_list(self, recipes):
+        """Show the given recipes, keeping only the selected cuisine."""
         cuisine = self.cuisine_combo.currentData()
         
-        for i in range(self.recipes_list.count()):
-            item = self.recipes_list.item(i)
-            recipe = item.data(Qt.ItemDataRole.UserRole)
-            
-            # Check if matches filter
-            name_match = filter_text in recipe.name.lower()
-            cuisine_match = not cuisine or recipe.cuisine_type == cuisine
+        # Clear current list
+        self.recipes_list.clear()
+        
+        for recipe in recipes:
+            if cuisine and recipe.cuisine_type != cuisine:
+                continue
             
-            # Show/hide item
-            item.setHidden(not (name_match and cuisine_match))
+            # Add recipe to list
+            text = f"{recipe.name} ({recipe.cuisine_type})"
+            disliked = self.matcher.meal_violations(recipe_meal_info(recipe)) if len(self.matcher) else []
+            if disliked:
+                text += f" ⚠ có {', '.join(disliked)}"
+            item = QListWidgetItem(text)
+            item.setData(Qt.ItemDataRole.UserRole, recipe)
+            self.recipes_list.addItem(item)
+    
+    def _filter_recipes(self):
+        """Filter recipes by name, ingredients, steps and cuisine."""
+        filter_text = self.filter_edit.text().strip()
+        
+        # Ranked full-text search replaces scanning every list item. A search
+        # still running when the filter changes again (or is cleared, which
+        # needs no search) is stale, so its results are dropped.
+        self._search_sequence += 1
+        if filter_text:
+            self.db_executor.submit(
+                'recipes', self.db_manager.search_recipes, filter_text,
+                on_result=lambda recipes, sequence=self._search_sequence: self._on_search_results(sequence, recipes),
+                on_error=self._on_database_error
+            )
+        else:
+            self._populate_recipes_list(self.recipes)
+    
+    def _on_search_results(self, sequence, recipes):
+        """Show the recipes found by a search, unless a newer filter was set."""
+        if sequence == self._search_sequence:
+            self._populate_recipes_list(recipes)
     
     def _view_selected_recipe(self):
         """View the selected recipe."""
@@ -1650,7 +2202,7 @@ class SavedRecipesDialog(QDialog):
         recipe = selected_items[0].data(Qt.ItemDataRole.UserRole)
         
         try:
-            recipe_data = json.loads(recipe.content)
+            recipe_data = recipe.get_data()
             dialog = RecipeDialog(self, recipe_data, recipe.name)
             dialog.exec()
         except Exception as e:
@@ -1682,27 +2234,38 @@ class SavedRecipesDialog(QDialog):
         )
         
         if confirmation == QMessageBox.StandardButton.Yes:
-            try:
-                self.db_manager.delete_recipe(recipe.id)
-                self._load_recipes()
-            except Exception as e:
-                QMessageBox.critical(
+            self.db_executor.submit(
+                'recipes', self.db_manager.delete_recipe, recipe.id,
+                on_result=lambda deleted: self._load_recipes(),
+                on_error=lambda error: QMessageBox.critical(
                     self,
                     "Lỗi",
-                    f"Không thể xóa công thức: {str(e)}"
+                    f"Không thể xóa công thức: {str(error)}"
                 )
+            )
 
 
 class SavedMenusDialog(QDialog):
     """Dialog for viewing saved menus."""
     
-    def __init__(self, parent, db_manager):
-        """Initialize the dialog."""
+    def __init__(self, parent, db_manager, db_executor, menus=None):
+        """Initialize the dialog.
+        
+        Args:
+            parent: Parent widget
+            db_manager: Database manager
+            db_executor: Executor running database calls off the GUI thread
+            menus: Menus already loaded by the caller, to avoid querying them again
+        """
         super().__init__(parent)
         
         self.parent = parent
         self.db_manager = db_manager
+        self.db_executor = db_executor
         self.selected_menu = None
+        self.menus = []
+        self._preloaded_menus = menus
+        self._search_sequence = 0  # Only the results of the latest filter are shown
         
         self.setWindowTitle("Thực đơn đã lưu")
         self.setMinimumSize(QSize(600, 400))
@@ -1724,7 +2287,7 @@ class SavedMenusDialog(QDialog):
         
         filter_label = QLabel("Tìm kiếm:")
         self.filter_edit = QLineEdit()
-        self.filter_edit.setPlaceholderText("Nhập tên thực đơn...")
+        self.filter_edit.setPlaceholderText("Nhập tên thực đơn, món ăn hoặc nguyên liệu...")
         self.filter_edit.textChanged.connect(self._filter_menus)
         
         cuisine_label = QLabel("Phong cách:")
@@ -1809,32 +2372,43 @@ class SavedMenusDialog(QDialog):
     
     def _load_menus(self):
         """Load menus from database."""
+        if self._preloaded_menus is not None:
+            menus, self._preloaded_menus = self._preloaded_menus, None
+            self._on_menus_loaded(menus)
+            return
+        
+        # Show a placeholder while the menus load in the background
+        self.menus_list.clear()
+        placeholder = QListWidgetItem("Đang tải thực đơn...")
+        placeholder.setFlags(Qt.ItemFlag.NoItemFlags)
+        placeholder.setForeground(QColor("gray"))
+        self.menus_list.addItem(placeholder)
+        
+        self.db_executor.submit(
+            'menus', self.db_manager.get_all_menus,
+            on_result=self._on_menus_loaded,
+            on_error=self._on_menus_load_error
+        )
+    
+    def _on_menus_load_error(self, error):
+        """Report that the menus could not be loaded."""
+        print(f"Error loading menus: {str(error)}")
+        QMessageBox.critical(
+            self,
+            "Lỗi",
+            f"Không thể tải danh sách thực đơn: {str(error)}"
+        )
+    
+    def _on_menus_loaded(self, menus):
+        """Show the menus loaded from the database."""
         try:
-            menus = self.db_manager.get_all_menus()
-            print(f"Loaded {len(menus)} menus from database")
+            self.menus = menus
+            print(f"Loaded {len(self.menus)} menus from database")
             
-            # Clear current list
-            self.menus_list.clear()
+            self._populate_menus_list(self.menus)
             
             # Collect unique cuisines
-            cuisines = set()
-            
-            for menu in menus:
-                try:
-                    # Debug info
-                    print(f"Processing menu: id={menu.id}, name={menu.name}, meals type={type(menu.meals)}")
-                    
-                    # Add menu to list
-                    creation_date = datetime.strptime(menu.creation_date, "%Y-%m-%d %H:%M:%S").strftime("%d/%m/%Y %H:%M")
-                    item = QListWidgetItem(f"{menu.name} - {creation_date}")
-                    item.setData(Qt.ItemDataRole.UserRole, menu)
-                    self.menus_list.addItem(item)
-                    
-                    # Add cuisine type to set
-                    if menu.cuisine_type:
-                        cuisines.add(menu.cuisine_type)
-                except Exception as e:
-                    print(f"Error processing menu {menu.id}: {str(e)}")
+            cuisines = {menu.cuisine_type for menu in self.menus if menu.cuisine_type}
             
             # Populate cuisine filter
             current_text = self.cuisine_combo.currentText()
@@ -1849,13 +2423,6 @@ class SavedMenusDialog(QDialog):
             if index >= 0:
                 self.cuisine_combo.setCurrentIndex(index)
                 
-            # Add information message if no menus found
-            if self.menus_list.count() == 0:
-                no_items = QListWidgetItem("Không có thực đơn nào được lưu")
-                no_items.setFlags(Qt.ItemFlag.NoItemFlags)  # Make it non-selectable
-                no_items.setForeground(QColor("gray"))
-                self.menus_list.addItem(no_items)
-                
         except Exception as e:
             print(f"Error loading menus: {str(e)}")
             QMessageBox.critical(
@@ -1864,39 +2431,59 @@ class SavedMenusDialog(QDialog):
                 f"Không thể tải danh sách thực đơn: {str(e)}"
             )
     
+    def _populate_menus_list(self, menus):
+        """Show the given menus, keeping only the selected cuisine."""
+        cuisine = self.cuisine_combo.currentData()
+        
+        # Clear current list
+        self.menus_list.clear()
+        
+        for menu in menus:
+            if cuisine and menu.cuisine_type != cuisine:
+                continue
+            
+            try:
+                # Add menu to list
+                creation_date = datetime.strptime(menu.creation_date, "%Y-%m-%d %H:%M:%S").strftime("%d/%m/%Y %H:%M")
+                item = QListWidgetItem(f"{menu.name} - {creation_date}")
+                item.setData(Qt.ItemDataRole.UserRole, menu)
+                self.menus_list.addItem(item)
+            except Exception as e:
+                print(f"Error processing menu {menu.id}: {str(e)}")
+        
+        # Add information message if no menus found
+        if self.menus_list.count() == 0:
+            message = "Không có thực đơn nào được lưu" if not self.menus else "Không tìm thấy thực đơn phù hợp"
+            no_items = QListWidgetItem(message)
+            no_items.setFlags(Qt.ItemFlag.NoItemFlags)  # Make it non-selectable
+            no_items.setForeground(QColor("gray"))
+            self.menus_list.addItem(no_items)
+    
     def _filter_menus(self):
-        """Filter menus by name and cuisine."""
+        """Filter menus by name, dishes, ingredients and cuisine."""
         try:
-            filter_text = self.filter_edit.text().lower()
-            cuisine = self.cuisine_combo.currentData()
-            
-            # Check if we have a valid list first
-            if self.menus_list.count() == 0:
-                return
-                
-            # Check if it's just our "no items" message
-            if self.menus_list.count() == 1:
-                item = self.menus_list.item(0)
-                if item.text() == "Không có thực đơn nào được lưu":
-                    return
-            
-            for i in range(self.menus_list.count()):
-                item = self.menus_list.item(i)
-                menu = item.data(Qt.ItemDataRole.UserRole)
-                
-                # Skip items without data (like the "no items" message)
-                if not menu:
-                    continue
-                
-                # Check if matches filter
-                name_match = filter_text in menu.name.lower()
-                cuisine_match = not cuisine or menu.cuisine_type == cuisine
-                
-                # Show/hide item
-                item.setHidden(not (name_match and cuisine_match))
+            filter_text = self.filter_edit.text().strip()
+            
+            # Ranked full-text search replaces scanning every list item. A search
+            # still running when the filter changes again (or is cleared, which
+            # needs no search) is stale, so its results are dropped.
+            self._search_sequence += 1
+            if filter_text:
+                self.db_executor.submit(
+                    'menus', self.db_manager.search_menus, filter_text,
+                    on_result=lambda menus, sequence=self._search_sequence: self._on_search_results(sequence, menus),
+                    on_error=lambda error: print(f"Error filtering menus: {str(error)}")
+                )
+            else:
+                self._populate_menus_list(self.menus)
         except Exception as e:
             print(f"Error filtering menus: {str(e)}")
     
+    def _on_search_results(self, sequence, menus):
+        """Show the menus found by a search, unless a newer filter was set."""
+        if sequence == self._search_sequence:
+            self._populate_menus_list(menus)
+    
     def _load_selected_menu(self):
         """Load the selected menu."""
         try:
@@ -1933,14 +2520,12 @@ class SavedMenusDialog(QDialog):
                 )
                 return
                 
-            # Try to parse the meals JSON to make sure it's valid
-            try:
-                json.loads(menu.meals)
-            except json.JSONDecodeError as e:
+            # Make sure the meals JSON decodes into a menu
+            if not menu.get_meals_dict():
                 QMessageBox.critical(
                     self, 
                     "Lỗi", 
-                    f"Dữ liệu thực đơn không hợp lệ: {str(e)}"
+                    "Dữ liệu thực đơn không hợp lệ."
                 )
                 return
             
@@ -1988,21 +2573,29 @@ class SavedMenusDialog(QDialog):
             )
             
             if confirmation == QMessageBox.StandardButton.Yes:
-                try:
-                    self.db_manager.delete_menu(menu.id)
-                    print(f"Deleted menu: id={menu.id}, name={menu.name}")
-                    self._load_menus()
-                except Exception as e:
-                    print(f"Error deleting menu {menu.id}: {str(e)}")
-                    QMessageBox.critical(
-                        self,
-                        "Lỗi",
-                        f"Không thể xóa thực đơn: {str(e)}"
-                    )
+                self.db_executor.submit(
+                    'menus', self.db_manager.delete_menu, menu.id,
+                    on_result=lambda deleted: self._on_menu_deleted(menu),
+                    on_error=lambda error: self._on_menu_delete_error(menu, error)
+                )
         except Exception as e:
             print(f"Error in delete menu: {str(e)}")
             QMessageBox.critical(
                 self,
                 "Lỗi",
                 f"Không thể xóa thực đơn: {str(e)}"
-            ) 
\ No newline at end of file
+            ) 
+    
+    def _on_menu_deleted(self, menu):
+        """Reload the list after a menu was deleted."""
+        print(f"Deleted menu: id={menu.id}, name={menu.name}")
+        self._load_menus()
+    
+    def _on_menu_delete_error(self, menu, error):
+        """Report a failed menu deletion."""
+        print(f"Error deleting menu {menu.id}: {str(error)}")
+        QMessageBox.critical(
+            self,
+            "Lỗi",
+            f"Không thể xóa thực đơn: {str(error)}"
+        )
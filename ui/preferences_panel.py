@@ -19,11 +19,12 @@ class PreferencesPanel(QWidget):
     # Signal emitted when a user is selected
     user_selected = pyqtSignal(User)
     
-    def __init__(self, db_manager):
+    def __init__(self, db_manager, db_executor):
         """Initialize the panel."""
         super().__init__()
         
         self.db_manager = db_manager
+        self.db_executor = db_executor
         self.current_user = None
         
         self._create_ui()
@@ -509,8 +510,21 @@ class PreferencesPanel(QWidget):
     
     def _load_users(self):
         """Load users from database."""
-        users = self.db_manager.get_all_users()
-        
+        # Show a placeholder while the users load in the background
+        self.user_list.clear()
+        placeholder = QListWidgetItem("Đang tải...")
+        placeholder.setFlags(Qt.ItemFlag.NoItemFlags)
+        placeholder.setForeground(QColor("gray"))
+        self.user_list.addItem(placeholder)
+        
+        self.db_executor.submit(
+            'users', self.db_manager.get_all_users,
+            on_result=self._on_users_loaded,
+            on_error=self._on_database_error
+        )
+    
+    def _on_users_loaded(self, users):
+        """Show the users loaded from the database."""
         # Clear current list
         self.user_list.clear()
         
@@ -520,6 +534,14 @@ class PreferencesPanel(QWidget):
             item.setData(Qt.ItemDataRole.UserRole, user)
             self.user_list.addItem(item)
     
+    def _on_database_error(self, error):
+        """Show a database error."""
+        QMessageBox.critical(
+            self,
+            "Lỗi",
+            f"Lỗi cơ sở dữ liệu: {str(error)}"
+        )
+    
     def _on_user_selected(self, current, previous):
         """Handle user selection."""
         if current:
@@ -621,7 +643,10 @@ class PreferencesPanel(QWidget):
         if result == QMessageBox.StandardButton.Yes:
             # Remove from database
             if self.current_user.id:
-                self.db_manager.delete_user(self.current_user.id)
+                self.db_executor.submit(
+                    'users', self.db_manager.delete_user, self.current_user.id,
+                    on_error=self._on_database_error
+                )
             
             # Remove from list
             row = self.user_list.currentRow()
@@ -694,17 +719,28 @@ class PreferencesPanel(QWidget):
             for i in range(self.disliked_dishes_list.count())
         ]
         
-        # Save to database
-        self.current_user = self.db_manager.save_user(self.current_user)
+        # Disable save button while saving
+        self.save_button.setEnabled(False)
         
-        # Update list item
+        # Save to database, updating the item that was selected when saving started
         item = self.user_list.currentItem()
+        self.db_executor.submit(
+            'users', self.db_manager.save_user, self.current_user,
+            on_result=lambda user: self._on_user_saved(item, user),
+            on_error=self._on_user_save_error
+        )
+    
+    def _on_user_saved(self, item, user):
+        """Update the list after a user was saved."""
         if item:
-            item.setText(self.current_user.name)
-            item.setData(Qt.ItemDataRole.UserRole, self.current_user)
-        
-        # Disable save button
-        self.save_button.setEnabled(False)
+            item.setText(user.name)
+            item.setData(Qt.ItemDataRole.UserRole, user)
+    
+    def _on_user_save_error(self, error):
+        """Report a failed save and let the user save again."""
+        # The edits are already in current_user, so _has_changes() no longer sees them
+        self.save_button.setEnabled(True)
+        self._on_database_error(error)
     
     def _select_user(self):
         """Select user and emit signal."""
@@ -0,0 +1,275 @@
+"""
+Local cost estimation from an ingredient price table.
+
+Meal costs from the API are guesses; this module prices every meal from
+its ingredient quantities instead, so budgets can be checked without
+asking the API again.
+"""
+import json
+import logging
+
+import pandas as pd
+
+from utils.ingredient_canonicalizer import canonical, canonical_key
+from utils.shopping_list import DEFAULT_SERVINGS, meal_items, normalize_unit
+
+logger = logging.getLogger(__name__)
+
+# Accepted CSV headers for each column of the price table
+CSV_HEADERS = {
+    "ingredient": ["ingredient", "nguyên liệu", "nguyen lieu", "tên", "ten", "name"],
+    "price": ["price", "giá", "gia", "đơn giá", "don gia"],
+    "unit": ["unit", "đơn vị", "don vi"],
+}
+
+# Unit assumed for prices imported without one
+DEFAULT_PRICE_UNIT = "kg"
+
+# Columns of a normalized price table (price is per base unit, e.g. per g)
+PRICE_COLUMNS = ["ingredient", "unit", "name", "price"]
+
+# Columns of the per-meal cost table
+MEAL_COLUMNS = ["menu", "day", "meal_time", "name", "cost", "items", "priced_items", "estimated_cost"]
+
+
+def load_price_csv(path):
+    """
+    Read an ingredient price table from a CSV file.
+    
+    The file needs an ingredient and a price column ("nguyên liệu", "giá")
+    and may have a unit column ("đơn vị", default kg): "Thịt heo,120000,kg".
+    
+    Args:
+        path: CSV file path
+    
+    Returns:
+        Normalized price table (see normalize_prices)
+    
+    Raises:
+        ValueError: If a required column is missing
+    """
+    frame = pd.read_csv(path, dtype=str, encoding="utf-8-sig", skipinitialspace=True)
+    
+    headers = {str(column).strip().lower(): column for column in frame.columns}
+    columns = {}
+    for target, aliases in CSV_HEADERS.items():
+        for alias in aliases:
+            if alias in headers:
+                columns[headers[alias]] = target
+                break
+    
+    missing = {"ingredient", "price"} - set(columns.values())
+    if missing:
+        raise ValueError(f"Bảng giá thiếu cột: {', '.join(sorted(missing))}")
+    
+    frame = frame.rename(columns=columns)
+    if "unit" not in frame:
+        frame["unit"] = DEFAULT_PRICE_UNIT
+    return normalize_prices(frame[["ingredient", "price", "unit"]])
+
+
+def normalize_prices(frame):
+    """
+    Convert prices per unit as written into prices per base unit.
+    
+    Args:
+        frame: DataFrame with ingredient, price and unit columns, e.g.
+            ("Thịt lợn", "120.000", "kg")
+    
+    Returns:
+        DataFrame with PRICE_COLUMNS, e.g. ("thịt heo", "g", "thịt heo", 120.0)
+    """
+    frame = frame.dropna(subset=["ingredient", "price"]).copy()
+    # "120.000 VND", "120,000đ": VND prices have no decimals, so keep the digits only
+    prices = pd.to_numeric(
+        frame["price"].astype(str).str.replace(r"[^\d]", "", regex=True), errors="coerce"
+    )
+    units = frame["unit"].fillna(DEFAULT_PRICE_UNIT).astype(str).str.strip()
+    units = units.where(units != "", DEFAULT_PRICE_UNIT)
+    
+    # One conversion per distinct unit rather than one per row
+    conversions = {unit: normalize_unit(unit, 1.0) for unit in units.unique()}
+    
+    result = pd.DataFrame({
+        "ingredient": frame["ingredient"].map(canonical_key),
+        "unit": units.map(lambda unit: conversions[unit][0]),
+        "name": frame["ingredient"].map(canonical),
+        "price": prices / units.map(lambda unit: conversions[unit][1])
+    })
+    result = result[(result["ingredient"] != "") & (result["price"] > 0)]
+    return result.drop_duplicates(subset=["ingredient", "unit"], keep="last").reset_index(drop=True)
+
+
+class CostEngine:
+    """Prices meals and menus from an ingredient price table.
+    
+    Ingredient quantities of all meals are collected into one line-item
+    table, joined once with the price table and summed per meal, so a
+    whole week (or every saved menu) is priced in a few vectorized steps.
+    """
+    
+    def __init__(self, prices=None):
+        """
+        Initialize the engine.
+        
+        Args:
+            prices: Normalized price table (PRICE_COLUMNS), or None for an empty one
+        """
+        if prices is None:
+            prices = pd.DataFrame(columns=PRICE_COLUMNS)
+        self.prices = (
+            prices.drop_duplicates(subset=["ingredient", "unit"], keep="last")
+            .set_index(["ingredient", "unit"])["price"].astype(float)
+        )
+    
+    @classmethod
+    def from_database(cls, db_manager):
+        """
+        Create an engine from the stored price table.
+        
+        Args:
+            db_manager: DatabaseManager
+        
+        Returns:
+            CostEngine
+        """
+        return cls(pd.DataFrame(db_manager.get_ingredient_prices(), columns=PRICE_COLUMNS))
+    
+    def __len__(self):
+        return len(self.prices)
+    
+    def price_menus(self, menus, servings=DEFAULT_SERVINGS):
+        """
+        Price the meals of several menus in one pass.
+        
+        Args:
+            menus: (menu key, menu dictionary, recipes by dish name) tuples
+            servings: Number of people every meal is cooked for
+        
+        Returns:
+            DataFrame with one row per meal (MEAL_COLUMNS); cost is NaN when
+            none of the meal's ingredients has a price
+        """
+        meals = []
+        lines = []
+        for menu_key, menu, recipes in menus:
+            recipes = recipes or {}
+            for day, day_meals in (menu or {}).items():
+                if not isinstance(day_meals, dict):
+                    continue
+                for meal_time, meal_info in day_meals.items():
+                    if not isinstance(meal_info, dict):
+                        continue
+                    slot = len(meals)
+                    meals.append((menu_key, day, meal_time, meal_info.get("name", ""),
+                                  pd.to_numeric(meal_info.get("estimated_cost"), errors="coerce")))
+                    recipe = recipes.get(meal_info.get("name"))
+                    lines.extend(
+                        (slot, key, unit, quantity)
+                        for key, _, unit, quantity in meal_items(meal_info, recipe, servings)
+                    )
+        
+        result = pd.DataFrame(meals, columns=["menu", "day", "meal_time", "name", "estimated_cost"])
+        if result.empty:
+            return pd.DataFrame(columns=MEAL_COLUMNS)
+        
+        items = pd.DataFrame(lines, columns=["slot", "ingredient", "unit", "quantity"])
+        items["cost"] = items["quantity"] * self.prices.reindex(
+            pd.MultiIndex.from_frame(items[["ingredient", "unit"]])
+        ).to_numpy()
+        
+        groups = items.groupby("slot")
+        result = result.join(pd.DataFrame({
+            "cost": groups["cost"].sum(min_count=1),
+            "items": groups.size(),
+            "priced_items": groups["cost"].count()
+        }))
+        result[["items", "priced_items"]] = result[["items", "priced_items"]].fillna(0).astype(int)
+        return result[MEAL_COLUMNS]
+    
+    def price_meal(self, meal_info, recipe=None, servings=DEFAULT_SERVINGS):
+        """
+        Price a single meal.
+        
+        Args:
+            meal_info: Meal dictionary with name and ingredients
+            recipe: Saved recipe of the dish (its amounts are used when given)
+            servings: Number of people the meal is cooked for
+        
+        Returns:
+            Cost of the priced ingredients (VND), NaN if none has a price
+        """
+        costs = [
+            quantity * self.prices.get((key, unit), float("nan"))
+            for key, _, unit, quantity in meal_items(meal_info, recipe, servings) if unit is not None
+        ]
+        costs = [cost for cost in costs if cost == cost]
+        return float(sum(costs)) if costs else float("nan")
+    
+    def price_menu(self, menu, recipes=None, servings=DEFAULT_SERVINGS, budget_per_meal=None):
+        """
+        Price the meals of one menu and check them against the budget.
+        
+        Args:
+            menu: Menu dictionary ({day: {meal_time: meal_info}})
+            recipes: Saved recipes by dish name
+            servings: Number of people every meal is cooked for
+            budget_per_meal: Maximum cost of one meal (VND)
+        
+        Returns:
+            DataFrame with one row per meal and an over_budget column
+        """
+        meals = self.price_menus([(None, menu, recipes)], servings).drop(columns="menu")
+        meals["over_budget"] = meals["cost"] > budget_per_meal if budget_per_meal else False
+        return meals
+    
+    def reprice_saved_menus(self, db_manager, servings=DEFAULT_SERVINGS):
+        """
+        Re-price every saved menu and store the results.
+        
+        All menus are priced in one vectorized pass and written in one
+        transaction, e.g. after a price table import.
+        
+        Args:
+            db_manager: DatabaseManager
+            servings: Number of people every meal is cooked for
+        
+        Returns:
+            int: Number of menus priced
+        """
+        menus = db_manager.get_all_menus()
+        meals_by_menu = {menu.id: menu.get_meals_dict() for menu in menus}
+        names = [
+            meal_info.get("name") for meals in meals_by_menu.values() for day_meals in meals.values()
+            if isinstance(day_meals, dict) for meal_info in day_meals.values() if isinstance(meal_info, dict)
+        ]
+        recipes = db_manager.get_recipes_by_names([name for name in names if name])
+        
+        meals = self.price_menus(
+            [(menu_id, meals, recipes) for menu_id, meals in meals_by_menu.items()], servings
+        )
+        budgets = pd.Series({menu.id: menu.budget_per_meal for menu in menus}, dtype=float)
+        meals["over_budget"] = meals["cost"] > meals["menu"].map(budgets)
+        
+        groups = meals.groupby("menu", sort=False)
+        totals = groups["cost"].sum(min_count=1)
+        over_budget = groups["over_budget"].sum()
+        
+        meal_costs = {menu_id: {} for menu_id in totals.index}
+        priced = meals[meals["cost"].notna()]
+        for menu_id, day, meal_time, cost in zip(priced["menu"], priced["day"], priced["meal_time"], priced["cost"]):
+            meal_costs[menu_id].setdefault(day, {})[meal_time] = round(float(cost))
+        
+        rows = [
+            (
+                int(menu_id),
+                None if pd.isna(total) else float(total),
+                json.dumps(meal_costs[menu_id], ensure_ascii=False),
+                int(over_budget[menu_id])
+            )
+            for menu_id, total in totals.items()
+        ]
+        
+        db_manager.save_menu_costs(rows)
+        logger.info(f"Re-priced {len(rows)} menus ({len(meals)} meals)")
+        return len(rows)
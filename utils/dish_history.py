@@ -0,0 +1,140 @@
+"""
+Recently eaten dishes of a user, across their saved menus.
+
+Generation only avoided repeats inside the week being generated; this
+index remembers the dishes of the last few saved menus so the API prompt
+and the local solver can avoid serving the same dishes week after week.
+"""
+import logging
+from collections import Counter, OrderedDict
+
+from config import HISTORY_MENUS_PER_USER, HISTORY_PROMPT_DISHES
+from utils.text_normalizer import fold_vietnamese
+
+logger = logging.getLogger(__name__)
+
+
+def dish_key(name):
+    """
+    Get the key a dish is remembered under.
+    
+    Args:
+        name: Dish name as written, e.g. "Phở Bò"
+    
+    Returns:
+        Folded name, e.g. "pho bo"
+    """
+    return fold_vietnamese(name).strip()
+
+
+class DishHistory:
+    """Set of the dishes served in a user's last saved menus.
+    
+    Each remembered menu keeps its own dish keys and a counter tracks in
+    how many of them every dish appears, so adding a menu (and dropping
+    the oldest one) or removing a menu only touches that menu's dishes.
+    """
+    
+    def __init__(self, max_menus=HISTORY_MENUS_PER_USER):
+        """
+        Initialize an empty history.
+        
+        Args:
+            max_menus: Number of most recent menus remembered
+        """
+        self.max_menus = max_menus
+        self._menus = OrderedDict()  # menu id -> dish keys, oldest first
+        self._counts = Counter()  # dish key -> number of remembered menus serving it
+        self._names = {}  # dish key -> display name
+    
+    def add_menu(self, menu_id, dish_names):
+        """
+        Remember a menu as the most recent one, forgetting the oldest if needed.
+        
+        Args:
+            menu_id: ID of the saved menu
+            dish_names: Names of the dishes in the menu
+        """
+        self.remove_menu(menu_id)
+        
+        keys = set()
+        for name in dish_names:
+            key = dish_key(name)
+            if key:
+                keys.add(key)
+                # The latest spelling is shown in the prompt
+                self._names[key] = str(name).strip()
+        self._menus[menu_id] = keys
+        self._counts.update(keys)
+        
+        while len(self._menus) > self.max_menus:
+            self.remove_menu(next(iter(self._menus)))
+    
+    def remove_menu(self, menu_id):
+        """
+        Forget a menu.
+        
+        Args:
+            menu_id: ID of the saved menu
+        """
+        keys = self._menus.pop(menu_id, None)
+        if not keys:
+            return
+        self._counts.subtract(keys)
+        for key in keys:
+            if self._counts[key] <= 0:
+                del self._counts[key]
+                del self._names[key]
+    
+    def count(self, name):
+        """
+        Get how many of the remembered menus served a dish.
+        
+        Args:
+            name: Dish name
+        
+        Returns:
+            int: Number of menus, 0 if the dish was not eaten recently
+        """
+        return self._counts.get(dish_key(name), 0)
+    
+    def recent(self, limit=HISTORY_PROMPT_DISHES):
+        """
+        Get a bounded list of recently eaten dishes for the menu prompt.
+        
+        Args:
+            limit: Maximum number of dishes
+        
+        Returns:
+            Dish names, the most often served first, then the most recent
+        """
+        recency = {}
+        for position, keys in enumerate(reversed(self._menus.values())):
+            for key in keys:
+                recency.setdefault(key, position)
+        keys = sorted(self._counts, key=lambda key: (-self._counts[key], recency[key], key))
+        return [self._names[key] for key in keys[:limit]]
+    
+    def copy(self):
+        """
+        Get an independent copy, e.g. to read on another thread.
+        
+        Returns:
+            DishHistory
+        """
+        history = DishHistory(self.max_menus)
+        history._menus = OrderedDict((menu_id, set(keys)) for menu_id, keys in self._menus.items())
+        history._counts = Counter(self._counts)
+        history._names = dict(self._names)
+        return history
+    
+    @property
+    def menu_count(self):
+        """Number of menus remembered."""
+        return len(self._menus)
+    
+    def __contains__(self, name):
+        return dish_key(name) in self._counts
+    
+    def __len__(self):
+        return len(self._counts)
@@ -0,0 +1,242 @@
+"""
+Matching of a user's disliked ingredients and dishes in menu text.
+
+All disliked terms are compiled into Aho–Corasick automata, so a dish
+name or ingredient is checked against every term in a single pass over
+its characters. Text is matched with its diacritics: disliking "cá" must
+not reject "cà chua", nor "bò" reject "bơ". Only terms the user typed
+without diacritics are matched against folded text.
+"""
+import logging
+import unicodedata
+from collections import deque
+from functools import lru_cache
+
+from utils.ingredient_canonicalizer import canonical_key
+from utils.text_normalizer import fold_vietnamese
+
+logger = logging.getLogger(__name__)
+
+# Kinds of disliked terms
+INGREDIENT = "ingredient"
+DISH = "dish"
+
+# Number of compiled matchers kept, one per distinct set of preferences
+MATCHER_CACHE_SIZE = 32
+
+
+def _normalize(text):
+    """Lowercase NFC text for matching, collapsing whitespace."""
+    return " ".join(unicodedata.normalize('NFC', str(text)).lower().split())
+
+
+def _fold(text):
+    """Fold text for matching, collapsing whitespace."""
+    return " ".join(fold_vietnamese(text).split())
+
+
+def _is_boundary(text, position):
+    """Check that a match may start or end at a position (not inside a word)."""
+    return position < 0 or position >= len(text) or not text[position].isalnum()
+
+
+class _Automaton:
+    """Aho–Corasick automaton over a set of patterns."""
+    
+    def __init__(self):
+        """Initialize an empty automaton; call build() after adding the patterns."""
+        self._goto = [{}]  # state -> {character: next state}
+        self._fail = [0]  # state -> longest proper suffix state
+        self._output = [[]]  # state -> [(pattern length, kind, term)] ending here
+    
+    def add(self, pattern, kind, term):
+        """Add a pattern to the trie."""
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append((len(pattern), kind, term))
+    
+    def build(self):
+        """Compute failure links breadth-first and merge the outputs along them."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                # Depth-one states fail back to the root, not to themselves
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+    
+    def scan(self, text, kinds, found):
+        """Append the terms of the given kinds matching whole words of text to found."""
+        if len(self._goto) == 1:
+            return
+        
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for length, kind, term in self._output[state]:
+                start = position - length + 1
+                if (kind in kinds and term not in found and
+                        _is_boundary(text, start - 1) and _is_boundary(text, position + 1)):
+                    found.append(term)
+
+
+class DislikeMatcher:
+    """Aho–Corasick matching of disliked terms in menu text.
+    
+    An ingredient term is matched both as written and by its canonical
+    name, so disliking "thịt lợn" also catches "300g thịt heo ba chỉ".
+    Terms only match whole words: "gà" does not match "gạo". A term
+    typed without diacritics is matched against folded text, so "bo"
+    matches both "bò" and "bơ", since it cannot tell them apart.
+    """
+    
+    def __init__(self, disliked_ingredients=(), disliked_dishes=()):
+        """
+        Compile the matcher.
+        
+        Args:
+            disliked_ingredients: Ingredients the user does not eat
+            disliked_dishes: Dishes the user does not eat
+        """
+        self._exact = _Automaton()  # patterns with diacritics, over normalized text
+        self._folded = _Automaton()  # patterns typed without diacritics, over folded text
+        self.terms = []
+        
+        for kind, terms in ((INGREDIENT, disliked_ingredients), (DISH, disliked_dishes)):
+            for term in terms or []:
+                term = str(term).strip()
+                if not term:
+                    continue
+                written = _normalize(term)
+                key = canonical_key(term) if kind == INGREDIENT else ""
+                if _fold(term) != written:
+                    exact, folded = {written, key}, set()
+                else:
+                    # Typed without diacritics: only folded text can match it, plus
+                    # the known name it resolves to ("thit lon" -> "thịt heo")
+                    exact, folded = {key} - {written}, {written}
+                
+                for automaton, patterns in ((self._exact, exact), (self._folded, folded)):
+                    for pattern in patterns - {""}:
+                        automaton.add(pattern, kind, term)
+                if (exact | folded) - {""}:
+                    self.terms.append((kind, term))
+        
+        self._exact.build()
+        self._folded.build()
+    
+    @classmethod
+    def for_user(cls, user):
+        """
+        Get the matcher of a user's preferences, compiled once and cached.
+        
+        Args:
+            user: User, or None
+        
+        Returns:
+            DislikeMatcher (empty for None)
+        """
+        if user is None:
+            return _compiled((), ())
+        return _compiled(tuple(user.disliked_ingredients or ()), tuple(user.disliked_dishes or ()))
+    
+    def find(self, text, kinds=(INGREDIENT, DISH)):
+        """
+        Find the disliked terms in a text.
+        
+        Args:
+            text: Text to scan, e.g. a dish name or an ingredient
+            kinds: Kinds of terms to report
+        
+        Returns:
+            List of disliked terms found, without duplicates; terms with
+            diacritics come first, each group in order of appearance
+        """
+        if not self.terms or not text:
+            return []
+        
+        found = []
+        self._exact.scan(_normalize(text), kinds, found)
+        self._folded.scan(_fold(text), kinds, found)
+        return found
+    
+    def meal_violations(self, meal_info):
+        """
+        Find the disliked terms in one meal.
+        
+        The dish name is checked against every term (an ingredient in the
+        name counts too), the ingredients only against disliked ingredients.
+        
+        Args:
+            meal_info: Meal dictionary with name and ingredients
+        
+        Returns:
+            List of disliked terms found, without duplicates
+        """
+        if not self.terms or not isinstance(meal_info, dict):
+            return []
+        
+        found = self.find(meal_info.get("name"))
+        for ingredient in meal_info.get("ingredients") or []:
+            ingredient = str(ingredient)
+            # The canonical name resolves synonyms the written form may use
+            for term in self.find(f"{ingredient} | {canonical_key(ingredient)}", (INGREDIENT,)):
+                if term not in found:
+                    found.append(term)
+        return found
+    
+    def menu_violations(self, menu):
+        """
+        Find the disliked terms in every meal of a menu.
+        
+        Args:
+            menu: Menu dictionary ({day: {meal_time: meal_info}})
+        
+        Returns:
+            List of (day, meal_time, dish name, terms) tuples for the meals with violations
+        """
+        violations = []
+        for day, day_meals in (menu or {}).items():
+            if not isinstance(day_meals, dict):
+                continue
+            for meal_time, meal_info in day_meals.items():
+                terms = self.meal_violations(meal_info)
+                if terms:
+                    violations.append((day, meal_time, meal_info.get("name", ""), terms))
+        return violations
+    
+    def allows(self, meal_info):
+        """
+        Check that a meal contains none of the disliked terms.
+        
+        Args:
+            meal_info: Meal dictionary with name and ingredients
+        
+        Returns:
+            bool
+        """
+        return not self.meal_violations(meal_info)
+    
+    def __len__(self):
+        return len(self.terms)
+
+
+@lru_cache(maxsize=MATCHER_CACHE_SIZE)
+def _compiled(disliked_ingredients, disliked_dishes):
+    """Compile a matcher; changed preferences give a new cache key."""
+    return DislikeMatcher(disliked_ingredients, disliked_dishes)
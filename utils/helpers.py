@@ -127,13 +127,14 @@ def ensure_directory_exists(directory):
     return True
 
 
-def export_menu_to_text(menu, filename):
+def export_menu_to_text(menu, filename, shopping_list=None):
     """
     Export a menu to a text file.
     
     Args:
         menu: Menu dictionary
         filename: Target filename
+        shopping_list: ShoppingList of the menu, written after the meals if given
         
     Returns:
         True if successful, False otherwise
@@ -164,6 +165,10 @@ def export_menu_to_text(menu, filename):
                 f.write("\nGHI CHÚ TỐI ƯU HÓA NGUYÊN LIỆU:\n")
                 for note in menu['optimization_notes']:
                     f.write(f"- {note}\n")
+            
+            if shopping_list is not None and len(shopping_list):
+                f.write("\nDANH SÁCH ĐI CHỢ:\n")
+                f.write(shopping_list.to_text() + "\n")
         
         return True
     except Exception as e:
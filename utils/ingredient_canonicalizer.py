@@ -0,0 +1,198 @@
+"""
+Canonical names for Vietnamese ingredients.
+
+"Thịt heo", "thịt lợn", "300g thịt heo ba chỉ" and "Thit heo" all describe
+the same ingredient; canonical_key() maps them to one key so that ingredient
+reuse, usage statistics, search and shopping lists agree on it.
+
+Keys keep their diacritics: "bò" (beef) and "bơ" (butter), "dừa" and "dưa"
+are different ingredients. Text typed without diacritics is resolved
+through an explicit lookup of known ingredients instead.
+"""
+import re
+import unicodedata
+from functools import lru_cache
+
+from utils.text_normalizer import fold_vietnamese
+
+# Number of distinct (ingredient, fold) pairs remembered by canonical()
+CANONICAL_CACHE_SIZE = 8192
+
+# Regional and spelling variants, mapped to the name used by the app
+SYNONYMS = {
+    "thịt lợn": "thịt heo",
+    "lợn": "heo",
+    "sườn lợn": "sườn heo",
+    "mỡ lợn": "mỡ heo",
+    "đậu hũ": "đậu phụ",
+    "đậu hủ": "đậu phụ",
+    "tàu hũ": "đậu phụ",
+    "ngô": "bắp",
+    "bắp ngô": "bắp",
+    "vừng": "mè",
+    "lạc": "đậu phộng",
+    "bí ngô": "bí đỏ",
+    "dưa chuột": "dưa leo",
+    "mướp đắng": "khổ qua",
+    "rau mùi": "ngò rí",
+    "hạt tiêu": "tiêu",
+    "xì dầu": "nước tương",
+    "ngò": "ngò rí",
+    "mì": "mỳ",
+    "hành củ": "hành tím",
+    "cá quả": "cá lóc",
+}
+
+# Words describing a cut or preparation rather than a different ingredient
+DESCRIPTORS = [
+    "ba chỉ", "nạc vai", "nạc", "xay", "băm nhỏ", "băm", "thái lát", "thái nhỏ",
+    "cắt nhỏ", "cắt khúc", "sạch", "loại 1", "đã sơ chế"
+]
+
+# Ingredients whose name typed without diacritics is resolved to the written
+# name; a folded name shared by two of them ("bo": bò, bơ) stays unresolved
+KNOWN_INGREDIENTS = [
+    "thịt heo", "thịt bò", "thịt gà", "thịt vịt", "sườn heo", "mỡ heo", "chả lụa", "giò lụa",
+    "bò", "bơ", "gà", "vịt", "heo", "trứng gà", "trứng vịt", "trứng cút",
+    "cá", "cá lóc", "cá basa", "cá thu", "cá hồi", "cá rô", "cá diêu hồng", "tôm", "cua", "mực", "nghêu",
+    "cà", "cà chua", "cà tím", "cà rốt", "khoai tây", "khoai lang", "khoai môn", "bí đỏ", "bí xanh",
+    "bắp", "bắp cải", "su hào", "súp lơ", "dưa", "dưa leo", "dưa hấu", "dưa cải", "dừa", "nước dừa",
+    "khổ qua", "mướp", "rau muống", "rau cải", "cải thảo", "cải ngọt", "rau ngót", "mồng tơi",
+    "giá", "giá đỗ", "nấm", "nấm rơm", "nấm hương", "mộc nhĩ", "đậu phụ", "đậu phộng", "đậu xanh",
+    "đậu đen", "đậu que", "hành", "hành lá", "hành tây", "hành tím", "tỏi", "gừng", "sả", "ớt",
+    "chanh", "me", "ngò rí", "rau răm", "húng quế", "thì là", "tía tô", "mè", "hạnh nhân",
+    "gạo", "gạo nếp", "bún", "phở", "mỳ", "miến", "bánh phở", "bánh mì", "bột mì", "bột năng",
+    "sữa", "sữa tươi", "sữa đặc", "nước cốt dừa", "nước mắm", "nước tương", "dầu ăn", "dầu hào",
+    "muối", "đường", "tiêu", "hạt nêm", "bột ngọt", "giấm"
+]
+
+# Units that may follow (or replace) a quantity
+UNITS = [
+    "kg", "g", "gr", "gram", "gam", "mg", "ml", "l", "lít", "muỗng canh", "muỗng cà phê",
+    "muỗng", "thìa canh", "thìa cà phê", "thìa", "chén", "bát", "tách", "cốc", "ly",
+    "củ", "quả", "trái", "con", "bó", "nhánh", "tép", "lát", "miếng", "gói", "hộp",
+    "lon", "cây", "cái", "nắm", "chút", "ít"
+]
+
+
+def _alternation(words):
+    """Build a regex alternation matching each word with or without diacritics."""
+    variants = {variant for word in words for variant in (word, fold_vietnamese(word))}
+    return "|".join(re.escape(variant) for variant in sorted(variants, key=len, reverse=True))
+
+
+_UNIT = rf"(?:{_alternation(UNITS)})(?!\w)"
+_NUMBER = r"\d+(?:[.,/]\d+)?(?:\s*[-–]\s*\d+(?:[.,/]\d+)?)?"
+_NUMBER_WORD = _alternation(["một", "hai", "ba", "bốn", "năm", "nửa", "vài"])
+_VAGUE_AMOUNT = _alternation(["một ít", "một chút", "chút", "ít"])
+_ABOUT = rf"(?:(?:{_alternation(['khoảng'])})\s+)?"
+
+# "300g", "2 muỗng canh", "khoảng 1/2 kg", "hai quả": a number word only counts before a unit
+_AMOUNT = rf"{_ABOUT}(?:{_NUMBER}\s*(?:{_UNIT})?|(?:{_NUMBER_WORD})\s+{_UNIT})"
+_LEADING_AMOUNT = re.compile(rf"^(?:{_AMOUNT}|{_VAGUE_AMOUNT})\s+", re.UNICODE)
+_TRAILING_AMOUNT = re.compile(rf"[\s:]+{_AMOUNT}$", re.UNICODE)
+_PARENTHESES = re.compile(r"\([^)]*\)|\[[^\]]*\]")
+_DESCRIPTORS = re.compile(rf"\s+(?:{_alternation(DESCRIPTORS)})(?!\w)", re.UNICODE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _folded_names():
+    """
+    Map the folded known names and synonyms to the written canonical name.
+    
+    A folded name that two different names share ("ngo": ngô, ngò) is left
+    out, since text typed without diacritics cannot tell them apart.
+    """
+    targets = {}
+    for name in KNOWN_INGREDIENTS:
+        targets.setdefault(fold_vietnamese(name), set()).add(SYNONYMS.get(name, name))
+    for variant, target in SYNONYMS.items():
+        targets.setdefault(fold_vietnamese(variant), set()).add(target)
+        targets.setdefault(fold_vietnamese(target), set()).add(target)
+    return {folded: names.pop() for folded, names in targets.items() if len(names) == 1}
+
+
+_FOLDED_NAMES = _folded_names()
+
+
+def _replace_synonym(name, synonyms):
+    """Replace a whole-name synonym, or a synonym at the start of the name."""
+    if name in synonyms:
+        return synonyms[name]
+    # Longest matching prefix first, so "thịt lợn xay" is not read as "thịt" + "lợn xay"
+    words = name.split(" ")
+    for length in range(len(words) - 1, 0, -1):
+        prefix = " ".join(words[:length])
+        if prefix in synonyms:
+            return f"{synonyms[prefix]} {' '.join(words[length:])}"
+    return name
+
+
+@lru_cache(maxsize=CANONICAL_CACHE_SIZE)
+def canonical(ingredient, fold=False):
+    """
+    Get the canonical name of an ingredient.
+    
+    Args:
+        ingredient: Ingredient as written, e.g. "300g Thịt lợn ba chỉ"
+        fold: Also strip diacritics, for matching against folded text
+    
+    Returns:
+        Canonical name, e.g. "thịt heo" (or "thit heo" when folding)
+    """
+    if not ingredient:
+        return ""
+    
+    name = unicodedata.normalize('NFC', str(ingredient)).lower()
+    name = _PARENTHESES.sub(" ", name)
+    # "thịt heo, thái lát" / "thịt heo - 300g": the note after the name is not part of it
+    name = re.split(r",|;| - ", name, maxsplit=1)[0]
+    name = _WHITESPACE.sub(" ", name).strip()
+    
+    name = _LEADING_AMOUNT.sub("", name).strip()
+    name = _TRAILING_AMOUNT.sub("", name)
+    name = _DESCRIPTORS.sub("", name).strip()
+    if not name:
+        return ""
+    
+    name = _replace_synonym(name, SYNONYMS)
+    return fold_vietnamese(name) if fold else name
+
+
+@lru_cache(maxsize=CANONICAL_CACHE_SIZE)
+def canonical_key(ingredient):
+    """
+    Get the key two spellings of the same ingredient share.
+    
+    Args:
+        ingredient: Ingredient as written
+    
+    Returns:
+        Canonical name with its diacritics; a name typed without them
+        ("thit lon") is resolved to the known name ("thịt heo") when only
+        one known name folds to it
+    """
+    name = canonical(ingredient)
+    if name and fold_vietnamese(name) == name:
+        return _replace_synonym(name, _FOLDED_NAMES)
+    return name
+
+
+def same_ingredient(first, second):
+    """
+    Check whether two ingredient strings name the same ingredient.
+    
+    Args:
+        first: Ingredient as written
+        second: Ingredient as written
+    
+    Returns:
+        True if both have the same canonical key
+    """
+    key = canonical_key(first)
+    return bool(key) and key == canonical_key(second)
+
+
+def cache_info():
+    """Get the hit/miss statistics of the canonical() cache."""
+    return canonical.cache_info()
@@ -3,9 +3,172 @@ Utility for optimizing ingredient usage across meals.
 """
 from collections import Counter
 
+from utils.ingredient_canonicalizer import canonical, canonical_key
+
+
+class MenuIndex:
+    """Inverted index of a menu, built once and shared by all optimizer queries.
+    
+    A slot is a (day, meal_time) pair. The index holds the dish and the
+    ingredient set of every slot, the slots using each ingredient and the
+    number of times each ingredient occurs. Ingredients are keyed by their
+    canonical key, so "Thịt lợn" and "300g thịt heo" count as one.
+    
+    Single meals can be added and removed, touching only the entries of
+    that meal's ingredients.
+    """
+    
+    def __init__(self, menu=None):
+        """
+        Build the index.
+        
+        Args:
+            menu: Dictionary containing menu information ({day: {meal_time: meal_info}})
+        """
+        self.slot_names = {}  # slot -> dish name
+        self.slot_ingredients = {}  # slot -> set of ingredient keys
+        self.postings = {}  # ingredient key -> slots using it, in menu order
+        self.counts = Counter()  # ingredient key -> occurrences across the menu
+        self.names = {}  # ingredient key -> canonical name shown to the user
+        self.days = {}  # day -> {meal_time: dish name} for meals listing ingredients
+        self._slot_keys = {}  # slot -> ingredient keys as listed, duplicates included
+        self._order = {}  # slot -> position in the menu, keeps postings in menu order
+        
+        if menu:
+            self.add_menu(menu)
+    
+    def add_menu(self, menu, prefix=""):
+        """
+        Add the meals of a menu to the index.
+        
+        Args:
+            menu: Dictionary containing menu information
+            prefix: Prepended to the day names, to keep several menus apart
+        """
+        for day, meals in menu.items():
+            day_key = f"{prefix}{day}"
+            self.days.setdefault(day_key, {})
+            for meal_time, meal_info in meals.items():
+                self.add_meal(day_key, meal_time, meal_info)
+    
+    def add_meal(self, day, meal_time, meal_info):
+        """
+        Add one meal, replacing the meal already indexed for that slot.
+        
+        Args:
+            day: Day of the meal
+            meal_time: Meal time
+            meal_info: Meal dictionary with name and ingredients
+        """
+        slot = (day, meal_time)
+        self.remove_meal(day, meal_time)
+        
+        keys = []
+        for ingredient in meal_info.get('ingredients', []):
+            key = canonical_key(ingredient)
+            if key:
+                self.names.setdefault(key, canonical(ingredient))
+                keys.append(key)
+        
+        position = self._order.setdefault(slot, len(self._order))
+        self.slot_names[slot] = meal_info.get('name')
+        self.slot_ingredients[slot] = set(keys)
+        self._slot_keys[slot] = keys
+        self.counts.update(keys)
+        day_meals = self.days.setdefault(day, {})
+        if 'ingredients' in meal_info:
+            day_meals[meal_time] = meal_info.get('name')
+        
+        for key in dict.fromkeys(keys):
+            slots = self.postings.setdefault(key, [])
+            # A re-added slot goes back to its place in the menu, not to the end
+            at = len(slots)
+            while at > 0 and self._order[slots[at - 1]] > position:
+                at -= 1
+            slots.insert(at, slot)
+    
+    def remove_meal(self, day, meal_time):
+        """
+        Remove one meal from the index.
+        
+        Args:
+            day: Day of the meal
+            meal_time: Meal time
+        """
+        slot = (day, meal_time)
+        keys = self._slot_keys.pop(slot, None)
+        if keys is None:
+            return
+        
+        del self.slot_names[slot]
+        for key in self.slot_ingredients.pop(slot):
+            slots = self.postings[key]
+            slots.remove(slot)
+            if not slots:
+                del self.postings[key]
+        
+        self.counts.subtract(keys)
+        for key in set(keys):
+            if self.counts[key] <= 0:
+                del self.counts[key]
+                self.names.pop(key, None)
+        self.days.get(day, {}).pop(meal_time, None)
+    
+    def slots_using(self, ingredient):
+        """
+        Get the slots whose dish uses an ingredient.
+        
+        Args:
+            ingredient: Ingredient name, in any spelling
+            
+        Returns:
+            List of (day, meal_time) slots
+        """
+        return self.postings.get(canonical_key(ingredient), [])
+    
+    def shared_ingredients(self):
+        """
+        Get the ingredients used by more than one dish.
+        
+        Returns:
+            Dictionary of ingredient key to the slots using it
+        """
+        return {key: slots for key, slots in self.postings.items() if len(slots) > 1}
+    
+    def most_common(self, count=None):
+        """
+        Get the most used ingredients.
+        
+        Args:
+            count: Number of ingredients to return (all if None)
+            
+        Returns:
+            List of (canonical name, occurrences) tuples, ties ordered by name
+        """
+        # Ties are broken by name, so replacing a meal does not reorder unrelated ingredients
+        ranked = sorted(self.counts.items(), key=lambda item: (-item[1], self.names[item[0]]))
+        return [(self.names[key], uses) for key, uses in ranked[:count]]
+
 
 class IngredientOptimizer:
-    """Utility class for optimizing ingredient usage."""
+    """Utility class for optimizing ingredient usage.
+    
+    Every method accepts either a menu dictionary or a MenuIndex; pass a
+    MenuIndex when running several analyses on the same menu.
+    """
+    
+    @staticmethod
+    def build_index(menu):
+        """
+        Get the index of a menu, building it unless one was passed in.
+        
+        Args:
+            menu: Dictionary containing menu information, or a MenuIndex
+            
+        Returns:
+            MenuIndex for the menu
+        """
+        return menu if isinstance(menu, MenuIndex) else MenuIndex(menu)
     
     @staticmethod
     def analyze_menu(menu):
@@ -13,32 +176,17 @@ class IngredientOptimizer:
         Analyze a menu to find frequently used ingredients.
         
         Args:
-            menu: Dictionary containing menu information
+            menu: Dictionary containing menu information, or a MenuIndex
             
         Returns:
             Dictionary with ingredient usage analysis
         """
-        ingredients = []
-        days_with_meals = {}
-        
-        # Extract all ingredients from the menu
-        for day, meals in menu.items():
-            days_with_meals[day] = {}
-            for meal_time, meal_info in meals.items():
-                if 'ingredients' in meal_info:
-                    days_with_meals[day][meal_time] = meal_info['name']
-                    ingredients.extend(meal_info['ingredients'])
-        
-        # Count ingredient frequency
-        ingredient_counter = Counter(ingredients)
-        
-        # Find most common ingredients
-        most_common = ingredient_counter.most_common(10)
+        index = IngredientOptimizer.build_index(menu)
         
         return {
-            'most_common_ingredients': most_common,
-            'days_with_meals': days_with_meals,
-            'total_unique_ingredients': len(ingredient_counter)
+            'most_common_ingredients': index.most_common(10),
+            'days_with_meals': {day: dict(meals) for day, meals in index.days.items()},
+            'total_unique_ingredients': len(index.counts)
         }
     
     @staticmethod
@@ -51,9 +199,15 @@ class IngredientOptimizer:
             previous_ingredients: List of ingredients from previous meals
             
         Returns:
-            List of ingredients that can be reused
+            List of ingredients that can be reused, as written in the current meal
         """
-        return list(set(current_ingredients) & set(previous_ingredients))
+        previous_keys = {canonical_key(ingredient) for ingredient in previous_ingredients}
+        reusable = {}
+        for ingredient in current_ingredients:
+            key = canonical_key(ingredient)
+            if key and key in previous_keys:
+                reusable.setdefault(key, ingredient)
+        return list(reusable.values())
     
     @staticmethod
     def suggest_optimizations(menu):
@@ -61,46 +215,22 @@ class IngredientOptimizer:
         Suggest optimizations for ingredient usage across meals.
         
         Args:
-            menu: Dictionary containing menu information
+            menu: Dictionary containing menu information, or a MenuIndex
             
         Returns:
             List of optimization suggestions
         """
+        index = IngredientOptimizer.build_index(menu)
         suggestions = []
         
-        # Get all dishes and ingredients
-        all_dishes = {}
-        all_ingredients = []
-        
-        for day, meals in menu.items():
-            for meal_time, meal_info in meals.items():
-                dish_name = meal_info['name']
-                ingredients = meal_info.get('ingredients', [])
-                
-                # Store dish info
-                all_dishes[f"{day} - {meal_time}"] = {
-                    'name': dish_name,
-                    'ingredients': ingredients
-                }
-                
-                # Add ingredients to the list
-                all_ingredients.extend(ingredients)
-        
-        # Find common ingredients (used more than once)
-        ingredient_counter = Counter(all_ingredients)
-        common_ingredients = [item for item, count in ingredient_counter.items() if count > 1]
-        
-        # Generate suggestions for reusing ingredients
-        for ingredient in common_ingredients:
-            dishes_using_ingredient = []
-            
-            for dish_key, dish_info in all_dishes.items():
-                if ingredient in dish_info['ingredients']:
-                    dishes_using_ingredient.append(f"{dish_key} ({dish_info['name']})")
-            
-            if len(dishes_using_ingredient) > 1:
-                suggestion = f"Nguyên liệu '{ingredient}' được sử dụng trong các món: {', '.join(dishes_using_ingredient)}"
-                suggestions.append(suggestion)
+        # Each suggestion only walks the postings of its own ingredient
+        for key, slots in index.shared_ingredients().items():
+            dishes_using_ingredient = [
+                f"{day} - {meal_time} ({index.slot_names[(day, meal_time)]})"
+                for day, meal_time in slots
+            ]
+            suggestion = f"Nguyên liệu '{index.names[key]}' được sử dụng trong các món: {', '.join(dishes_using_ingredient)}"
+            suggestions.append(suggestion)
         
         return suggestions
     
@@ -110,25 +240,19 @@ class IngredientOptimizer:
         Calculate the overall usage of ingredients across the menu.
         
         Args:
-            menu: Dictionary containing menu information
+            menu: Dictionary containing menu information, or a MenuIndex
             
         Returns:
             Dictionary with ingredient usage statistics
         """
-        ingredient_counter = Counter()
-        
-        # Count ingredients
-        for day, meals in menu.items():
-            for meal_time, meal_info in meals.items():
-                ingredients = meal_info.get('ingredients', [])
-                ingredient_counter.update(ingredients)
+        index = IngredientOptimizer.build_index(menu)
         
         # Calculate statistics
-        total_ingredients = sum(ingredient_counter.values())
-        unique_ingredients = len(ingredient_counter)
+        total_ingredients = sum(index.counts.values())
+        unique_ingredients = len(index.counts)
         
         # Calculate top ingredients
-        top_ingredients = ingredient_counter.most_common(5)
+        top_ingredients = index.most_common(5)
         
         # Calculate usage efficiency (higher is better)
         usage_efficiency = total_ingredients / unique_ingredients if unique_ingredients > 0 else 0
@@ -138,4 +262,4 @@ class IngredientOptimizer:
             'unique_ingredients': unique_ingredients,
             'top_ingredients': top_ingredients,
             'usage_efficiency': round(usage_efficiency, 2)
-        } 
\ No newline at end of file
+        }
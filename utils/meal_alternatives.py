@@ -0,0 +1,85 @@
+"""
+Alternative dishes generated with a menu.
+
+Generation asks for a few ranked alternatives per meal in the same
+response and stores them in meal_info["alternatives"], so a meal can be
+swapped locally instead of with another API call.
+"""
+import logging
+
+from config import MAX_MENU_ALTERNATIVES
+from utils.dish_history import dish_key
+
+logger = logging.getLogger(__name__)
+
+# Key of the alternatives in a meal_info
+ALTERNATIVES_KEY = "alternatives"
+
+
+def clean_alternatives(menu, validator, limit=MAX_MENU_ALTERNATIVES):
+    """
+    Keep the alternatives that pass validation and are not already in the menu.
+    
+    Args:
+        menu: Menu dictionary ({day: {meal_time: meal_info}}), changed in place
+        validator: MenuValidator of the user's constraints
+        limit: Maximum number of alternatives kept per meal
+    
+    Returns:
+        int: Number of alternatives kept in the whole menu
+    """
+    meals = [
+        meal_info for day_meals in (menu or {}).values() if isinstance(day_meals, dict)
+        for meal_info in day_meals.values() if isinstance(meal_info, dict)
+    ]
+    menu_dishes = {dish_key(meal_info.get("name")) for meal_info in meals}
+    
+    kept_total = 0
+    for meal_info in meals:
+        alternatives = meal_info.pop(ALTERNATIVES_KEY, None)
+        if not isinstance(alternatives, list):
+            continue
+        
+        kept = []
+        seen = set(menu_dishes)
+        for alternative in alternatives:
+            if len(kept) == limit:
+                break
+            if not isinstance(alternative, dict) or not alternative.get("name"):
+                continue
+            if validator.validate_meal(alternative):
+                continue
+            key = dish_key(alternative["name"])
+            if key in seen:
+                continue
+            seen.add(key)
+            alternative.pop(ALTERNATIVES_KEY, None)
+            if "servings" in meal_info:
+                alternative.setdefault("servings", meal_info["servings"])
+            kept.append(alternative)
+        
+        if kept:
+            meal_info[ALTERNATIVES_KEY] = kept
+            kept_total += len(kept)
+    return kept_total
+
+
+def swap_alternative(meal_info, index):
+    """
+    Replace a meal by one of its alternatives.
+    
+    The replaced meal becomes the first alternative of the new one, so the
+    swap can be undone the same way.
+    
+    Args:
+        meal_info: Meal dictionary with alternatives
+        index: Position of the chosen alternative
+    
+    Returns:
+        New meal dictionary
+    """
+    alternatives = list(meal_info.get(ALTERNATIVES_KEY) or [])
+    chosen = dict(alternatives.pop(index))
+    replaced = {key: value for key, value in meal_info.items() if key != ALTERNATIVES_KEY}
+    chosen[ALTERNATIVES_KEY] = [replaced] + alternatives
+    return chosen
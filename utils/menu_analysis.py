@@ -0,0 +1,249 @@
+"""
+Incremental analysis of the menu being edited.
+"""
+import logging
+from collections import Counter
+
+import numpy as np
+
+from utils.helpers import format_currency
+from utils.ingredient_optimizer import MenuIndex
+from utils.nutrition import NUTRIENTS, parse_nutrition, format_nutrition
+from utils.dislike_matcher import DislikeMatcher
+
+logger = logging.getLogger(__name__)
+
+# Number of most used ingredients listed in the notes
+TOP_INGREDIENTS = 5
+
+
+class MenuAnalysis:
+    """Ingredient reuse, cost and nutrition totals of a menu, kept up to date per meal.
+    
+    Every total is a sum over meals, so replacing one meal subtracts that
+    meal's old contribution and adds the new one. An edit costs as much as
+    the edited meal instead of a pass over the whole week.
+    """
+    
+    def __init__(self, menu=None, budget_per_meal=None, price_meal=None, matcher=None):
+        """
+        Analyze a menu.
+        
+        Args:
+            menu: Menu dictionary ({day: {meal_time: meal_info}})
+            budget_per_meal: Maximum cost of one meal (VND), for the over-budget flags
+            price_meal: Function returning the local cost of a meal_info (NaN if
+                unknown), e.g. built on CostEngine.price_meal
+            matcher: DislikeMatcher of the user, for the disliked-term warnings
+        """
+        self.index = MenuIndex()
+        self.budget_per_meal = budget_per_meal
+        self.price_meal = price_meal
+        self.matcher = matcher or DislikeMatcher()
+        
+        self.reuse_links = 0  # Sum over ingredients of (meals using it - 1)
+        self.estimated_total = 0
+        self.local_total = 0.0
+        self.nutrition_total = np.zeros(len(NUTRIENTS))
+        
+        self._meals = {}  # slot -> meal_info
+        self._estimated = {}  # slot -> estimated cost from the menu
+        self._local = {}  # slot -> local cost (NaN if unknown)
+        self._nutrition = {}  # slot -> nutrition array (NaN if unknown)
+        self._day_meals = Counter()  # day -> number of meals
+        self._order = {}  # slot -> position in the menu, kept when a meal is replaced
+        self.over_budget = set()  # slots whose local cost is over budget
+        self.violations = {}  # slot -> disliked terms found in the meal
+        self.nutrition_meals = 0  # meals with at least one nutrition value
+        
+        for day, day_meals in (menu or {}).items():
+            if not isinstance(day_meals, dict):
+                continue
+            for meal_time, meal_info in day_meals.items():
+                if isinstance(meal_info, dict):
+                    self.set_meal(day, meal_time, meal_info)
+    
+    def set_meal(self, day, meal_time, meal_info):
+        """
+        Add a meal, or replace the meal already analyzed for that slot.
+        
+        Args:
+            day: Day of the meal
+            meal_time: Meal time
+            meal_info: Meal dictionary
+        """
+        self.remove_meal(day, meal_time)
+        slot = (day, meal_time)
+        
+        self.index.add_meal(day, meal_time, meal_info)
+        self.reuse_links += self._links(slot)
+        
+        self._meals[slot] = meal_info
+        self._order.setdefault(slot, len(self._order))
+        self._day_meals[day] += 1
+        
+        estimated = self._number(meal_info.get('estimated_cost'))
+        self._estimated[slot] = estimated
+        self.estimated_total += estimated
+        
+        nutrition = parse_nutrition(meal_info.get('nutrition_info'))
+        self._nutrition[slot] = nutrition
+        self.nutrition_total += np.nan_to_num(nutrition)
+        if not np.isnan(nutrition).all():
+            self.nutrition_meals += 1
+        
+        self._price(slot)
+        self._check_dislikes(slot)
+    
+    def remove_meal(self, day, meal_time):
+        """
+        Remove a meal from the analysis.
+        
+        Args:
+            day: Day of the meal
+            meal_time: Meal time
+        """
+        slot = (day, meal_time)
+        if slot not in self._meals:
+            return
+        
+        self.reuse_links -= self._links(slot)
+        self.index.remove_meal(day, meal_time)
+        
+        del self._meals[slot]
+        self._day_meals[day] -= 1
+        if self._day_meals[day] <= 0:
+            del self._day_meals[day]
+        
+        self.estimated_total -= self._estimated.pop(slot)
+        
+        nutrition = self._nutrition.pop(slot)
+        self.nutrition_total -= np.nan_to_num(nutrition)
+        if not np.isnan(nutrition).all():
+            self.nutrition_meals -= 1
+        
+        local = self._local.pop(slot)
+        if local == local:
+            self.local_total -= local
+        self.over_budget.discard(slot)
+        self.violations.pop(slot, None)
+    
+    def _links(self, slot):
+        """Count the ingredients of an indexed meal that other meals also use."""
+        return sum(1 for key in self.index.slot_ingredients[slot] if len(self.index.postings[key]) > 1)
+    
+    @staticmethod
+    def _number(value):
+        """Convert an estimated cost to a number, 0 if it is missing."""
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return 0
+    
+    def _price(self, slot):
+        """Compute the local cost of one meal and its over-budget flag."""
+        local = float("nan")
+        if self.price_meal is not None:
+            try:
+                local = self.price_meal(self._meals[slot])
+            except Exception as e:
+                logger.error(f"Error pricing meal {slot}: {str(e)}")
+        self._local[slot] = local
+        if local == local:
+            self.local_total += local
+            if self.budget_per_meal and local > self.budget_per_meal:
+                self.over_budget.add(slot)
+    
+    def _check_dislikes(self, slot):
+        """Find the disliked terms in one meal."""
+        terms = self.matcher.meal_violations(self._meals[slot])
+        if terms:
+            self.violations[slot] = terms
+        else:
+            self.violations.pop(slot, None)
+    
+    def set_matcher(self, matcher):
+        """
+        Switch to another user's dislikes and check every meal again.
+        
+        Args:
+            matcher: DislikeMatcher
+        """
+        self.matcher = matcher or DislikeMatcher()
+        for slot in self._meals:
+            self._check_dislikes(slot)
+    
+    def set_price_meal(self, price_meal):
+        """
+        Switch to another pricing function and re-price every meal.
+        
+        Args:
+            price_meal: Function returning the local cost of a meal_info
+        """
+        self.price_meal = price_meal
+        self.local_total = 0.0
+        self.over_budget.clear()
+        for slot in self._meals:
+            self._price(slot)
+    
+    def set_budget(self, budget_per_meal):
+        """
+        Change the budget per meal and update the over-budget flags.
+        
+        Args:
+            budget_per_meal: Maximum cost of one meal (VND)
+        """
+        self.budget_per_meal = budget_per_meal
+        self.over_budget = {
+            slot for slot, local in self._local.items()
+            if budget_per_meal and local == local and local > budget_per_meal
+        }
+    
+    def notes(self):
+        """
+        Describe the menu for the optimization notes panel.
+        
+        Returns:
+            List of notes
+        """
+        if not self._meals:
+            return []
+        
+        notes = []
+        shared = sum(1 for slots in self.index.postings.values() if len(slots) > 1)
+        notes.append(
+            f"{len(self.index.counts)} nguyên liệu, {shared} nguyên liệu dùng cho nhiều món "
+            f"({self.reuse_links} lượt tái sử dụng)"
+        )
+        top = self.index.most_common(TOP_INGREDIENTS)
+        if top:
+            notes.append("Dùng nhiều nhất: " + ", ".join(f"{name} ({uses})" for name, uses in top))
+        notes.append(f"Tổng chi phí ước tính: {format_currency(self.estimated_total)}")
+        for slot in sorted(self.violations, key=self._order.get):
+            day, meal_time = slot
+            notes.append(
+                f"⚠ {day} - {meal_time} ({self.index.slot_names.get(slot)}): "
+                f"có {', '.join(self.violations[slot])} trong danh sách không thích"
+            )
+        
+        if self.nutrition_meals:
+            days = len(self._day_meals) or 1
+            notes.append(
+                f"Dinh dưỡng trung bình mỗi ngày: {format_nutrition(self.nutrition_total / days)} "
+                f"({self.nutrition_meals}/{len(self._meals)} bữa có số liệu)"
+            )
+        
+        priced = sum(1 for local in self._local.values() if local == local)
+        if priced:
+            notes.append(
+                f"Chi phí theo bảng giá nguyên liệu: {format_currency(int(self.local_total))} "
+                f"({priced}/{len(self._meals)} bữa có giá)"
+            )
+            for slot in sorted(self.over_budget, key=self._order.get):
+                day, meal_time = slot
+                notes.append(
+                    f"⚠ {day} - {meal_time} ({self.index.slot_names.get(slot)}): "
+                    f"{format_currency(int(self._local[slot]))} vượt ngân sách "
+                    f"{format_currency(int(self.budget_per_meal))}"
+                )
+        return notes
@@ -0,0 +1,265 @@
+"""
+Local menu planner that picks dishes from a catalog without calling the API.
+"""
+import logging
+
+import numpy as np
+
+from utils.helpers import format_currency
+from utils.dislike_matcher import DislikeMatcher
+from utils.ingredient_canonicalizer import canonical_key
+from utils.text_normalizer import fold_vietnamese
+
+logger = logging.getLogger(__name__)
+
+# Default objective weights
+REUSE_WEIGHT = 1.0  # Shared ingredients between two meals
+VARIETY_WEIGHT = 10.0  # Penalty for serving the same dish twice in the plan
+SAME_DAY_WEIGHT = 5.0  # Extra penalty for serving the same dish twice on one day
+FAVORITE_WEIGHT = 2.0  # Bonus for favorite ingredients and dishes
+HISTORY_WEIGHT = 3.0  # Penalty per recent saved menu that already served the dish
+
+# Local search stops after this many passes over the plan
+MAX_PASSES = 10
+
+
+class MenuSolver:
+    """Plans a days x meals grid from candidate dishes.
+    
+    Every candidate is a row of an ingredient-incidence matrix (normalized
+    so long ingredient lists are not favored). The plan maximizes
+    ingredient reuse between meals, variety and favorites, subject to the
+    budget per meal, the preparation time and the user's dislikes. A
+    greedy pass builds a first plan and local search then replaces one
+    meal at a time with the best candidate, scoring all candidates at
+    once with a matrix-vector product.
+    """
+    
+    def __init__(self, candidates, reuse_weight=REUSE_WEIGHT, variety_weight=VARIETY_WEIGHT,
+                 same_day_weight=SAME_DAY_WEIGHT, favorite_weight=FAVORITE_WEIGHT,
+                 history_weight=HISTORY_WEIGHT, seed=None):
+        """
+        Initialize the solver with a candidate pool.
+        
+        Args:
+            candidates: Dish objects or meal_info dictionaries (name, ingredients,
+                preparation_time, estimated_cost); duplicate names are dropped
+            reuse_weight: Weight of shared ingredients between meals
+            variety_weight: Penalty for repeating a dish in the plan
+            same_day_weight: Extra penalty for repeating a dish on the same day
+            favorite_weight: Bonus for favorite ingredients and dishes
+            history_weight: Penalty for dishes eaten in recent saved menus
+            seed: Random seed for tie-breaking (None for a different plan each time)
+        """
+        self.reuse_weight = reuse_weight
+        self.variety_weight = variety_weight
+        self.same_day_weight = same_day_weight
+        self.favorite_weight = favorite_weight
+        self.history_weight = history_weight
+        self.random = np.random.default_rng(seed)
+        
+        self.dishes = []
+        seen = set()
+        for candidate in candidates:
+            dish = self._as_meal_info(candidate)
+            key = fold_vietnamese(dish["name"]).strip()
+            if key and key not in seen:
+                seen.add(key)
+                self.dishes.append(dish)
+        
+        self.ingredient_index = {}
+        rows, columns = [], []
+        for row, dish in enumerate(self.dishes):
+            keys = {canonical_key(ingredient) for ingredient in dish["ingredients"]}
+            for key in keys - {""}:
+                rows.append(row)
+                columns.append(self.ingredient_index.setdefault(key, len(self.ingredient_index)))
+        
+        incidence = np.zeros((len(self.dishes), len(self.ingredient_index)), dtype=np.float32)
+        incidence[rows, columns] = 1.0
+        self.incidence = incidence
+        
+        # Unit-length rows: the overlap of two dishes is their cosine similarity
+        lengths = np.sqrt(incidence.sum(axis=1, keepdims=True))
+        self.normalized = np.divide(incidence, lengths, out=np.zeros_like(incidence), where=lengths > 0)
+        
+        self.costs = np.array([self._number(dish["estimated_cost"]) for dish in self.dishes], dtype=np.float64)
+        self.prep_times = np.array([self._number(dish["preparation_time"]) for dish in self.dishes],
+                                   dtype=np.float64)
+        self.name_keys = [fold_vietnamese(dish["name"]).strip() for dish in self.dishes]
+    
+    @staticmethod
+    def _as_meal_info(candidate):
+        """Get name, ingredients, time and cost from a Dish or a meal_info dictionary."""
+        if isinstance(candidate, dict):
+            get = candidate.get
+        else:
+            get = lambda field, default=None: getattr(candidate, field, default)
+        return {
+            "name": str(get("name") or "").strip(),
+            "ingredients": list(get("ingredients") or []),
+            "preparation_time": get("preparation_time"),
+            "estimated_cost": get("estimated_cost")
+        }
+    
+    @staticmethod
+    def _number(value):
+        """Convert a cost or time to a float, NaN if it is missing or not numeric."""
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return np.nan
+    
+    def _ingredient_vector(self, ingredients):
+        """Get the indicator vector of a list of ingredients."""
+        vector = np.zeros(len(self.ingredient_index), dtype=np.float32)
+        for ingredient in ingredients or []:
+            column = self.ingredient_index.get(canonical_key(ingredient))
+            if column is not None:
+                vector[column] = 1.0
+        return vector
+    
+    def feasible_mask(self, budget_per_meal=None, max_prep_time=None, user=None):
+        """
+        Get the candidates that satisfy the hard constraints.
+        
+        Args:
+            budget_per_meal: Maximum cost of one meal (VND)
+            max_prep_time: Maximum preparation time (minutes)
+            user: User whose disliked ingredients and dishes are excluded
+        
+        Returns:
+            Boolean array over the candidates
+        """
+        mask = np.ones(len(self.dishes), dtype=bool)
+        
+        # Dishes without a known cost or time cannot be checked, so they are left out
+        if budget_per_meal:
+            mask &= self.costs <= float(budget_per_meal)
+        if max_prep_time:
+            mask &= self.prep_times <= float(max_prep_time)
+        
+        matcher = DislikeMatcher.for_user(user)
+        if len(matcher):
+            mask &= np.array([matcher.allows(dish) for dish in self.dishes], dtype=bool)
+        
+        return mask
+    
+    def _favorite_scores(self, user):
+        """Get the bonus of every candidate for the user's favorites."""
+        if user is None:
+            return np.zeros(len(self.dishes), dtype=np.float64)
+        
+        scores = self.normalized @ self._ingredient_vector(user.favorite_ingredients)
+        favorite_dishes = {fold_vietnamese(name).strip() for name in user.favorite_dishes or []}
+        if favorite_dishes:
+            scores = scores + np.array([key in favorite_dishes for key in self.name_keys], dtype=np.float64)
+        return self.favorite_weight * scores.astype(np.float64)
+    
+    def _history_penalties(self, history):
+        """Get the penalty of every candidate for being eaten recently."""
+        if not history:
+            return np.zeros(len(self.dishes), dtype=np.float64)
+        counts = np.array([history.count(key) for key in self.name_keys], dtype=np.float64)
+        return self.history_weight * counts
+    
+    def _slot_scores(self, plan, slot_days, slot, unary):
+        """Score every candidate for one slot, given the dishes in all other slots."""
+        others = np.delete(plan, slot)
+        others = others[others >= 0]
+        
+        # Shared ingredients with every other meal, for all candidates at once
+        scores = unary + self.reuse_weight * (self.normalized @ self.normalized[others].sum(axis=0))
+        
+        repeats = np.bincount(others, minlength=len(self.dishes))
+        same_day = [other for index, other in enumerate(plan)
+                    if index != slot and other >= 0 and slot_days[index] == slot_days[slot]]
+        same_day_repeats = np.bincount(np.array(same_day, dtype=np.int64), minlength=len(self.dishes))
+        return scores - self.variety_weight * repeats - self.same_day_weight * same_day_repeats
+    
+    def solve(self, days, meals_per_day, budget_per_meal=None, max_prep_time=None, user=None,
+              history=None, max_passes=MAX_PASSES):
+        """
+        Plan a menu.
+        
+        Args:
+            days: Day names, e.g. DAYS_OF_WEEK
+            meals_per_day: Meal names, e.g. MEALS_PER_DAY
+            budget_per_meal: Maximum cost of one meal (VND)
+            max_prep_time: Maximum preparation time (minutes)
+            user: User whose preferences are applied
+            history: DishHistory of the user; recently eaten dishes are avoided
+            max_passes: Maximum number of local search passes
+        
+        Returns:
+            Dictionary with "menu" ({day: {meal_time: meal_info}}) and
+            "optimization_notes", like the result of the menu generator
+        
+        Raises:
+            ValueError: If no candidate satisfies the constraints
+        """
+        mask = self.feasible_mask(budget_per_meal, max_prep_time, user)
+        if not mask.any():
+            raise ValueError(
+                "Không có món ăn nào trong danh mục thỏa mãn ngân sách, thời gian "
+                "và sở thích đã chọn. Hãy lưu thêm thực đơn hoặc nới lỏng điều kiện."
+            )
+        
+        slots = [(day, meal_time) for day in days for meal_time in meals_per_day]
+        slot_days = [day for day, _ in slots]
+        # Tiny noise breaks ties differently on each run
+        unary = (self._favorite_scores(user) - self._history_penalties(history) +
+                 self.random.uniform(0, 1e-3, len(self.dishes)))
+        unary[~mask] = -np.inf
+        
+        plan = np.full(len(slots), -1, dtype=np.int64)
+        for slot in range(len(slots)):
+            plan[slot] = int(np.argmax(self._slot_scores(plan, slot_days, slot, unary)))
+        
+        passes = 0
+        for passes in range(1, max_passes + 1):
+            changed = False
+            for slot in self.random.permutation(len(slots)):
+                scores = self._slot_scores(plan, slot_days, slot, unary)
+                best = int(np.argmax(scores))
+                if scores[best] > scores[plan[slot]] + 1e-9:
+                    plan[slot] = best
+                    changed = True
+            if not changed:
+                break
+        
+        logger.info(f"Solved {len(slots)} meals from {int(mask.sum())} candidates in {passes} passes")
+        return self._build_result(slots, plan, int(mask.sum()), history)
+    
+    def _build_result(self, slots, plan, candidate_count, history=None):
+        """Turn a plan into the menu format used by the rest of the app."""
+        menu = {}
+        seen_keys = set()
+        total_cost = 0.0
+        for (day, meal_time), row in zip(slots, plan):
+            dish = self.dishes[row]
+            keys = [canonical_key(ingredient) for ingredient in dish["ingredients"]]
+            reused = [ingredient for ingredient, key in zip(dish["ingredients"], keys) if key in seen_keys]
+            seen_keys.update(keys)
+            if not np.isnan(self.costs[row]):
+                total_cost += self.costs[row]
+            
+            menu.setdefault(day, {})[meal_time] = {
+                "name": dish["name"],
+                "ingredients": list(dish["ingredients"]),
+                "preparation_time": dish["preparation_time"],
+                "estimated_cost": dish["estimated_cost"],
+                "reused_ingredients": reused
+            }
+        
+        notes = [
+            f"Thực đơn được tạo từ {candidate_count} món phù hợp trong danh mục món ăn đã lưu",
+            f"Tổng chi phí ước tính: {format_currency(int(total_cost))}"
+        ]
+        if history:
+            repeated = len({row for row in plan if history.count(self.name_keys[row])})
+            notes.append(
+                f"Tránh lặp lại {len(history)} món đã ăn trong {history.menu_count} thực đơn gần đây "
+                f"({repeated} món vẫn được dùng lại)"
+            )
+        return {"menu": menu, "optimization_notes": notes}
@@ -0,0 +1,109 @@
+"""
+Validation of generated menus against the user's constraints.
+
+Every meal is checked locally for the keys the app needs, the budget per
+meal, the preparation time and the user's dislikes, so only the meals
+that fail have to be asked for again.
+"""
+import logging
+
+from utils.dislike_matcher import DislikeMatcher
+from utils.helpers import format_currency
+
+logger = logging.getLogger(__name__)
+
+# Keys every meal must have, with the type their value must have
+REQUIRED_KEYS = {
+    "name": str,
+    "ingredients": list,
+    "preparation_time": (int, float),
+    "estimated_cost": (int, float),
+}
+
+
+def _number(value):
+    """Convert a time or cost to a float, None if it is not numeric."""
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class MenuValidator:
+    """Checks the meals of a menu against the schema and the user's constraints."""
+    
+    def __init__(self, budget_per_meal=None, max_prep_time=None, matcher=None):
+        """
+        Initialize the validator.
+        
+        Args:
+            budget_per_meal: Maximum cost of one meal (VND)
+            max_prep_time: Maximum preparation time (minutes)
+            matcher: DislikeMatcher of the user
+        """
+        self.budget_per_meal = _number(budget_per_meal)
+        self.max_prep_time = _number(max_prep_time)
+        self.matcher = matcher or DislikeMatcher()
+    
+    def validate_meal(self, meal_info):
+        """
+        Check one meal.
+        
+        Args:
+            meal_info: Meal dictionary
+        
+        Returns:
+            List of problems (empty if the meal is valid)
+        """
+        if not isinstance(meal_info, dict):
+            return ["không đúng định dạng"]
+        
+        problems = []
+        for key, expected in REQUIRED_KEYS.items():
+            value = meal_info.get(key)
+            if value is None or value == "" or value == []:
+                problems.append(f"thiếu {key}")
+            elif not isinstance(value, expected) and _number(value) is None:
+                problems.append(f"{key} không hợp lệ")
+        
+        cost = _number(meal_info.get("estimated_cost"))
+        if self.budget_per_meal and cost is not None and cost > self.budget_per_meal:
+            problems.append(
+                f"chi phí {format_currency(int(cost))} vượt ngân sách {format_currency(int(self.budget_per_meal))}"
+            )
+        prep_time = _number(meal_info.get("preparation_time"))
+        if self.max_prep_time and prep_time is not None and prep_time > self.max_prep_time:
+            problems.append(f"thời gian {int(prep_time)} phút vượt quá {int(self.max_prep_time)} phút")
+        
+        disliked = self.matcher.meal_violations(meal_info)
+        if disliked:
+            problems.append(f"có {', '.join(disliked)} (không thích)")
+        return problems
+    
+    def validate(self, menu, days, meals_per_day):
+        """
+        Check every expected meal of a menu.
+        
+        Args:
+            menu: Menu dictionary ({day: {meal_time: meal_info}})
+            days: Days the menu must cover
+            meals_per_day: Meals every day must have
+        
+        Returns:
+            Dictionary {(day, meal_time): problems} of the failing meals, in menu order
+        """
+        failures = {}
+        for day in days:
+            day_meals = (menu or {}).get(day)
+            if not isinstance(day_meals, dict):
+                day_meals = {}
+            for meal_time in meals_per_day:
+                if meal_time not in day_meals:
+                    failures[(day, meal_time)] = ["thiếu bữa ăn"]
+                    continue
+                problems = self.validate_meal(day_meals[meal_time])
+                if problems:
+                    failures[(day, meal_time)] = problems
+        return failures
@@ -0,0 +1,154 @@
+"""
+Numeric nutrition values for meals and menus.
+
+The API returns nutrition as text ("25g", "350 kcal", "20-30 g"); this
+module turns it into numbers once, so totals can be computed with NumPy
+and stored instead of re-reading the menu JSON every time.
+"""
+import re
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Nutrients stored for every meal, in column order
+NUTRIENTS = ("protein", "carbs", "fat", "calories")
+
+# Display names and units of the nutrients
+NUTRIENT_LABELS = {
+    "protein": ("Protein", "g"),
+    "carbs": ("Carbs", "g"),
+    "fat": ("Chất béo", "g"),
+    "calories": ("Calories", "kcal"),
+}
+
+# Factors converting a unit to the nutrient's own unit (g or kcal)
+UNIT_FACTORS = {
+    "g": 1.0,
+    "gr": 1.0,
+    "gram": 1.0,
+    "mg": 0.001,
+    "kg": 1000.0,
+    "kcal": 1.0,
+    "cal": 1.0,  # Food labels write kcal as "cal"
+    "calo": 1.0,
+    "kj": 1 / 4.184,
+}
+
+_NUMBER = r"\d+(?:[.,]\d+)?"
+_VALUE = re.compile(
+    rf"({_NUMBER})(?:\s*[-–]\s*({_NUMBER}))?\s*(kcal|calo|cal|kj|mg|kg|gram|gr|g)?(?![a-z])",
+    re.IGNORECASE
+)
+# "1.200 kcal": a dot followed by exactly three digits separates thousands
+_THOUSANDS = re.compile(r"^\d{1,3}(?:\.\d{3})+$")
+
+
+def _to_float(number):
+    """Convert a matched number, reading "1,5" as 1.5 and "1.200" as 1200."""
+    if _THOUSANDS.match(number):
+        return float(number.replace(".", ""))
+    return float(number.replace(",", "."))
+
+
+def parse_nutrient(value):
+    """
+    Parse one nutrition value.
+    
+    Args:
+        value: Number or text such as "25g", "20-30 g" or "1.200 kcal"
+    
+    Returns:
+        Value in g (kcal for calories), the middle of a range, NaN if unknown
+    """
+    if isinstance(value, bool) or value is None:
+        return np.nan
+    if isinstance(value, (int, float)):
+        return float(value) if value >= 0 else np.nan
+    
+    match = _VALUE.search(str(value))
+    if not match:
+        return np.nan
+    
+    low, high, unit = match.groups()
+    number = _to_float(low)
+    if high:
+        number = (number + _to_float(high)) / 2
+    return number * UNIT_FACTORS.get((unit or "").lower(), 1.0)
+
+
+def parse_nutrition(nutrition_info):
+    """
+    Parse the nutrition_info dictionary of a meal.
+    
+    Args:
+        nutrition_info: Dictionary with protein, carbs, fat and calories text
+    
+    Returns:
+        Array of NUTRIENTS values (NaN where unknown)
+    """
+    if not isinstance(nutrition_info, dict):
+        return np.full(len(NUTRIENTS), np.nan)
+    return np.array([parse_nutrient(nutrition_info.get(nutrient)) for nutrient in NUTRIENTS])
+
+
+def menu_nutrition(meals):
+    """
+    Parse the nutrition of every meal in a menu.
+    
+    Args:
+        meals: Menu dictionary ({day: {meal_time: meal_info}})
+    
+    Returns:
+        (list of (day, meal_time) slots, array of shape (slots, NUTRIENTS))
+    """
+    slots = []
+    rows = []
+    for day, day_meals in (meals or {}).items():
+        if not isinstance(day_meals, dict):
+            continue
+        for meal_time, meal_info in day_meals.items():
+            if isinstance(meal_info, dict):
+                slots.append((day, meal_time))
+                rows.append(parse_nutrition(meal_info.get("nutrition_info")))
+    
+    values = np.array(rows) if rows else np.empty((0, len(NUTRIENTS)))
+    return slots, values
+
+
+def daily_totals(slots, values):
+    """
+    Add up the nutrition of each day.
+    
+    Args:
+        slots: (day, meal_time) slots, as returned by menu_nutrition
+        values: Nutrition array, as returned by menu_nutrition
+    
+    Returns:
+        (list of days in menu order, array of shape (days, NUTRIENTS));
+        unknown values count as 0
+    """
+    days = list(dict.fromkeys(day for day, _ in slots))
+    index = {day: position for position, day in enumerate(days)}
+    totals = np.zeros((len(days), len(NUTRIENTS)))
+    np.add.at(totals, [index[day] for day, _ in slots], np.nan_to_num(values))
+    return days, totals
+
+
+def format_nutrition(values):
+    """
+    Format nutrient values for display.
+    
+    Args:
+        values: Array of NUTRIENTS values
+    
+    Returns:
+        Text such as "1850 kcal, Protein 95 g, Carbs 230 g, Chất béo 60 g"
+    """
+    values = dict(zip(NUTRIENTS, values))
+    parts = [f"{values['calories']:.0f} kcal"]
+    for nutrient in ("protein", "carbs", "fat"):
+        label, unit = NUTRIENT_LABELS[nutrient]
+        parts.append(f"{label} {values[nutrient]:.0f} {unit}")
+    return ", ".join(parts)
@@ -0,0 +1,339 @@
+"""
+Shopping list for a weekly menu.
+
+Quantities of the same ingredient are added up across all meals, after
+converting them to a common unit (kg to g, lít to ml, trái to quả) and
+scaling recipe amounts to the number of people eating.
+"""
+import re
+import logging
+import unicodedata
+
+from utils.ingredient_canonicalizer import UNITS, canonical, canonical_key
+from utils.text_normalizer import fold_vietnamese
+
+logger = logging.getLogger(__name__)
+
+# Number of people a recipe is written for when it does not say
+DEFAULT_SERVINGS = 4
+
+# Unit -> (base unit, factor): quantities are added up in the base unit
+UNIT_CONVERSIONS = {
+    "mg": ("g", 0.001),
+    "g": ("g", 1),
+    "gr": ("g", 1),
+    "gram": ("g", 1),
+    "gam": ("g", 1),
+    "lạng": ("g", 100),
+    "kg": ("g", 1000),
+    "ml": ("ml", 1),
+    "l": ("ml", 1000),
+    "lít": ("ml", 1000),
+    "muỗng cà phê": ("ml", 5),
+    "thìa cà phê": ("ml", 5),
+    "muỗng canh": ("ml", 15),
+    "thìa canh": ("ml", 15),
+    "quả": ("quả", 1),
+    "trái": ("quả", 1),
+    "củ": ("củ", 1),
+}
+
+# Base unit -> (larger unit, factor) used when a total gets large enough
+DISPLAY_UNITS = {
+    "g": ("kg", 1000),
+    "ml": ("lít", 1000),
+}
+
+_FOLDED_CONVERSIONS = {fold_vietnamese(unit): conversion for unit, conversion in UNIT_CONVERSIONS.items()}
+
+_NUMBER = r"\d+(?:[.,]\d+)?"
+_QUANTITY = re.compile(rf"^\s*({_NUMBER})(?:\s*/\s*(\d+))?(?:\s*[-–]\s*({_NUMBER}))?")
+_UNIT_NAMES = sorted(set(UNITS) | set(UNIT_CONVERSIONS), key=len, reverse=True)
+_INLINE_AMOUNT = re.compile(
+    rf"^\s*({_NUMBER}(?:\s*/\s*\d+)?(?:\s*[-–]\s*{_NUMBER})?)\s*"
+    rf"({'|'.join(re.escape(unit) for unit in _UNIT_NAMES)})?(?!\w)\s*(.+)$",
+    re.UNICODE | re.IGNORECASE
+)
+
+# Totals smaller than this are treated as zero after a meal is removed
+_EPSILON = 1e-9
+
+
+def parse_quantity(amount):
+    """
+    Parse a recipe amount.
+    
+    Args:
+        amount: Number or text such as "300", "1,5", "1/2" or "2-3"
+    
+    Returns:
+        Quantity as a float (the upper bound of a range), None if not numeric
+    """
+    if isinstance(amount, bool):
+        return None
+    if isinstance(amount, (int, float)):
+        return float(amount) if amount > 0 else None
+    
+    match = _QUANTITY.match(str(amount or ""))
+    if not match:
+        return None
+    
+    number, denominator, upper = match.groups()
+    if upper:
+        # Buy enough for the larger amount of a range
+        return float(upper.replace(",", "."))
+    value = float(number.replace(",", "."))
+    if denominator:
+        value = value / int(denominator) if int(denominator) else 0.0
+    return value or None
+
+
+def normalize_unit(unit, quantity):
+    """
+    Convert a quantity to the base unit of its unit.
+    
+    Args:
+        unit: Unit as written, e.g. "kg" or "Trái"
+        quantity: Quantity in that unit
+    
+    Returns:
+        (base unit, quantity) tuple; unknown units are kept as written
+    """
+    name = unicodedata.normalize('NFC', str(unit or "")).strip().lower()
+    conversion = UNIT_CONVERSIONS.get(name) or _FOLDED_CONVERSIONS.get(fold_vietnamese(name))
+    if conversion is None:
+        return name, quantity
+    base_unit, factor = conversion
+    return base_unit, quantity * factor
+
+
+def format_quantity(quantity, unit):
+    """
+    Format a total for display, switching to kg/lít for large amounts.
+    
+    Args:
+        quantity: Quantity in the base unit
+        unit: Base unit
+    
+    Returns:
+        Text such as "1,5 kg" or "3 quả"
+    """
+    if unit in DISPLAY_UNITS and quantity >= DISPLAY_UNITS[unit][1]:
+        unit, factor = DISPLAY_UNITS[unit]
+        quantity = quantity / factor
+    text = f"{round(quantity, 2):g}".replace(".", ",")
+    return f"{text} {unit}".strip()
+
+
+def recipe_ingredients(recipe):
+    """
+    Get the structured ingredients and servings of a stored recipe.
+    
+    Args:
+        recipe: Recipe object, or recipe content as a dictionary
+    
+    Returns:
+        (list of (name, amount, unit) tuples, servings) tuple
+    """
+    if hasattr(recipe, "get_data"):
+        try:
+            recipe = recipe.get_data()
+        except (TypeError, ValueError):
+            return [], None
+    if not isinstance(recipe, dict):
+        return [], None
+    
+    data = recipe.get("recipe", recipe)
+    if not isinstance(data, dict):
+        return [], None
+    
+    items = []
+    for entry in data.get("ingredients") or []:
+        if isinstance(entry, dict):
+            name = entry.get("item") or entry.get("name")
+            if name:
+                items.append((str(name), entry.get("amount"), entry.get("unit")))
+        elif entry:
+            items.append(split_amount(str(entry)))
+    return items, parse_quantity(data.get("servings"))
+
+
+def split_amount(ingredient):
+    """
+    Split an amount written in front of an ingredient.
+    
+    Args:
+        ingredient: Ingredient as written, e.g. "300g thịt heo"
+    
+    Returns:
+        (name, amount, unit) tuple; amount and unit are None if there is none
+    """
+    match = _INLINE_AMOUNT.match(ingredient)
+    if not match or not match.group(3):
+        return ingredient, None, None
+    return match.group(3), match.group(1), match.group(2)
+
+
+def meal_items(meal_info, recipe=None, servings=DEFAULT_SERVINGS):
+    """
+    Get the ingredient quantities of one meal.
+    
+    Args:
+        meal_info: Meal dictionary with name and ingredients
+        recipe: Saved recipe of the dish (its amounts are used when given)
+        servings: Number of people the meal is cooked for
+    
+    Returns:
+        List of (key, name, base unit, quantity) tuples; unit and quantity
+        are None for ingredients without an amount
+    """
+    items, recipe_servings = recipe_ingredients(recipe) if recipe is not None else ([], None)
+    scale = 1.0
+    if items:
+        # Recipe amounts are written for the recipe's own number of people
+        scale = (servings or DEFAULT_SERVINGS) / (recipe_servings or DEFAULT_SERVINGS)
+    else:
+        items = [split_amount(str(item)) for item in meal_info.get("ingredients") or [] if item]
+    
+    result = []
+    for name, amount, unit in items:
+        key = canonical_key(name)
+        if not key:
+            continue
+        quantity = parse_quantity(amount)
+        if quantity is None:
+            result.append((key, canonical(name) or name, None, None))
+        else:
+            base_unit, quantity = normalize_unit(unit, quantity * scale)
+            result.append((key, canonical(name) or name, base_unit, quantity))
+    return result
+
+
+class ShoppingList:
+    """Aggregated shopping list that is updated one meal at a time.
+    
+    Every meal's contribution is kept separately, so replacing a meal
+    only subtracts its old quantities and adds the new ones instead of
+    going over the whole week again.
+    """
+    
+    def __init__(self, servings=DEFAULT_SERVINGS):
+        """
+        Initialize an empty shopping list.
+        
+        Args:
+            servings: Number of people every meal is cooked for
+        """
+        self.servings = servings or DEFAULT_SERVINGS
+        self._contributions = {}  # (day, meal time) -> [(key, unit, quantity)]
+        self._totals = {}  # key -> {unit: quantity}
+        self._meal_counts = {}  # key -> number of meals using the ingredient
+        self._names = {}  # key -> display name
+    
+    @classmethod
+    def from_menu(cls, menu, recipes=None, servings=DEFAULT_SERVINGS):
+        """
+        Build the shopping list of a whole menu.
+        
+        Args:
+            menu: Menu dictionary ({day: {meal_time: meal_info}})
+            recipes: Saved recipes by dish name (Recipe objects or content dictionaries)
+            servings: Number of people every meal is cooked for
+        
+        Returns:
+            ShoppingList
+        """
+        shopping_list = cls(servings)
+        recipes = recipes or {}
+        for day, day_meals in (menu or {}).items():
+            if not isinstance(day_meals, dict):
+                continue
+            for meal_time, meal_info in day_meals.items():
+                if isinstance(meal_info, dict):
+                    shopping_list.set_meal(day, meal_time, meal_info, recipes.get(meal_info.get("name")))
+        return shopping_list
+    
+    def set_meal(self, day, meal_time, meal_info, recipe=None):
+        """
+        Add a meal, or replace the meal already planned for that slot.
+        
+        Args:
+            day: Day of the meal
+            meal_time: Meal time, e.g. "Bữa sáng"
+            meal_info: Meal dictionary with name and ingredients
+            recipe: Saved recipe of the dish (its amounts are used when given)
+        """
+        self.remove_meal(day, meal_time)
+        items = []
+        for key, name, unit, quantity in meal_items(meal_info, recipe, self.servings):
+            self._names.setdefault(key, name)
+            items.append((key, unit, quantity))
+        self._contributions[(day, meal_time)] = items
+        self._apply(items, 1)
+    
+    def remove_meal(self, day, meal_time):
+        """
+        Remove the quantities of a meal from the list.
+        
+        Args:
+            day: Day of the meal
+            meal_time: Meal time
+        """
+        items = self._contributions.pop((day, meal_time), None)
+        if items:
+            self._apply(items, -1)
+    
+    def _apply(self, items, sign):
+        """Add (sign=1) or subtract (sign=-1) meal items from the totals."""
+        for key in {key for key, _, _ in items}:
+            count = self._meal_counts.get(key, 0) + sign
+            if count > 0:
+                self._meal_counts[key] = count
+            else:
+                self._meal_counts.pop(key, None)
+                self._totals.pop(key, None)
+                self._names.pop(key, None)
+        
+        for key, unit, quantity in items:
+            if unit is None or key not in self._meal_counts:
+                continue
+            units = self._totals.setdefault(key, {})
+            total = units.get(unit, 0.0) + sign * quantity
+            if total > _EPSILON:
+                units[unit] = total
+            else:
+                units.pop(unit, None)
+    
+    def items(self):
+        """
+        Get the aggregated list, sorted by ingredient name.
+        
+        Returns:
+            List of dictionaries with name, quantities (formatted text per unit)
+            and the number of meals using the ingredient
+        """
+        return [
+            {
+                "name": self._names.get(key, key),
+                "quantities": [format_quantity(quantity, unit)
+                               for unit, quantity in sorted(self._totals.get(key, {}).items())],
+                "meals": count
+            }
+            for key, count in sorted(self._meal_counts.items(), key=lambda item: self._names.get(item[0], item[0]))
+        ]
+    
+    def to_text(self):
+        """
+        Format the list for display or export.
+        
+        Returns:
+            One line per ingredient
+        """
+        lines = []
+        for item in self.items():
+            quantity = " + ".join(item["quantities"]) if item["quantities"] else "vừa đủ"
+            lines.append(f"- {item['name']}: {quantity} ({item['meals']} bữa)")
+        return "\n".join(lines)
+    
+    def __len__(self):
+        return len(self._meal_counts)
@@ -0,0 +1,239 @@
+"""
+Local dish substitutions by ingredient similarity.
+
+Every known dish (from the dish catalog and the saved recipes) gets a
+MinHash signature of its canonical ingredient set. Signatures are split
+into LSH bands, so dishes sharing ingredients with the meal being replaced
+are found by a few bucket lookups instead of a comparison with every dish.
+"""
+import zlib
+import logging
+
+import numpy as np
+
+from utils.ingredient_canonicalizer import canonical_key
+from utils.shopping_list import recipe_ingredients
+from utils.text_normalizer import fold_vietnamese
+
+logger = logging.getLogger(__name__)
+
+# MinHash signature length, split into LSH_BANDS bands of equal size
+NUM_PERMUTATIONS = 64
+# 32 bands of 2 rows: dishes sharing about a fifth of their ingredients usually collide
+LSH_BANDS = 32
+
+# Weight of the ingredients a substitute shares with the rest of the week
+WEEK_WEIGHT = 0.5
+
+# Default number of substitutes returned
+DEFAULT_SUBSTITUTES = 5
+
+# Mersenne prime for the universal hash functions (a * x + b) mod p
+_PRIME = np.uint64((1 << 31) - 1)
+
+_NO_ROWS = np.empty(0, dtype=np.int64)
+
+
+def _ingredient_hashes(keys):
+    """Hash canonical ingredient keys to integers below _PRIME."""
+    return np.array([zlib.crc32(key.encode("utf-8")) for key in keys], dtype=np.uint64) % _PRIME
+
+
+def recipe_meal_info(recipe):
+    """
+    Describe a saved recipe like a meal of a menu.
+    
+    Args:
+        recipe: Recipe object
+    
+    Returns:
+        Dictionary with name, ingredients, preparation_time and estimated_cost
+        (None, recipes do not have one)
+    """
+    items, _ = recipe_ingredients(recipe)
+    ingredients = [
+        " ".join(str(part) for part in (amount, unit, name) if part not in (None, ""))
+        for name, amount, unit in items
+    ]
+    
+    preparation_time = None
+    try:
+        data = recipe.get_data()
+        data = data.get("recipe", data) if isinstance(data, dict) else {}
+        times = [data.get("preparation_time"), data.get("cooking_time")]
+        preparation_time = int(sum(float(time) for time in times if time is not None)) or None
+    except (TypeError, ValueError, AttributeError):
+        pass
+    
+    return {
+        "name": str(recipe.name or "").strip(),
+        "ingredients": ingredients,
+        "preparation_time": preparation_time,
+        "estimated_cost": None
+    }
+
+
+class SubstitutionIndex:
+    """MinHash/LSH index of dishes for finding substitutes.
+    
+    The share of equal signature values of two dishes estimates the
+    Jaccard similarity of their ingredient sets. Candidates come from the
+    LSH buckets of the meal being replaced and are ranked by that
+    similarity plus the ingredients they share with the rest of the week.
+    """
+    
+    def __init__(self, dishes, num_permutations=NUM_PERMUTATIONS, bands=LSH_BANDS, seed=0):
+        """
+        Build the index.
+        
+        Args:
+            dishes: meal_info dictionaries (name, ingredients, preparation_time,
+                estimated_cost); later duplicates of a name are dropped
+            num_permutations: Signature length
+            bands: Number of LSH bands (must divide num_permutations)
+            seed: Seed of the hash functions
+        """
+        if num_permutations % bands:
+            raise ValueError("num_permutations must be a multiple of bands")
+        self.bands = bands
+        self.rows = num_permutations // bands
+        
+        random = np.random.default_rng(seed)
+        self._a = random.integers(1, int(_PRIME), num_permutations, dtype=np.uint64)
+        self._b = random.integers(0, int(_PRIME), num_permutations, dtype=np.uint64)
+        
+        self.dishes = []
+        self.name_keys = []
+        self.ingredient_keys = []
+        seen = set()
+        for dish in dishes:
+            name_key = fold_vietnamese(dish.get("name")).strip()
+            keys = {canonical_key(ingredient) for ingredient in dish.get("ingredients") or []} - {""}
+            if not name_key or name_key in seen or not keys:
+                continue
+            seen.add(name_key)
+            self.dishes.append(dish)
+            self.name_keys.append(name_key)
+            self.ingredient_keys.append(keys)
+        
+        self._rows_by_name = {name_key: row for row, name_key in enumerate(self.name_keys)}
+        
+        # Ingredient ids of all dishes in one flat array (row r is _starts[r]:_starts[r] + _sizes[r]),
+        # so the ingredients shared with the week are counted for every dish at once
+        self.ingredient_ids = {}  # ingredient key -> id
+        ids = [self.ingredient_ids.setdefault(key, len(self.ingredient_ids))
+               for keys in self.ingredient_keys for key in sorted(keys)]
+        self._ids = np.array(ids, dtype=np.int64)
+        self._sizes = np.array([len(keys) for keys in self.ingredient_keys], dtype=np.int64)
+        self._starts = np.concatenate(([0], np.cumsum(self._sizes)[:-1])).astype(np.int64)
+        
+        self.signatures = np.empty((len(self.dishes), num_permutations), dtype=np.uint64)
+        buckets = {}  # (band, band values) -> dish rows
+        for row, keys in enumerate(self.ingredient_keys):
+            self.signatures[row] = self.signature(keys)
+            for band in self._band_keys(self.signatures[row]):
+                buckets.setdefault(band, []).append(row)
+        self.buckets = {band: np.array(rows, dtype=np.int64) for band, rows in buckets.items()}
+    
+    @classmethod
+    def from_database(cls, db_manager, cuisine_type=None):
+        """
+        Index the dish catalog and the saved recipes of a cuisine.
+        
+        Args:
+            db_manager: DatabaseManager
+            cuisine_type: Cuisine to index, None for all
+        
+        Returns:
+            SubstitutionIndex
+        """
+        dishes = [
+            {
+                "name": dish.name,
+                "ingredients": list(dish.ingredients or []),
+                "preparation_time": dish.preparation_time,
+                "estimated_cost": dish.estimated_cost
+            }
+            for dish in db_manager.get_all_dishes(cuisine_type)
+        ]
+        # Catalog dishes come first, so they win over a recipe of the same name
+        dishes.extend(recipe_meal_info(recipe) for recipe in db_manager.get_all_recipes(cuisine_type))
+        index = cls(dishes)
+        logger.info(f"Indexed {len(index)} dishes for substitutions")
+        return index
+    
+    def signature(self, keys):
+        """
+        Compute the MinHash signature of an ingredient set.
+        
+        Args:
+            keys: Canonical ingredient keys
+        
+        Returns:
+            Array of NUM_PERMUTATIONS minimum hash values
+        """
+        hashes = _ingredient_hashes(sorted(keys))
+        return ((np.outer(self._a, hashes) + self._b[:, None]) % _PRIME).min(axis=1)
+    
+    def _band_keys(self, signature):
+        """Get the LSH bucket keys of a signature."""
+        return [
+            (band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+    
+    def similar(self, meal_info, week_ingredients=None, k=DEFAULT_SUBSTITUTES, exclude=(), matcher=None):
+        """
+        Find dishes that can replace a meal.
+        
+        Args:
+            meal_info: Meal to replace
+            week_ingredients: Canonical ingredient keys used by the other meals of the week
+            k: Maximum number of substitutes
+            exclude: Dish names to leave out, e.g. the dishes already in the menu
+            matcher: DislikeMatcher of the user; dishes it rejects are left out
+        
+        Returns:
+            List of (meal_info, similarity, shared ingredient keys) tuples, best first;
+            similarity is the estimated Jaccard similarity with the replaced meal
+        """
+        keys = {canonical_key(ingredient) for ingredient in meal_info.get("ingredients") or []} - {""}
+        if not keys or not self.dishes:
+            return []
+        
+        signature = self.signature(keys)
+        hit = np.zeros(len(self.dishes), dtype=bool)
+        hit[np.concatenate([self.buckets.get(band, _NO_ROWS) for band in self._band_keys(signature)])] = True
+        rows = np.flatnonzero(hit)
+        if len(rows) <= k:
+            # Too few bucket hits: compare with every dish instead
+            rows = np.arange(len(self.dishes))
+        
+        excluded = [fold_vietnamese(name).strip() for name in exclude]
+        excluded.append(fold_vietnamese(meal_info.get("name")).strip())
+        excluded = [self._rows_by_name[name] for name in excluded if name in self._rows_by_name]
+        rows = rows[~np.isin(rows, excluded)]
+        if not len(rows):
+            return []
+        
+        similarity = (self.signatures[rows] == signature).mean(axis=1)
+        
+        week_ingredients = set(week_ingredients or ())
+        in_week = np.zeros(len(self.ingredient_ids), dtype=np.int64)
+        in_week[[self.ingredient_ids[key] for key in week_ingredients if key in self.ingredient_ids]] = 1
+        shared_counts = np.add.reduceat(in_week[self._ids], self._starts)
+        scores = similarity + WEEK_WEIGHT * shared_counts[rows] / self._sizes[rows]
+        
+        best = []
+        for i in np.argsort(-scores, kind="stable"):
+            if len(best) == k or scores[i] <= 0:
+                break
+            if matcher is None or matcher.allows(self.dishes[rows[i]]):
+                best.append(i)
+        return [
+            (self.dishes[rows[i]], float(similarity[i]), sorted(self.ingredient_keys[rows[i]] & week_ingredients))
+            for i in best
+        ]
+    
+    def __len__(self):
+        return len(self.dishes)
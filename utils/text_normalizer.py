@@ -0,0 +1,41 @@
+"""
+Text normalization helpers for searching Vietnamese text.
+"""
+import re
+import unicodedata
+
+# Letters that Unicode does not decompose into a base letter plus a combining mark
+_SPECIAL_FOLDS = str.maketrans({'đ': 'd', 'Đ': 'D'})
+
+_WORD_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def fold_vietnamese(text):
+    """
+    Lowercase Vietnamese text and strip all diacritics.
+
+    Args:
+        text: Text to fold
+
+    Returns:
+        Folded text, e.g. "Phở bò" becomes "pho bo"
+    """
+    if not text:
+        return ""
+
+    decomposed = unicodedata.normalize('NFD', str(text).translate(_SPECIAL_FOLDS))
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return unicodedata.normalize('NFC', stripped).lower()
+
+
+def tokenize_folded(text):
+    """
+    Split text into folded search tokens.
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        List of folded tokens
+    """
+    return _WORD_PATTERN.findall(fold_vietnamese(text))